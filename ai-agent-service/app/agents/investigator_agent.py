@@ -7,10 +7,17 @@ and provide intelligent recommendations for package recovery and logistics optim
 
 import os
 import json
+import time
 import asyncio
-from typing import Dict, List, Optional, Any, Tuple
+import dataclasses
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Tuple, AsyncIterator
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 
 from langchain_openai import ChatOpenAI
@@ -24,13 +31,49 @@ from langchain.schema import AgentAction, AgentFinish
 import tiktoken
 
 from app.database import get_db
-from app.services.agent_service import AgentService
 from app.agents.mcp_tools import get_mcp_tools
+from app.agents.result_cache import InvestigationCache, CachedAnalysis, build_fingerprint
+from app.agents.rules_engine import RulesEngine, RuleDecision, extract_signals
+from app.agents.usage_accounting import (
+    UsageCallbackHandler,
+    TokenBudgetExceeded,
+    DEFAULT_TENANT,
+    EMPTY_USAGE,
+    investigation_budget,
+    usage_ledger
+)
+from app.agents.output_parser import (
+    InvestigationOutputParser,
+    ParsedInvestigation,
+    DEFAULT_CONFIDENCE,
+    STRUCTURED_OUTPUT_INSTRUCTIONS
+)
+from app.mcp.server import get_mcp_server
 
 # Token optimization configuration
 MAX_TOKENS_PER_REQUEST = 2000
 MAX_CONTEXT_TOKENS = 4000
 TOKEN_BUFFER = 200
+TOKEN_ENCODING = "cl100k_base"
+TOKEN_COUNT_CACHE_SIZE = 4096
+OFFLOAD_THRESHOLD_CHARS = 16000  # larger inputs are encoded off the event loop
+PREFIX_CHARS_PER_TOKEN = 8  # fields longer than budget * this are measured by a prefix first
+
+_encoding = None
+
+# Maximum concurrent LLM runs across all investigations (single and batch);
+# also the number of pre-built agent executors
+LLM_CONCURRENCY = int(os.getenv("AGENT_LLM_CONCURRENCY", "4"))
+
+# Context prefetch configuration
+PREFETCH_TIMEOUT = 10.0  # seconds to wait for prefetched tool results
+MAX_PREFETCH_TOKENS = 1200
+
+# Ask for the final answer as JSON (parsed deterministically, regex fallback otherwise)
+STRUCTURED_OUTPUT = os.getenv("AGENT_STRUCTURED_OUTPUT", "true").lower() == "true"
+
+# Member package ids listed in a cluster investigation prompt
+MAX_PROMPT_CLUSTER_MEMBERS = 20
 
 class InvestigationType(str, Enum):
     """Types of investigations the agent can perform"""
@@ -53,6 +96,15 @@ class InvestigationResult:
     estimated_resolution_time: Optional[str]
     next_actions: List[str]
     created_at: datetime
+    # Milliseconds per stage (prefetch, prefetch_<tool>, llm_wait, llm, parse, total) plus llm_calls / agent_tool_calls
+    # and, for cluster investigations, cluster_size; cache hits carry cache_hit / cache_similarity
+    latency_breakdown: Dict[str, float] = field(default_factory=dict)
+    # Tokens, LLM calls, tool calls, wall time and cost (see usage_accounting); empty for cluster members
+    usage: Dict[str, Any] = field(default_factory=dict)
+    # Set when the investigation failed and this is a placeholder result
+    error: Optional[str] = None
+    # Set when the agent was stopped at its token budget and this is what it had established so far
+    budget_exhausted: bool = False
 
 @dataclass
 class AgentContext:
@@ -64,62 +116,213 @@ class AgentContext:
     historical_data: List[Dict[str, Any]]
     environmental_factors: Dict[str, Any]
 
+def get_encoding():
+    """Load the tiktoken encoding once per process"""
+    global _encoding
+    if _encoding is None:
+        _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+    return _encoding
+
+def warm_up_tokenizer():
+    """Load the encoding (and its BPE ranks) ahead of the first investigation"""
+    get_encoding().encode("warmup")
+
 class TokenOptimizer:
     """Optimizes token usage for OpenAI API calls"""
     
-    def __init__(self):
-        self.encoding = tiktoken.get_encoding("cl100k_base")
+    # Prioritize most important information
+    PRIORITY_FIELDS = [
+        'package_id', 'status', 'anomaly_type', 'severity',
+        'current_location', 'destination', 'estimated_delivery'
+    ]
+    
+    def __init__(self, cache_size: int = TOKEN_COUNT_CACHE_SIZE):
+        self.cache_size = cache_size
+        # Token counts by content hash, so repeated context values are encoded once
+        self._counts: "OrderedDict[bytes, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+    
+    @property
+    def encoding(self):
+        return get_encoding()
+    
+    def _cache_key(self, text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+    
+    def _cached_count(self, text: str) -> Optional[int]:
+        """Token count from the cache, if this content was measured before"""
+        key = self._cache_key(text)
+        with self._lock:
+            count = self._counts.get(key)
+            if count is not None:
+                self._counts.move_to_end(key)
+                self.cache_hits += 1
+            return count
+    
+    def _measure(self, text: str) -> Tuple[int, Optional[List[int]]]:
+        """Token count of text; returns the tokens too when they had to be encoded"""
+        count = self._cached_count(text)
+        if count is not None:
+            return count, None
+        
+        tokens = self.encoding.encode(text)
+        with self._lock:
+            self.cache_misses += 1
+            self._counts[self._cache_key(text)] = len(tokens)
+            if len(self._counts) > self.cache_size:
+                self._counts.popitem(last=False)
+        return len(tokens), tokens
+    
+    def _overflow_tokens(self, text: str, max_tokens: int) -> Optional[List[int]]:
+        """Tokens of a prefix of text, if that prefix alone is over budget (so the rest need not be encoded)"""
+        prefix_chars = (max_tokens + 1) * PREFIX_CHARS_PER_TOKEN
+        if len(text) <= prefix_chars:
+            return None
+        
+        tokens = self.encoding.encode(text[:prefix_chars])
+        return tokens if len(tokens) > max_tokens else None
     
     def count_tokens(self, text: str) -> int:
         """Count tokens in text"""
-        return len(self.encoding.encode(text))
+        return self._measure(text)[0]
+    
+    def _truncate(self, text: str, max_tokens: int, tokens: Optional[List[int]] = None) -> str:
+        """Cut text to max_tokens, reusing already encoded tokens"""
+        if tokens is None:
+            tokens = self._overflow_tokens(text, max_tokens) or self.encoding.encode(text)
+        truncated_tokens = tokens[:max(0, max_tokens - 10)]  # Leave buffer
+        return self.encoding.decode(truncated_tokens) + "..."
     
     def truncate_text(self, text: str, max_tokens: int) -> str:
         """Truncate text to fit within token limit"""
-        tokens = self.encoding.encode(text)
-        if len(tokens) <= max_tokens:
+        count = self._cached_count(text)
+        if count is not None and count <= max_tokens:
             return text
         
-        truncated_tokens = tokens[:max_tokens - 10]  # Leave buffer
-        return self.encoding.decode(truncated_tokens) + "..."
+        tokens = self._overflow_tokens(text, max_tokens)
+        if tokens is None:
+            count, tokens = self._measure(text)
+            if count <= max_tokens:
+                return text
+        return self._truncate(text, max_tokens, tokens)
     
     def optimize_context(self, context: Dict[str, Any], max_tokens: int) -> Dict[str, Any]:
-        """Optimize context to fit within token limits"""
-        # Prioritize most important information
-        priority_fields = [
-            'package_id', 'status', 'anomaly_type', 'severity',
-            'current_location', 'destination', 'estimated_delivery'
-        ]
-        
+        """Optimize context to fit within token limits, truncating fields that do not fit whole"""
         optimized = {}
         remaining_tokens = max_tokens
         
-        # Add priority fields first
-        for field in priority_fields:
-            if field in context and remaining_tokens > 50:
-                value = str(context[field])
-                if self.count_tokens(value) <= remaining_tokens:
-                    optimized[field] = value
-                    remaining_tokens -= self.count_tokens(value)
-        
-        # Add other fields if space allows
-        for key, value in context.items():
-            if key not in optimized and remaining_tokens > 50:
-                value_str = str(value)
-                if self.count_tokens(value_str) <= remaining_tokens:
-                    optimized[key] = value_str
-                    remaining_tokens -= self.count_tokens(value_str)
+        # Add priority fields first, then other fields if space allows
+        ordered_keys = [field for field in self.PRIORITY_FIELDS if field in context]
+        ordered_keys += [key for key in context if key not in self.PRIORITY_FIELDS]
+        
+        deferred: List[Tuple[str, str, Optional[List[int]]]] = []
+        for key in ordered_keys:
+            if remaining_tokens <= 50:
+                break
+            
+            value_str = str(context[key])
+            count = self._cached_count(value_str)
+            tokens = None
+            if count is None:
+                tokens = self._overflow_tokens(value_str, remaining_tokens)
+                if tokens is None:
+                    count, tokens = self._measure(value_str)
+            
+            if count is not None and count <= remaining_tokens:
+                optimized[key] = value_str
+                remaining_tokens -= count
+            else:
+                deferred.append((key, value_str, tokens))
+        
+        # Spend what is left on the first field that did not fit, instead of dropping it
+        if deferred and remaining_tokens > 50:
+            key, value_str, tokens = deferred[0]
+            optimized[key] = self._truncate(value_str, remaining_tokens, tokens)
         
         return optimized
+    
+    async def truncate_text_async(self, text: str, max_tokens: int) -> str:
+        """truncate_text, offloaded to a worker thread for large inputs"""
+        if len(text) < OFFLOAD_THRESHOLD_CHARS:
+            return self.truncate_text(text, max_tokens)
+        return await asyncio.to_thread(self.truncate_text, text, max_tokens)
+    
+    async def count_tokens_async(self, text: str) -> int:
+        """count_tokens, offloaded to a worker thread for large inputs"""
+        if len(text) < OFFLOAD_THRESHOLD_CHARS:
+            return self.count_tokens(text)
+        return await asyncio.to_thread(self.count_tokens, text)
+    
+    async def optimize_context_async(self, context: Dict[str, Any], max_tokens: int) -> Dict[str, Any]:
+        """optimize_context, offloaded to a worker thread for large contexts"""
+        if sum(len(str(value)) for value in context.values()) < OFFLOAD_THRESHOLD_CHARS:
+            return self.optimize_context(context, max_tokens)
+        return await asyncio.to_thread(self.optimize_context, context, max_tokens)
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Get token count cache counters"""
+        return {
+            "entries": len(self._counts),
+            "hits": self.cache_hits,
+            "misses": self.cache_misses
+        }
 
 # Old tool implementations removed - now using MCP tools
 
 class InvestigationCallbackHandler(BaseCallbackHandler):
-    """Callback handler for agent execution"""
+    """Callback handler for agent execution; publishes progress events when given a queue"""
     
-    def __init__(self, investigation_id: str):
+    def __init__(self, investigation_id: str, event_queue: Optional[asyncio.Queue] = None):
         self.investigation_id = investigation_id
         self.actions_taken = []
+        self.llm_calls = 0
+        self.event_queue = event_queue
+        # Sync handlers may be run on executor threads, so events are handed back to the loop
+        self._loop = asyncio.get_running_loop() if event_queue is not None else None
+        self._tool_runs: Dict[Any, Tuple[str, float]] = {}
+    
+    def _emit(self, event: str, data: Dict[str, Any]):
+        """Publish a progress event to the stream, if any"""
+        if self.event_queue is not None:
+            self._loop.call_soon_threadsafe(self.event_queue.put_nowait, (event, data))
+    
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kwargs) -> None:
+        """Called when the LLM is invoked"""
+        self.llm_calls += 1
+    
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[Any], **kwargs) -> None:
+        """Called when the chat model is invoked"""
+        self.llm_calls += 1
+    
+    def on_llm_new_token(self, token: str, **kwargs) -> None:
+        """Called for each streamed LLM token"""
+        self._emit("llm_token", {"token": token})
+    
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, **kwargs) -> None:
+        """Called when a tool starts running"""
+        tool = serialized.get("name", "unknown")
+        self._tool_runs[kwargs.get("run_id")] = (tool, time.perf_counter())
+        self._emit("tool_start", {"tool": tool, "input": input_str[:500]})
+    
+    def on_tool_end(self, output: str, **kwargs) -> None:
+        """Called when a tool finishes"""
+        tool, started = self._tool_runs.pop(kwargs.get("run_id"), ("unknown", time.perf_counter()))
+        self._emit("tool_end", {
+            "tool": tool,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+            "output": str(output)[:500]
+        })
+    
+    def on_tool_error(self, error: BaseException, **kwargs) -> None:
+        """Called when a tool raises"""
+        tool, started = self._tool_runs.pop(kwargs.get("run_id"), ("unknown", time.perf_counter()))
+        self._emit("tool_error", {
+            "tool": tool,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+            "error": str(error)
+        })
     
     def on_agent_action(self, action: AgentAction, **kwargs) -> None:
         """Called when agent takes an action"""
@@ -133,6 +336,49 @@ class InvestigationCallbackHandler(BaseCallbackHandler):
         """Called when agent finishes"""
         pass
 
+class AgentExecutorPool:
+    """Pre-built agent executors sharing one agent/prompt/tool set, checked out one per investigation"""
+    
+    def __init__(self, factory, size: int = LLM_CONCURRENCY):
+        self.size = size
+        self._idle: List[AgentExecutor] = [factory() for _ in range(size)]
+        self._available = asyncio.Semaphore(size)
+        self.checkouts = 0
+        self.waits = 0
+    
+    @asynccontextmanager
+    async def checkout(self):
+        """Borrow an executor with fresh per-investigation memory"""
+        if self._available.locked():
+            self.waits += 1
+        await self._available.acquire()
+        
+        executor = self._idle.pop()
+        executor.memory = ConversationBufferWindowMemory(
+            k=3,  # Keep only last 3 exchanges
+            memory_key="chat_history",
+            input_key="input",  # the executor also receives package_id, status, ...
+            output_key="output",
+            return_messages=True
+        )
+        self.checkouts += 1
+        try:
+            yield executor
+        finally:
+            # Drop the investigation's history so nothing leaks into the next one
+            executor.memory = None
+            self._idle.append(executor)
+            self._available.release()
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Get pool usage counters"""
+        return {
+            "size": self.size,
+            "in_use": self.size - len(self._idle),
+            "checkouts": self.checkouts,
+            "waits": self.waits
+        }
+
 class InvestigatorAgent:
     """AI Investigator Agent for package anomaly analysis"""
     
@@ -145,23 +391,24 @@ class InvestigatorAgent:
             model="gpt-3.5-turbo",  # Using cheaper model
             temperature=0.1,  # Lower temperature for more consistent results
             max_tokens=500,  # Limit response length
+            streaming=True,  # Tokens reach callbacks as they arrive (used by streaming investigations)
             openai_api_key=os.getenv("OPENAI_API_KEY")
         )
         
+        # Reuse of LLM analyses across near-identical investigations
+        self.result_cache = InvestigationCache()
+        self.rules_engine = RulesEngine()
+        self.output_parser = InvestigationOutputParser()
+        
         # Initialize MCP tools
         self.tools = get_mcp_tools()
         
-        # Create agent with ReAct pattern
+        # One immutable ReAct agent (prompt + tools); executors are pooled and
+        # their number is the LLM concurrency limit
         self.agent = self._create_agent()
-        
-        # Memory for conversation context
-        self.memory = ConversationBufferWindowMemory(
-            k=3,  # Keep only last 3 exchanges
-            memory_key="chat_history",
-            return_messages=True
-        )
+        self.agent_pool = AgentExecutorPool(self._create_executor)
     
-    def _create_agent(self) -> AgentExecutor:
+    def _create_agent(self):
         """Create the ReAct agent"""
         
         # Optimized prompt template
@@ -201,43 +448,196 @@ Thought: {agent_scratchpad}
         
         prompt = PromptTemplate(
             template=prompt_template,
-            input_variables=["input", "agent_scratchpad", "chat_history", "package_id", "investigation_type", "current_status"],
-            partial_variables={"tools": self._format_tools(), "tool_names": self._format_tool_names()}
+            # create_react_agent fills in tools and tool_names itself
+            input_variables=[
+                "input", "agent_scratchpad", "chat_history", "package_id", "investigation_type",
+                "current_status", "tools", "tool_names"
+            ]
         )
         
         # Create ReAct agent
-        agent = create_react_agent(self.llm, self.tools, prompt)
-        
+        return create_react_agent(self.llm, self.tools, prompt)
+    
+    def _create_executor(self) -> AgentExecutor:
+        """Create an executor around the shared agent; memory is attached per investigation"""
         return AgentExecutor(
-            agent=agent,
+            agent=self.agent,
             tools=self.tools,
-            memory=self.memory,
             verbose=True,
             max_iterations=3,  # Limit iterations to save tokens
-            early_stopping_method="generate"
+            early_stopping_method="force"  # "generate" is not supported by create_react_agent's runnable agent
+        )
+    
+    async def _prefetch_context(
+        self,
+        package_id: str,
+        anomaly_data: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], Dict[str, float]]:
+        """Run the tool calls most investigations need concurrently, before the LLM"""
+        mcp_server = get_mcp_server()
+        tasks: Dict[str, asyncio.Task] = {}
+        timings: Dict[str, float] = {}
+        
+        async def timed(name: str, tool_name: str, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await mcp_server.dispatcher.call(tool_name, kwargs)
+            finally:
+                timings[f"prefetch_{name}"] = round((time.perf_counter() - start) * 1000, 1)
+        
+        def launch(hints: Dict[str, Any]):
+            """Start every call whose inputs are known and that is not running yet"""
+            location = hints.get("location") or hints.get("last_scan_location")
+            destination = hints.get("destination")
+            carrier = (hints.get("carrier") or "").lower()
+            tracking_number = hints.get("tracking_number")
+            
+            if location and "weather" not in tasks:
+                tasks["weather"] = asyncio.create_task(timed("weather", "get_weather_data", location=location))
+            if location and destination and "traffic" not in tasks:
+                tasks["traffic"] = asyncio.create_task(timed(
+                    "traffic", "get_traffic_data", origin=location, destination=destination
+                ))
+            carrier_tool = f"{carrier}_tracking"
+            if tracking_number and mcp_server.tool_registry.get_tool(carrier_tool) and "carrier" not in tasks:
+                tasks["carrier"] = asyncio.create_task(timed(
+                    "carrier", carrier_tool, tracking_number=tracking_number, include_events=False
+                ))
+        
+        # Package data supplies the inputs for the other calls; start whatever
+        # the anomaly report already allows alongside it
+        tasks["package"] = asyncio.create_task(timed(
+            "package", "get_package_data", package_id=package_id, include_events=False
+        ))
+        launch(anomaly_data)
+        
+        hints = dict(anomaly_data)
+        try:
+            package_result = await asyncio.wait_for(asyncio.shield(tasks["package"]), PREFETCH_TIMEOUT)
+            if package_result.success and isinstance(package_result.data, dict):
+                hints = {**package_result.data, **{k: v for k, v in anomaly_data.items() if v}}
+                launch(hints)
+        except asyncio.TimeoutError:
+            pass
+        
+        done, pending = await asyncio.wait(tasks.values(), timeout=PREFETCH_TIMEOUT)
+        for task in pending:
+            task.cancel()
+        
+        context = {}
+        for name, task in tasks.items():
+            if task in done and not task.cancelled() and task.exception() is None:
+                result = task.result()
+                if result.success:
+                    context[name] = result.data
+        
+        return context, timings
+    
+    async def _format_prefetched_context(self, context: Dict[str, Any]) -> str:
+        """Render prefetched tool results compactly within the prefetch token budget"""
+        if not context:
+            return "None (use the tools to gather what you need)"
+        
+        rendered = json.dumps(context, separators=(",", ":"), ensure_ascii=False, default=str)
+        return await self.token_optimizer.truncate_text_async(rendered, MAX_PREFETCH_TOKENS)
+    
+    def _format_related_packages(self, related_package_ids: Optional[List[str]]) -> str:
+        """Describe the other packages affected by the same incident"""
+        if not related_package_ids:
+            return ""
+        
+        listed = ", ".join(related_package_ids[:MAX_PROMPT_CLUSTER_MEMBERS])
+        more = len(related_package_ids) - MAX_PROMPT_CLUSTER_MEMBERS
+        if more > 0:
+            listed += f" and {more} more"
+        return (
+            f"Also affected by the same incident (same last scan location, destination and anomaly type): "
+            f"{len(related_package_ids)} packages ({listed}). Analyze the shared incident.\n"
         )
     
-    def _format_tools(self) -> str:
-        """Format tools for prompt"""
-        return "\n".join([f"{tool.name}: {tool.description}" for tool in self.tools])
+    @staticmethod
+    def _new_investigation_id(package_id: str) -> str:
+        """Readable, unique investigation ID (several runs per package per second are possible)"""
+        return f"inv_{package_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
     
-    def _format_tool_names(self) -> str:
-        """Format tool names for prompt"""
-        return ", ".join([tool.name for tool in self.tools])
+    async def investigate_cluster(
+        self,
+        members: List[Tuple[str, Dict[str, Any]]],
+        tenant_id: Optional[str] = None
+    ) -> Dict[str, InvestigationResult]:
+        """Investigate a cluster of (package_id, anomaly_data) once and fan the findings out to every member"""
+        package_id, anomaly_data = members[0]
+        related = [member_id for member_id, _ in members[1:]]
+        
+        shared = await self.investigate_anomaly(
+            package_id, anomaly_data, related_package_ids=related, tenant_id=tenant_id
+        )
+        shared.latency_breakdown["cluster_size"] = len(members)
+        
+        results = {package_id: shared}
+        for member_id, member_data in members[1:]:
+            results[member_id] = dataclasses.replace(
+                shared,
+                investigation_id=self._new_investigation_id(member_id),
+                package_id=member_id,
+                priority=self._determine_priority(member_data, shared.confidence_score),
+                latency_breakdown=dict(shared.latency_breakdown),
+                # The shared run's usage is accounted once, on the investigated package
+                usage={}
+            )
+        
+        return results
     
     async def investigate_anomaly(
         self, 
         package_id: str, 
-        anomaly_data: Dict[str, Any]
+        anomaly_data: Dict[str, Any],
+        related_package_ids: Optional[List[str]] = None,
+        event_queue: Optional[asyncio.Queue] = None,
+        tenant_id: Optional[str] = None
     ) -> InvestigationResult:
-        """Investigate a package anomaly"""
+        """Investigate a package anomaly (optionally on behalf of related packages sharing the incident)"""
+        
+        investigation_id = self._new_investigation_id(package_id)
+        started = time.perf_counter()
+        tenant_id = tenant_id or DEFAULT_TENANT
         
-        investigation_id = f"inv_{package_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        # Fetch package, weather, traffic and carrier data in parallel up front,
+        # so the agent reasons over them instead of fetching them one hop at a time
+        prefetched, latency = await self._prefetch_context(package_id, anomaly_data)
+        latency["prefetch"] = round((time.perf_counter() - started) * 1000, 1)
+        if event_queue is not None:
+            event_queue.put_nowait(("prefetch_complete", {
+                "investigation_id": investigation_id,
+                "duration_ms": latency["prefetch"],
+                "context": prefetched
+            }))
         
-        # Optimize context to save tokens
-        optimized_context = self.token_optimizer.optimize_context(anomaly_data, MAX_CONTEXT_TOKENS)
+        # Well-known anomalies are answered by the rules engine without the LLM
+        rules_started = time.perf_counter()
+        outcome = self.rules_engine.evaluate(anomaly_data, prefetched)
+        latency["rules"] = round((time.perf_counter() - rules_started) * 1000, 2)
+        if outcome.decision is not None:
+            latency["rules_fast_path"] = 1.0
+            latency["total"] = round((time.perf_counter() - started) * 1000, 1)
+            result = self._result_from_rules(investigation_id, package_id, outcome.decision, latency)
+            result.usage = self._record_usage(tenant_id, anomaly_data, "rules", started)
+            return result
+        
+        # Reuse the analysis of an identical (or close enough) earlier investigation
+        fingerprint = build_fingerprint(anomaly_data, prefetched)
+        cached, _, similarity = self.result_cache.lookup(fingerprint)
+        if cached is not None:
+            latency["cache_hit"] = 1.0
+            latency["cache_similarity"] = similarity
+            latency["total"] = round((time.perf_counter() - started) * 1000, 1)
+            result = self._result_from_cache(investigation_id, package_id, cached, latency)
+            result.usage = self._record_usage(tenant_id, anomaly_data, "cache", started)
+            result.usage["tokens_saved"] = cached.tokens
+            return result
         
         # Create investigation prompt
+        prefetched_text = await self._format_prefetched_context(prefetched)
         investigation_prompt = f"""
 Investigate this package anomaly:
 
@@ -245,33 +645,81 @@ Package ID: {package_id}
 Anomaly Type: {anomaly_data.get('anomaly_type', 'Unknown')}
 Severity: {anomaly_data.get('severity', 'Unknown')}
 Description: {anomaly_data.get('description', 'No description')}
+{self._format_related_packages(related_package_ids)}
+Prefetched data (package, weather, traffic, carrier tracking):
+{prefetched_text}
 
 Please:
-1. Retrieve package data using get_package_data
+1. Use the prefetched data; call a tool only for information that is missing above
 2. Analyze the anomaly and identify root causes
-3. Check weather and traffic conditions if relevant
+3. Consider weather and traffic conditions if relevant
 4. Provide specific recommendations for resolution
 5. Estimate resolution time and priority level
 
 Be concise and focus on actionable insights.
+{STRUCTURED_OUTPUT_INSTRUCTIONS if STRUCTURED_OUTPUT else ""}
 """
         
+        # Token budgets: this investigation's (by anomaly type), capped by what the tenant has left today.
+        # The tokens are reserved before waiting for an executor, so concurrent runs cannot all pass the
+        # same remaining budget, and settled to the actual spend when the run ends
+        anomaly_type = anomaly_data.get('anomaly_type') or "default"
+        type_budget = investigation_budget(anomaly_type)
+        reserved = usage_ledger.reserve(tenant_id, type_budget)
+        if reserved <= 0:
+            tenant_budget = usage_ledger.budget_for(tenant_id)
+            error = TokenBudgetExceeded("tenant", tenant_id, tenant_budget, tenant_budget)
+            result = self._create_error_result(investigation_id, package_id, str(error))
+            result.usage = self._record_usage(tenant_id, anomaly_data, "budget", started)
+            result.usage["budget_exceeded"] = True
+            return result
+        
+        if reserved < type_budget:
+            usage_handler = UsageCallbackHandler(
+                reserved, self.token_optimizer.count_tokens, self.llm.max_tokens, "tenant", tenant_id
+            )
+        else:
+            usage_handler = UsageCallbackHandler(
+                type_budget, self.token_optimizer.count_tokens, self.llm.max_tokens, "investigation", anomaly_type
+            )
+        callback_handler = InvestigationCallbackHandler(investigation_id, event_queue)
+        
         try:
             # Execute investigation
-            callback_handler = InvestigationCallbackHandler(investigation_id)
-            
-            result = await self.agent.ainvoke(
-                {
-                    "input": investigation_prompt,
-                    "package_id": package_id,
-                    "investigation_type": InvestigationType.ANOMALY_ANALYSIS.value,
-                    "current_status": anomaly_data.get('current_status', 'Unknown')
-                },
-                callbacks=[callback_handler]
-            )
+            queued_at = time.perf_counter()
+            async with self.agent_pool.checkout() as executor:
+                llm_started = time.perf_counter()
+                latency["llm_wait"] = round((llm_started - queued_at) * 1000, 1)
+                result = await executor.ainvoke(
+                    {
+                        "input": investigation_prompt,
+                        "package_id": package_id,
+                        "investigation_type": InvestigationType.ANOMALY_ANALYSIS.value,
+                        "current_status": anomaly_data.get('current_status', 'Unknown')
+                    },
+                    config={"callbacks": [callback_handler, usage_handler]}
+                )
+            latency["llm"] = round((time.perf_counter() - llm_started) * 1000, 1)
+            latency["llm_calls"] = callback_handler.llm_calls
+            latency["agent_tool_calls"] = len(callback_handler.actions_taken)
             
             # Parse results
-            findings, recommendations, confidence_score = self._parse_investigation_result(result)
+            parse_started = time.perf_counter()
+            parsed = self._parse_investigation_result(result)
+            findings, recommendations = parsed.findings, parsed.recommendations
+            confidence_score = parsed.confidence if parsed.confidence is not None else DEFAULT_CONFIDENCE
+            latency["parse"] = round((time.perf_counter() - parse_started) * 1000, 1)
+            latency["total"] = round((time.perf_counter() - started) * 1000, 1)
+            
+            priority = parsed.priority or self._determine_priority(anomaly_data, confidence_score)
+            estimated_resolution_time = parsed.estimated_resolution_time or self._estimate_resolution_time(findings)
+            next_actions = parsed.next_actions or self._generate_next_actions(recommendations)
+            
+            usage = self._record_usage(tenant_id, anomaly_data, "llm", started, usage_handler, reserved)
+            self.result_cache.store(
+                fingerprint, package_id, findings, recommendations, confidence_score,
+                priority, estimated_resolution_time, next_actions, usage["total_tokens"]
+            )
             
             # Create investigation result
             investigation_result = InvestigationResult(
@@ -281,57 +729,143 @@ Be concise and focus on actionable insights.
                 findings=findings,
                 recommendations=recommendations,
                 confidence_score=confidence_score,
-                priority=self._determine_priority(anomaly_data, confidence_score),
-                estimated_resolution_time=self._estimate_resolution_time(findings),
-                next_actions=self._generate_next_actions(recommendations),
-                created_at=datetime.utcnow()
+                priority=priority,
+                estimated_resolution_time=estimated_resolution_time,
+                next_actions=next_actions,
+                created_at=datetime.utcnow(),
+                latency_breakdown=latency,
+                usage=usage
             )
             
             return investigation_result
-            
+        
+        except TokenBudgetExceeded as e:
+            print(f"Investigation stopped: {str(e)}")
+            latency["llm_calls"] = callback_handler.llm_calls
+            latency["agent_tool_calls"] = len(callback_handler.actions_taken)
+            latency["total"] = round((time.perf_counter() - started) * 1000, 1)
+            result = self._create_partial_result(
+                investigation_id, package_id, anomaly_data, prefetched, callback_handler, latency
+            )
+        except asyncio.CancelledError:
+            # The caller went away; release the rest of the reservation
+            self._record_usage(tenant_id, anomaly_data, "llm", started, usage_handler, reserved)
+            raise
         except Exception as e:
             print(f"Investigation failed: {str(e)}")
-            return self._create_error_result(investigation_id, package_id, str(e))
+            result = self._create_error_result(investigation_id, package_id, str(e))
+        
+        # Tokens spent before a failure are still charged
+        result.usage = self._record_usage(tenant_id, anomaly_data, "llm", started, usage_handler, reserved)
+        return result
     
-    def _parse_investigation_result(self, result: Dict[str, Any]) -> Tuple[List[str], List[str], float]:
-        """Parse agent result into structured format"""
+    async def stream_investigation(
+        self,
+        package_id: str,
+        anomaly_data: Dict[str, Any],
+        tenant_id: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Investigate an anomaly, yielding (event, data) progress events and finally ("result", InvestigationResult)"""
+        event_queue: asyncio.Queue = asyncio.Queue()
+        task = asyncio.create_task(
+            self.investigate_anomaly(package_id, anomaly_data, event_queue=event_queue, tenant_id=tenant_id)
+        )
         
-        response = result.get("output", "")
+        try:
+            while not task.done():
+                getter = asyncio.ensure_future(event_queue.get())
+                await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    yield getter.result()
+                else:
+                    getter.cancel()
+            
+            # Let callbacks scheduled from executor threads land before draining
+            await asyncio.sleep(0)
+            while not event_queue.empty():
+                yield event_queue.get_nowait()
+            
+            yield "result", task.result()
+        finally:
+            # The consumer went away mid-investigation
+            if not task.done():
+                task.cancel()
+    
+    def _result_from_cache(
+        self,
+        investigation_id: str,
+        package_id: str,
+        cached: CachedAnalysis,
+        latency: Dict[str, float]
+    ) -> InvestigationResult:
+        """Build a result for this package from a cached analysis, with the priority and timing it was stored with"""
+        findings = [text.replace(cached.package_id, package_id) for text in cached.findings]
+        recommendations = [text.replace(cached.package_id, package_id) for text in cached.recommendations]
+        next_actions = [text.replace(cached.package_id, package_id) for text in cached.next_actions]
         
-        # Extract findings and recommendations using simple parsing
-        findings = []
-        recommendations = []
-        confidence_score = 0.7  # Default confidence
-        
-        # Simple parsing logic (in production, use more sophisticated parsing)
-        lines = response.split('\n')
-        current_section = None
-        
-        for line in lines:
-            line = line.strip()
-            if 'finding' in line.lower() or 'issue' in line.lower():
-                current_section = 'findings'
-            elif 'recommendation' in line.lower() or 'suggestion' in line.lower():
-                current_section = 'recommendations'
-            elif line.startswith('-') or line.startswith('•'):
-                if current_section == 'findings':
-                    findings.append(line[1:].strip())
-                elif current_section == 'recommendations':
-                    recommendations.append(line[1:].strip())
-        
-        # If no structured findings, extract from general response
-        if not findings and not recommendations:
-            # Split response into sentences and categorize
-            sentences = response.split('.')
-            for sentence in sentences:
-                sentence = sentence.strip()
-                if sentence and len(sentence) > 10:
-                    if any(word in sentence.lower() for word in ['problem', 'issue', 'cause', 'reason']):
-                        findings.append(sentence)
-                    elif any(word in sentence.lower() for word in ['should', 'recommend', 'suggest', 'action']):
-                        recommendations.append(sentence)
-        
-        return findings[:5], recommendations[:5], confidence_score
+        return InvestigationResult(
+            investigation_id=investigation_id,
+            package_id=package_id,
+            investigation_type=InvestigationType.ANOMALY_ANALYSIS,
+            findings=findings,
+            recommendations=recommendations,
+            confidence_score=cached.confidence_score,
+            priority=cached.priority,
+            estimated_resolution_time=cached.estimated_resolution_time,
+            next_actions=next_actions,
+            created_at=datetime.utcnow(),
+            latency_breakdown=latency
+        )
+    
+    def _result_from_rules(
+        self,
+        investigation_id: str,
+        package_id: str,
+        decision: RuleDecision,
+        latency: Dict[str, float]
+    ) -> InvestigationResult:
+        """Build a result from a rules engine decision"""
+        return InvestigationResult(
+            investigation_id=investigation_id,
+            package_id=package_id,
+            investigation_type=InvestigationType.ANOMALY_ANALYSIS,
+            findings=list(decision.findings),
+            recommendations=list(decision.recommendations),
+            confidence_score=decision.confidence,
+            priority=decision.priority,
+            estimated_resolution_time=decision.estimated_resolution_time,
+            next_actions=list(decision.next_actions),
+            created_at=datetime.utcnow(),
+            latency_breakdown=latency
+        )
+    
+    def _record_usage(
+        self,
+        tenant_id: str,
+        anomaly_data: Dict[str, Any],
+        source: str,
+        started: float,
+        usage_handler: Optional[UsageCallbackHandler] = None,
+        reserved: int = 0
+    ) -> Dict[str, Any]:
+        """Usage of an investigation (source: llm, rules, cache or budget); charges its tokens to the tenant"""
+        usage = usage_handler.summary() if usage_handler is not None else dict(EMPTY_USAGE, llm_latency_ms=[])
+        if reserved:
+            usage_ledger.settle(tenant_id, reserved, usage["total_tokens"])
+        else:
+            usage_ledger.add(tenant_id, usage["total_tokens"])
+        usage.update(
+            tenant_id=tenant_id,
+            anomaly_type=anomaly_data.get('anomaly_type') or "unknown",
+            source=source,
+            model=self.llm.model_name,
+            wall_time_ms=round((time.perf_counter() - started) * 1000, 1)
+        )
+        return usage
+    
+    def _parse_investigation_result(self, result: Dict[str, Any]) -> ParsedInvestigation:
+        """Parse agent result into structured format"""
+        return self.output_parser.parse(result.get("output", ""))
     
     def _determine_priority(self, anomaly_data: Dict[str, Any], confidence_score: float) -> str:
         """Determine investigation priority"""
@@ -377,6 +911,47 @@ Be concise and focus on actionable insights.
         
         return actions[:3]  # Limit to 3 actions
     
+    def _create_partial_result(
+        self,
+        investigation_id: str,
+        package_id: str,
+        anomaly_data: Dict[str, Any],
+        prefetched: Dict[str, Any],
+        callback_handler: InvestigationCallbackHandler,
+        latency: Dict[str, float]
+    ) -> InvestigationResult:
+        """Result of an investigation stopped at its token budget: the agent's reasoning so far and the prefetched facts"""
+        findings = []
+        for action in callback_handler.actions_taken:
+            thought = action["log"].split("Action:")[0].replace("Thought:", "").strip()
+            if thought:
+                findings.append(thought)
+        
+        signals = extract_signals(anomaly_data, prefetched)
+        location = signals.last_scan_location or "the last scan location"
+        if signals.weather_conditions:
+            findings.append(f"Weather at {location}: {signals.weather_conditions} ({signals.weather_impact or 'unknown'} impact)")
+        if signals.traffic_level:
+            findings.append(f"Traffic on the route is {signals.traffic_level} ({signals.traffic_delay or 'no'} delay)")
+        if signals.last_scan_age_hours is not None:
+            findings.append(f"Last scanned {signals.last_scan_age_hours} hours ago at {location}")
+        findings.append("Analysis incomplete: the token budget ran out before the agent finished")
+        
+        return InvestigationResult(
+            investigation_id=investigation_id,
+            package_id=package_id,
+            investigation_type=InvestigationType.ANOMALY_ANALYSIS,
+            findings=findings,
+            recommendations=["Review the partial findings", "Re-run the investigation when budget allows"],
+            confidence_score=0.0,
+            priority=self._determine_priority(anomaly_data, 0.0),
+            estimated_resolution_time="Unknown",
+            next_actions=["Escalate to human investigator"],
+            created_at=datetime.utcnow(),
+            latency_breakdown=latency,
+            budget_exhausted=True
+        )
+    
     def _create_error_result(self, investigation_id: str, package_id: str, error: str) -> InvestigationResult:
         """Create error result when investigation fails"""
         return InvestigationResult(
@@ -389,7 +964,8 @@ Be concise and focus on actionable insights.
             priority="high",
             estimated_resolution_time="Unknown",
             next_actions=["Escalate to human investigator"],
-            created_at=datetime.utcnow()
+            created_at=datetime.utcnow(),
+            error=error
         )
 
 # Global agent instance
@@ -5,15 +5,15 @@ This module provides LangChain-compatible tools that use the MCP server
 for standardized tool execution.
 """
 
-import asyncio
 import json
 import logging
 from typing import Dict, Any, Optional, List
 from langchain.tools import BaseTool
 from langchain.schema import BaseMessage
 
+from app.mcp.dispatch import agent_text
 from app.mcp.server import get_mcp_server
-from app.mcp.tools import ToolResult
+from app.services.async_bridge import async_bridge
 
 logger = logging.getLogger(__name__)
 
@@ -21,42 +21,50 @@ logger = logging.getLogger(__name__)
 class MCPTool(BaseTool):
     """Base class for MCP-based LangChain tools"""
     
-    def __init__(self, tool_name: str, description: str):
-        super().__init__()
-        self.tool_name = tool_name
-        self.description = description
+    # MCP tool to execute (defaults to the LangChain tool name)
+    tool_name: str = ""
+    mcp_server: Any = None
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.tool_name = self.tool_name or self.name
         self.mcp_server = get_mcp_server()
     
-    def _run(self, **kwargs) -> str:
-        """Synchronous execution - calls async version"""
-        return asyncio.run(self._arun(**kwargs))
-    
-    async def _arun(self, **kwargs) -> str:
-        """Asynchronous execution using MCP server"""
-        try:
-            result = await self.mcp_server.tool_registry.execute_tool_async(
-                self.tool_name, 
-                **kwargs
-            )
-            
-            if result.success:
-                return json.dumps(result.data, indent=2)
-            else:
-                return f"Error: {result.error}"
-                
-        except Exception as e:
-            logger.error(f"Error executing MCP tool {self.tool_name}: {e}")
-            return f"Error executing tool: {str(e)}"
+    def _run(self, *args, **kwargs) -> str:
+        """Synchronous execution - runs the async version on the shared loop"""
+        return async_bridge.run(self._arun(*args, **kwargs))
+    
+    async def _arun(self, *args, run_manager: Any = None, **kwargs) -> str:
+        """Asynchronous execution through the MCP dispatcher; the result is encoded once, compactly"""
+        result = await self.mcp_server.dispatcher.call(self.tool_name, self._arguments(args, kwargs))
+        return agent_text(result)
+    
+    def _arguments(self, args: tuple, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Tool arguments from keyword arguments or a ReAct Action Input string (a JSON object, else the first required argument)"""
+        if not args:
+            return kwargs
+        
+        text = str(args[0]).strip()
+        if text.startswith("{"):
+            try:
+                data = json.loads(text)
+            except ValueError:
+                data = None
+            if isinstance(data, dict):
+                return {**data, **kwargs}
+        
+        schema = self.mcp_server.tool_registry.catalog.schemas.get(self.tool_name, {})
+        names = schema.get("required") or list(schema.get("properties", {}))
+        if not names:
+            return kwargs
+        return {names[0]: text.strip("\"'` "), **kwargs}
 
 
 class MCPPackageDataTool(MCPTool):
     """MCP-based package data tool for LangChain"""
     
-    name = "get_package_data"
-    description = "Retrieve detailed package information including status, location, and tracking history"
-    
-    def __init__(self):
-        super().__init__("get_package_data", self.description)
+    name: str = "get_package_data"
+    description: str = "Retrieve detailed package information including status, location, and tracking history"
     
     def _run(self, package_id: str, include_events: bool = True) -> str:
         """Retrieve package data"""
@@ -66,11 +74,8 @@ class MCPPackageDataTool(MCPTool):
 class MCPWeatherDataTool(MCPTool):
     """MCP-based weather data tool for LangChain"""
     
-    name = "get_weather_data"
-    description = "Get current weather conditions for a specific location"
-    
-    def __init__(self):
-        super().__init__("get_weather_data", self.description)
+    name: str = "get_weather_data"
+    description: str = "Get current weather conditions for a specific location"
     
     def _run(self, location: str, units: str = "metric") -> str:
         """Get weather data for location"""
@@ -80,11 +85,8 @@ class MCPWeatherDataTool(MCPTool):
 class MCPTrafficDataTool(MCPTool):
     """MCP-based traffic data tool for LangChain"""
     
-    name = "get_traffic_data"
-    description = "Get current traffic conditions for a route"
-    
-    def __init__(self):
-        super().__init__("get_traffic_data", self.description)
+    name: str = "get_traffic_data"
+    description: str = 'Get current traffic conditions for a route; input: {"origin": ..., "destination": ...}'
     
     def _run(self, origin: str, destination: str, departure_time: str = "now") -> str:
         """Get traffic data for route"""
@@ -94,11 +96,8 @@ class MCPTrafficDataTool(MCPTool):
 class MCPFedExTrackingTool(MCPTool):
     """MCP-based FedEx tracking tool for LangChain"""
     
-    name = "fedex_tracking"
-    description = "Get real-time tracking information from FedEx"
-    
-    def __init__(self):
-        super().__init__("fedex_tracking", self.description)
+    name: str = "fedex_tracking"
+    description: str = "Get real-time tracking information from FedEx"
     
     def _run(self, tracking_number: str, include_events: bool = True) -> str:
         """Get FedEx tracking information"""
@@ -108,11 +107,8 @@ class MCPFedExTrackingTool(MCPTool):
 class MCPUPSTrackingTool(MCPTool):
     """MCP-based UPS tracking tool for LangChain"""
     
-    name = "ups_tracking"
-    description = "Get real-time tracking information from UPS"
-    
-    def __init__(self):
-        super().__init__("ups_tracking", self.description)
+    name: str = "ups_tracking"
+    description: str = "Get real-time tracking information from UPS"
     
     def _run(self, tracking_number: str, include_events: bool = True) -> str:
         """Get UPS tracking information"""
@@ -122,11 +118,8 @@ class MCPUPSTrackingTool(MCPTool):
 class MCPDHLTrackingTool(MCPTool):
     """MCP-based DHL tracking tool for LangChain"""
     
-    name = "dhl_tracking"
-    description = "Get real-time tracking information from DHL"
-    
-    def __init__(self):
-        super().__init__("dhl_tracking", self.description)
+    name: str = "dhl_tracking"
+    description: str = "Get real-time tracking information from DHL"
     
     def _run(self, tracking_number: str, include_events: bool = True) -> str:
         """Get DHL tracking information"""
@@ -0,0 +1,217 @@
+"""
+Investigation Output Parser
+
+Turns the agent's final answer into findings, recommendations, confidence
+and priority. The prompt asks for a JSON object matching
+INVESTIGATION_OUTPUT_SCHEMA; when the answer is not valid JSON, a section
+parser built on precompiled patterns reads "Findings:" / "Recommendations:"
+style text. Parse outcomes are counted so the failure rate can be watched.
+"""
+
+import json
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Any
+
+# Priorities the agent may assign
+PRIORITIES = ("low", "medium", "high", "critical")
+
+MAX_ITEMS = 5
+DEFAULT_CONFIDENCE = 0.7
+
+# JSON schema the final answer is asked to follow
+INVESTIGATION_OUTPUT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "findings": {"type": "array", "items": {"type": "string"}, "maxItems": MAX_ITEMS},
+        "recommendations": {"type": "array", "items": {"type": "string"}, "maxItems": MAX_ITEMS},
+        "next_actions": {"type": "array", "items": {"type": "string"}, "maxItems": 3},
+        "confidence": {"type": "number", "minimum": 0, "maximum": 1},
+        "priority": {"type": "string", "enum": list(PRIORITIES)},
+        "estimated_resolution_time": {"type": "string"}
+    },
+    "required": ["findings", "recommendations", "confidence", "priority"]
+}
+
+# Instruction appended to the investigation prompt
+STRUCTURED_OUTPUT_INSTRUCTIONS = (
+    "Your Final Answer must be a single JSON object (no prose, no code fences) matching this schema:\n"
+    + json.dumps(INVESTIGATION_OUTPUT_SCHEMA, separators=(",", ":"))
+)
+
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+_SECTION_HEADER = re.compile(
+    r"^\s*(?:#+\s*|\*\*)?(?P<name>findings?|issues?|root causes?|recommendations?|suggestions?|"
+    r"next actions?|actions?)\s*(?:\*\*)?\s*(?::\s*(?P<rest>.*)|$)",
+    re.IGNORECASE
+)
+_BULLET = re.compile(r"^\s*(?:[-•*]|\d+[.)])\s+(?P<text>.+)$")
+_CONFIDENCE = re.compile(r"confidence(?:\s+score)?\s*[:=]?\s*(?P<value>\d+(?:\.\d+)?)\s*(?P<percent>%)?", re.IGNORECASE)
+_PRIORITY = re.compile(r"priority\s*(?:level)?\s*[:=]?\s*\**(?P<value>low|medium|high|critical)\b", re.IGNORECASE)
+_RESOLUTION_TIME = re.compile(r"resolution time\s*[:=]?\s*(?P<value>[^\n.;]+)", re.IGNORECASE)
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+_FINDING_WORDS = re.compile(r"\b(?:problem|issue|cause|reason|due to|because)\b", re.IGNORECASE)
+_RECOMMENDATION_WORDS = re.compile(r"\b(?:should|recommend|suggest|action|contact|reroute|notify)\b", re.IGNORECASE)
+
+_SECTIONS = {
+    "finding": "findings", "issue": "findings", "root cause": "findings",
+    "recommendation": "recommendations", "suggestion": "recommendations",
+    "next action": "next_actions", "action": "next_actions"
+}
+
+
+@dataclass
+class ParsedInvestigation:
+    """Structured fields read from the agent's answer"""
+    findings: List[str] = field(default_factory=list)
+    recommendations: List[str] = field(default_factory=list)
+    next_actions: List[str] = field(default_factory=list)
+    confidence: Optional[float] = None
+    priority: Optional[str] = None
+    estimated_resolution_time: Optional[str] = None
+    method: str = "failed"  # json, sections, sentences or failed
+
+
+def _clean_items(items: Any, limit: int = MAX_ITEMS) -> List[str]:
+    if not isinstance(items, list):
+        return []
+    return [str(item).strip() for item in items if str(item).strip()][:limit]
+
+
+def _clamp_confidence(value: Any) -> Optional[float]:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if value > 1:
+        value = value / 100  # "85" meant as a percentage
+    return max(0.0, min(1.0, value))
+
+
+class InvestigationOutputParser:
+    """Parses final answers, JSON first, with counters per outcome"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {"json": 0, "sections": 0, "sentences": 0, "failed": 0}
+    
+    def parse(self, text: str) -> ParsedInvestigation:
+        """Parse an answer and record how it was parsed"""
+        parsed = self._parse_json(text) or self._parse_sections(text) or self._parse_sentences(text)
+        if parsed is None:
+            parsed = ParsedInvestigation()
+        
+        with self._lock:
+            self._stats[parsed.method] += 1
+        return parsed
+    
+    def _parse_json(self, text: str) -> Optional[ParsedInvestigation]:
+        """Read the JSON object the structured-output prompt asks for"""
+        match = _JSON_OBJECT.search(text)
+        if not match:
+            return None
+        try:
+            data = json.loads(match.group(0))
+        except ValueError:
+            return None
+        if not isinstance(data, dict):
+            return None
+        
+        findings = _clean_items(data.get("findings"))
+        recommendations = _clean_items(data.get("recommendations"))
+        if not findings and not recommendations:
+            return None
+        
+        priority = str(data.get("priority", "")).strip().lower()
+        resolution_time = data.get("estimated_resolution_time")
+        return ParsedInvestigation(
+            findings=findings,
+            recommendations=recommendations,
+            next_actions=_clean_items(data.get("next_actions"), 3),
+            confidence=_clamp_confidence(data.get("confidence")),
+            priority=priority if priority in PRIORITIES else None,
+            estimated_resolution_time=str(resolution_time).strip() if resolution_time else None,
+            method="json"
+        )
+    
+    def _parse_sections(self, text: str) -> Optional[ParsedInvestigation]:
+        """Read bulleted items under Findings / Recommendations / Next actions headers"""
+        sections: Dict[str, List[str]] = {"findings": [], "recommendations": [], "next_actions": []}
+        current = None
+        
+        for line in text.splitlines():
+            header = _SECTION_HEADER.match(line)
+            if header:
+                name = header.group("name").lower().rstrip("s")
+                current = _SECTIONS.get(name, current)
+                # "Findings: weather delay at hub" carries an item on the header line
+                rest = (header.group("rest") or "").strip(" *")
+                if current and rest and not _BULLET.match(rest):
+                    sections[current].append(rest)
+                continue
+            
+            bullet = _BULLET.match(line)
+            if bullet and current:
+                sections[current].append(bullet.group("text").strip())
+        
+        if not sections["findings"] and not sections["recommendations"]:
+            return None
+        
+        parsed = ParsedInvestigation(
+            findings=sections["findings"][:MAX_ITEMS],
+            recommendations=sections["recommendations"][:MAX_ITEMS],
+            next_actions=sections["next_actions"][:3],
+            method="sections"
+        )
+        self._read_scalars(text, parsed)
+        return parsed
+    
+    def _parse_sentences(self, text: str) -> Optional[ParsedInvestigation]:
+        """Last resort: classify free-text sentences by keywords"""
+        findings, recommendations = [], []
+        for sentence in _SENTENCE_SPLIT.split(text):
+            sentence = sentence.strip()
+            if len(sentence) <= 10:
+                continue
+            if _FINDING_WORDS.search(sentence):
+                findings.append(sentence)
+            elif _RECOMMENDATION_WORDS.search(sentence):
+                recommendations.append(sentence)
+        
+        if not findings and not recommendations:
+            return None
+        
+        parsed = ParsedInvestigation(
+            findings=findings[:MAX_ITEMS],
+            recommendations=recommendations[:MAX_ITEMS],
+            method="sentences"
+        )
+        self._read_scalars(text, parsed)
+        return parsed
+    
+    def _read_scalars(self, text: str, parsed: ParsedInvestigation):
+        """Pick up "Confidence: 0.8", "Priority: high" and "Resolution time: ..." lines"""
+        confidence = _CONFIDENCE.search(text)
+        if confidence:
+            value = float(confidence.group("value"))
+            parsed.confidence = _clamp_confidence(value / 100 if confidence.group("percent") else value)
+        
+        priority = _PRIORITY.search(text)
+        if priority:
+            parsed.priority = priority.group("value").lower()
+        
+        resolution_time = _RESOLUTION_TIME.search(text)
+        if resolution_time:
+            parsed.estimated_resolution_time = resolution_time.group("value").strip()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get parse outcome counters and the failure rate"""
+        with self._lock:
+            stats = dict(self._stats)
+        
+        total = sum(stats.values())
+        stats["total"] = total
+        stats["structured_rate"] = round(stats["json"] / total, 3) if total else 0.0
+        stats["failure_rate"] = round(stats["failed"] / total, 3) if total else 0.0
+        return stats
@@ -0,0 +1,261 @@
+"""
+Investigation Result Cache
+
+Caches the LLM's analysis of an anomaly so near-identical investigations skip
+the agent run. Entries are keyed by a normalized fingerprint of the anomaly
+and its prefetched context (exact tier); optionally, a miss falls back to a
+cosine-similarity search over hashed token vectors of the same fingerprint
+(similarity tier), restricted to entries with the same anomaly type,
+severity, location and destination.
+"""
+
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Any, Tuple
+
+# Cache configuration
+CACHE_ENABLED = os.getenv("AGENT_CACHE_ENABLED", "true").lower() == "true"
+CACHE_TTL = int(os.getenv("AGENT_CACHE_TTL", "3600"))  # seconds
+CACHE_MAX_ENTRIES = int(os.getenv("AGENT_CACHE_MAX_ENTRIES", "500"))
+CACHE_MIN_CONFIDENCE = float(os.getenv("AGENT_CACHE_MIN_CONFIDENCE", "0.6"))
+SIMILARITY_ENABLED = os.getenv("AGENT_CACHE_SIMILARITY", "true").lower() == "true"
+SIMILARITY_THRESHOLD = float(os.getenv("AGENT_CACHE_SIMILARITY_THRESHOLD", "0.9"))
+
+# Dimensions of the hashed token vectors
+VECTOR_DIMENSIONS = 2048
+
+# Fingerprint fields a similar entry must match exactly: findings name places,
+# and location tokens alone move the cosine too little to keep cities apart
+BUCKET_FIELDS = ("anomaly_type", "severity", "location", "destination")
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_DIGITS_PATTERN = re.compile(r"\d+")
+_SPACE_PATTERN = re.compile(r"\s+")
+
+
+def _normalize(value: Any) -> str:
+    """Casefold, collapse whitespace and mask numbers ("48h" and "36h" read the same)"""
+    text = _SPACE_PATTERN.sub(" ", str(value or "")).strip().casefold()
+    return _DIGITS_PATTERN.sub("#", text)
+
+
+def build_fingerprint(anomaly_data: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, str]:
+    """Pick the inputs that drive the analysis from the anomaly and its prefetched context"""
+    weather = context.get("weather") or {}
+    traffic = context.get("traffic") or {}
+    package = context.get("package") or {}
+    
+    return {
+        "anomaly_type": _normalize(anomaly_data.get("anomaly_type")),
+        "severity": _normalize(anomaly_data.get("severity")),
+        "location": _normalize(anomaly_data.get("last_scan_location") or anomaly_data.get("location")),
+        "destination": _normalize(anomaly_data.get("destination") or package.get("destination")),
+        "status": _normalize(anomaly_data.get("current_status") or package.get("status")),
+        "description": _normalize(anomaly_data.get("description")),
+        "weather": _normalize(weather.get("conditions")),
+        "weather_impact": _normalize(weather.get("weather_impact")),
+        "traffic": _normalize(traffic.get("traffic_level"))
+    }
+
+
+def hash_vector(text: str) -> Dict[int, float]:
+    """L2-normalized hashed bag of unigrams and bigrams"""
+    tokens = _TOKEN_PATTERN.findall(text)
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    
+    vector: Dict[int, float] = {}
+    for feature in features:
+        digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], "little") % VECTOR_DIMENSIONS
+        sign = 1.0 if digest[4] & 1 else -1.0
+        vector[index] = vector.get(index, 0.0) + sign
+    
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    if norm:
+        vector = {index: value / norm for index, value in vector.items()}
+    return vector
+
+
+def cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    """Cosine similarity of two normalized sparse vectors"""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(index, 0.0) for index, value in a.items())
+
+
+@dataclass
+class CachedAnalysis:
+    """LLM analysis stored for reuse"""
+    package_id: str
+    bucket: Tuple[str, str, str, str]  # BUCKET_FIELDS values
+    vector: Dict[int, float]
+    findings: List[str]
+    recommendations: List[str]
+    confidence_score: float
+    priority: str
+    estimated_resolution_time: Optional[str]
+    next_actions: List[str]
+    tokens: int
+    expires_at: float
+
+
+class InvestigationCache:
+    """Exact plus similarity cache of LLM investigation analyses"""
+    
+    def __init__(
+        self,
+        ttl: int = CACHE_TTL,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        min_confidence: float = CACHE_MIN_CONFIDENCE,
+        similarity_enabled: bool = SIMILARITY_ENABLED,
+        similarity_threshold: float = SIMILARITY_THRESHOLD,
+        enabled: bool = CACHE_ENABLED
+    ):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.min_confidence = min_confidence
+        self.similarity_enabled = similarity_enabled
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[str, CachedAnalysis]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "exact_hits": 0,
+            "similar_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "skipped_low_confidence": 0,
+            "evictions": 0,
+            "tokens_saved": 0
+        }
+    
+    @staticmethod
+    def make_bucket(fingerprint: Dict[str, str]) -> Tuple[str, str, str, str]:
+        """Exact-match fields a similarity hit must share"""
+        return tuple(fingerprint[name] for name in BUCKET_FIELDS)
+    
+    @staticmethod
+    def make_key(fingerprint: Dict[str, str]) -> str:
+        """Stable key for a fingerprint"""
+        text = "|".join(f"{name}={fingerprint[name]}" for name in sorted(fingerprint))
+        return hashlib.sha256(text.encode()).hexdigest()
+    
+    def lookup(
+        self,
+        fingerprint: Dict[str, str]
+    ) -> Tuple[Optional[CachedAnalysis], Optional[str], float]:
+        """Find a cached analysis; returns (entry, tier, similarity)"""
+        if not self.enabled:
+            return None, None, 0.0
+        
+        key = self.make_key(fingerprint)
+        now = time.monotonic()
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self._stats["exact_hits"] += 1
+                self._stats["tokens_saved"] += entry.tokens
+                return entry, "exact", 1.0
+            
+            if self.similarity_enabled:
+                bucket = self.make_bucket(fingerprint)
+                vector = hash_vector(" ".join(fingerprint.values()))
+                best, best_key, best_score = None, None, 0.0
+                for candidate_key, candidate in self._entries.items():
+                    if candidate.bucket != bucket or candidate.expires_at <= now:
+                        continue
+                    score = cosine(vector, candidate.vector)
+                    if score > best_score:
+                        best, best_key, best_score = candidate, candidate_key, score
+                
+                if best is not None and best_score >= self.similarity_threshold:
+                    self._entries.move_to_end(best_key)
+                    self._stats["similar_hits"] += 1
+                    self._stats["tokens_saved"] += best.tokens
+                    return best, "similar", round(best_score, 3)
+            
+            self._stats["misses"] += 1
+            return None, None, 0.0
+    
+    def store(
+        self,
+        fingerprint: Dict[str, str],
+        package_id: str,
+        findings: List[str],
+        recommendations: List[str],
+        confidence_score: float,
+        priority: str,
+        estimated_resolution_time: Optional[str],
+        next_actions: List[str],
+        tokens: int
+    ):
+        """Cache an analysis if it is confident enough to reuse"""
+        if not self.enabled:
+            return
+        
+        if confidence_score < self.min_confidence or not (findings or recommendations):
+            with self._lock:
+                self._stats["skipped_low_confidence"] += 1
+            return
+        
+        key = self.make_key(fingerprint)
+        entry = CachedAnalysis(
+            package_id=package_id,
+            bucket=self.make_bucket(fingerprint),
+            vector=hash_vector(" ".join(fingerprint.values())) if self.similarity_enabled else {},
+            findings=list(findings),
+            recommendations=list(recommendations),
+            confidence_score=confidence_score,
+            priority=priority,
+            estimated_resolution_time=estimated_resolution_time,
+            next_actions=list(next_actions),
+            tokens=tokens,
+            expires_at=time.monotonic() + self.ttl
+        )
+        
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._stats["stores"] += 1
+            self._evict()
+    
+    def _evict(self):
+        """Drop expired entries, then the least recently used beyond the limit"""
+        now = time.monotonic()
+        for key in [key for key, entry in self._entries.items() if entry.expires_at <= now]:
+            del self._entries[key]
+            self._stats["evictions"] += 1
+        
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+    
+    def clear(self) -> int:
+        """Drop all entries"""
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            return count
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and tokens saved"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        
+        hits = stats["exact_hits"] + stats["similar_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = round(hits / lookups, 3) if lookups else 0.0
+        stats["enabled"] = self.enabled
+        stats["similarity_enabled"] = self.similarity_enabled
+        stats["similarity_threshold"] = self.similarity_threshold
+        stats["ttl"] = self.ttl
+        return stats
@@ -0,0 +1,302 @@
+"""
+Investigation Rules Engine
+
+Deterministic fast path in front of the LLM agent. Cheap signals (status,
+last scan age, the weather and traffic assessments from the prefetched tool
+results, priority) are matched against rules for anomalies whose resolution
+is well known. A confident, unambiguous match answers the investigation
+directly; anything else escalates to the agent. Outcomes are counted so the
+fraction of investigations short-circuited can be watched.
+"""
+
+import os
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Any
+
+# Rules engine configuration
+RULES_ENABLED = os.getenv("AGENT_RULES_ENABLED", "true").lower() == "true"
+RULES_MIN_CONFIDENCE = float(os.getenv("AGENT_RULES_MIN_CONFIDENCE", "0.8"))
+STALE_SCAN_HOURS = float(os.getenv("AGENT_RULES_STALE_SCAN_HOURS", "48"))
+
+# Packages at these priorities always get the agent's full analysis
+ESCALATE_PRIORITIES = {"critical"}
+
+PRIORITY_ORDER = ["low", "medium", "high", "critical"]
+
+
+@dataclass
+class Signals:
+    """Cheap inputs the rules are evaluated on"""
+    anomaly_type: str
+    severity: str
+    status: str
+    priority: str
+    last_scan_location: str
+    last_scan_age_hours: Optional[float]
+    weather_impact: Optional[str]  # high, moderate, none
+    weather_conditions: str
+    traffic_level: Optional[str]  # heavy, moderate, light
+    traffic_delay: str
+    
+    @property
+    def is_delay_report(self) -> bool:
+        return "delay" in self.anomaly_type
+    
+    @property
+    def is_delay(self) -> bool:
+        # A delivered package is no longer delayed, whatever the report says
+        return self.is_delay_report and self.status != "delivered"
+    
+    @property
+    def is_lost_report(self) -> bool:
+        return "lost" in self.anomaly_type
+
+
+@dataclass
+class RuleDecision:
+    """Answer produced by a matching rule"""
+    rule: str
+    findings: List[str]
+    recommendations: List[str]
+    next_actions: List[str]
+    confidence: float
+    priority: str
+    estimated_resolution_time: str
+
+
+@dataclass
+class RulesOutcome:
+    """Result of evaluating the rules for one investigation"""
+    decision: Optional[RuleDecision] = None
+    reason: str = "no_match"  # short_circuit, no_match, low_confidence, ambiguous, escalated_priority, disabled
+    matched: List[str] = field(default_factory=list)
+
+
+def _text(value: Any) -> str:
+    return str(value or "").strip()
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    """Read a datetime or ISO string as naive UTC"""
+    if isinstance(value, datetime):
+        timestamp = value
+    else:
+        try:
+            timestamp = datetime.fromisoformat(_text(value).replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def _weather_impact(weather: Dict[str, Any]) -> Optional[str]:
+    """Map WeatherDataTool's impact assessment to high / moderate / none"""
+    impact = _text(weather.get("weather_impact")).lower()
+    if not impact:
+        return None
+    if impact.startswith("high"):
+        return "high"
+    if impact.startswith("moderate"):
+        return "moderate"
+    return "none"
+
+
+def extract_signals(anomaly_data: Dict[str, Any], context: Dict[str, Any], now: Optional[datetime] = None) -> Signals:
+    """Collect the rule inputs from the anomaly report and its prefetched context"""
+    package = context.get("package") or {}
+    weather = context.get("weather") or {}
+    traffic = context.get("traffic") or {}
+    now = now or datetime.utcnow()
+    
+    last_scan = _parse_timestamp(anomaly_data.get("last_scan_time") or package.get("last_scan_time"))
+    last_scan_age = round((now - last_scan).total_seconds() / 3600, 1) if last_scan else None
+    
+    return Signals(
+        anomaly_type=_text(anomaly_data.get("anomaly_type")).lower(),
+        severity=_text(anomaly_data.get("severity")).lower(),
+        status=_text(anomaly_data.get("current_status") or package.get("status")).lower(),
+        priority=_text(anomaly_data.get("priority") or package.get("priority")).lower(),
+        last_scan_location=_text(
+            anomaly_data.get("last_scan_location") or anomaly_data.get("location") or package.get("last_scan_location")
+        ),
+        last_scan_age_hours=last_scan_age,
+        weather_impact=_weather_impact(weather),
+        weather_conditions=_text(weather.get("conditions")),
+        traffic_level=_text(traffic.get("traffic_level")).lower() or None,
+        traffic_delay=_text(traffic.get("current_delay"))
+    )
+
+
+class RulesEngine:
+    """Evaluates the fast-path rules and counts how often they answer"""
+    
+    def __init__(
+        self,
+        min_confidence: float = RULES_MIN_CONFIDENCE,
+        stale_scan_hours: float = STALE_SCAN_HOURS,
+        enabled: bool = RULES_ENABLED
+    ):
+        self.enabled = enabled
+        self.min_confidence = min_confidence
+        self.stale_scan_hours = stale_scan_hours
+        self.rules = [
+            self._already_delivered,
+            self._weather_and_traffic_delay,
+            self._weather_delay,
+            self._traffic_delay,
+            self._stale_scan
+        ]
+        self._lock = threading.Lock()
+        self._stats = {
+            "evaluated": 0,
+            "short_circuit": 0,
+            "no_match": 0,
+            "low_confidence": 0,
+            "ambiguous": 0,
+            "escalated_priority": 0
+        }
+        self._rule_hits: Dict[str, int] = {}
+    
+    def evaluate(self, anomaly_data: Dict[str, Any], context: Dict[str, Any]) -> RulesOutcome:
+        """Answer directly when exactly one confident rule explains the anomaly"""
+        if not self.enabled:
+            return RulesOutcome(reason="disabled")
+        
+        signals = extract_signals(anomaly_data, context)
+        decisions = [decision for decision in (rule(signals) for rule in self.rules) if decision is not None]
+        matched = [decision.rule for decision in decisions]
+        
+        if not decisions:
+            outcome = RulesOutcome(reason="no_match")
+        elif signals.priority in ESCALATE_PRIORITIES or signals.severity in ESCALATE_PRIORITIES:
+            outcome = RulesOutcome(reason="escalated_priority", matched=matched)
+        elif len(decisions) > 1:
+            # Competing explanations (e.g. a stale scan during bad weather) need the agent
+            outcome = RulesOutcome(reason="ambiguous", matched=matched)
+        elif decisions[0].confidence < self.min_confidence:
+            outcome = RulesOutcome(reason="low_confidence", matched=matched)
+        else:
+            outcome = RulesOutcome(decision=decisions[0], reason="short_circuit", matched=matched)
+        
+        with self._lock:
+            self._stats["evaluated"] += 1
+            self._stats[outcome.reason] += 1
+            if outcome.decision is not None:
+                rule = outcome.decision.rule
+                self._rule_hits[rule] = self._rule_hits.get(rule, 0) + 1
+        return outcome
+    
+    def _priority(self, signals: Signals, floor: str) -> str:
+        """Highest of the rule's floor, the package priority and the anomaly severity"""
+        ranks = [PRIORITY_ORDER.index(value) for value in (floor, signals.priority, signals.severity) if value in PRIORITY_ORDER]
+        return PRIORITY_ORDER[max(ranks)]
+    
+    def _already_delivered(self, signals: Signals) -> Optional[RuleDecision]:
+        """The package was delivered after a delay was reported (damage, loss or security reports still need the agent)"""
+        if signals.status != "delivered" or not signals.is_delay_report:
+            return None
+        return RuleDecision(
+            rule="already_delivered",
+            findings=["Package status is delivered; the reported anomaly no longer applies"],
+            recommendations=["Close the anomaly and confirm delivery with the customer if they reported it"],
+            next_actions=["Close anomaly as resolved"],
+            confidence=0.95,
+            priority=self._priority(signals, "low"),
+            estimated_resolution_time="Resolved"
+        )
+    
+    def _weather_and_traffic_delay(self, signals: Signals) -> Optional[RuleDecision]:
+        """Delay with both severe weather and heavy traffic on the route"""
+        if not (signals.is_delay and signals.weather_impact == "high" and signals.traffic_level == "heavy"):
+            return None
+        return RuleDecision(
+            rule="weather_and_traffic_delay",
+            findings=[
+                f"Severe weather ({signals.weather_conditions or 'high impact'}) at {signals.last_scan_location or 'the last scan location'}",
+                f"Heavy traffic on the route (current delay {signals.traffic_delay or 'unknown'})"
+            ],
+            recommendations=[
+                "Update the customer with a revised delivery estimate",
+                "Reroute via an alternative route once conditions allow",
+                "Monitor weather and traffic until the package moves"
+            ],
+            next_actions=["Update customer with new timeline", "Initiate package rerouting", "Increase monitoring frequency"],
+            confidence=0.85,
+            priority=self._priority(signals, "high"),
+            estimated_resolution_time="4-8 hours"
+        )
+    
+    def _weather_delay(self, signals: Signals) -> Optional[RuleDecision]:
+        """Delay explained by the weather at the last scan location"""
+        if not signals.is_delay or signals.weather_impact not in ("high", "moderate") or signals.traffic_level == "heavy":
+            return None
+        location = signals.last_scan_location or "the last scan location"
+        return RuleDecision(
+            rule="weather_delay",
+            findings=[f"{signals.weather_conditions or 'Adverse weather'} at {location} is delaying the package"],
+            recommendations=[
+                "Update the customer with a revised delivery estimate",
+                "Monitor conditions and resume normal routing when the weather clears"
+            ],
+            next_actions=["Update customer with new timeline", "Increase monitoring frequency"],
+            # A moderate impact rarely explains a delay on its own
+            confidence=0.9 if signals.weather_impact == "high" else 0.65,
+            priority=self._priority(signals, "medium"),
+            estimated_resolution_time="2-4 hours"
+        )
+    
+    def _traffic_delay(self, signals: Signals) -> Optional[RuleDecision]:
+        """Delay explained by heavy traffic on the route"""
+        if not signals.is_delay or signals.traffic_level != "heavy" or signals.weather_impact == "high":
+            return None
+        return RuleDecision(
+            rule="traffic_delay",
+            findings=[f"Heavy traffic on the route (current delay {signals.traffic_delay or 'unknown'})"],
+            recommendations=[
+                "Reroute via an alternative route if one is available",
+                "Update the customer with a revised delivery estimate"
+            ],
+            next_actions=["Initiate package rerouting", "Update customer with new timeline"],
+            confidence=0.85,
+            priority=self._priority(signals, "medium"),
+            estimated_resolution_time="1-2 hours"
+        )
+    
+    def _stale_scan(self, signals: Signals) -> Optional[RuleDecision]:
+        """No scan for a long time while a delayed or missing package should be moving"""
+        if (
+            not (signals.is_delay or signals.is_lost_report)
+            or signals.last_scan_age_hours is None
+            or signals.last_scan_age_hours < self.stale_scan_hours
+            or signals.status in ("delivered", "lost")
+        ):
+            return None
+        return RuleDecision(
+            rule="stale_scan",
+            findings=[
+                f"No scan for {signals.last_scan_age_hours:.0f} hours since {signals.last_scan_location or 'the last scan'}"
+            ],
+            recommendations=[
+                "Contact the carrier to trace the package from its last scan location",
+                "Update the customer that the package is being traced"
+            ],
+            next_actions=["Contact carrier for immediate assistance", "Update customer with new timeline"],
+            confidence=0.8,
+            priority=self._priority(signals, "high"),
+            estimated_resolution_time="4-8 hours"
+        )
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get outcome counters and the short-circuit rate"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["rule_hits"] = dict(self._rule_hits)
+        
+        evaluated = stats["evaluated"]
+        stats["short_circuit_rate"] = round(stats["short_circuit"] / evaluated, 3) if evaluated else 0.0
+        stats["enabled"] = self.enabled
+        stats["min_confidence"] = self.min_confidence
+        return stats
@@ -0,0 +1,273 @@
+"""
+Investigation Usage Accounting
+
+Records what each investigation actually consumed (prompt and completion
+tokens per LLM call, LLM latency, tool calls, wall time, cost) through a
+LangChain callback handler, and enforces token budgets: a per-investigation
+budget by anomaly type, checked before every LLM call, and a daily budget
+per tenant, reserved before an investigation reaches the LLM and settled to
+the actual spend afterwards.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Any
+
+from langchain.callbacks.base import BaseCallbackHandler
+
+# Pricing of the agent's model, USD per 1K tokens
+PROMPT_COST_PER_1K = float(os.getenv("LLM_PROMPT_COST_PER_1K", "0.0005"))
+COMPLETION_COST_PER_1K = float(os.getenv("LLM_COMPLETION_COST_PER_1K", "0.0015"))
+
+
+def _load_budgets(name: str, default: Dict[str, int]) -> Dict[str, int]:
+    """Read a JSON object of token budgets from the environment"""
+    raw = os.getenv(name)
+    if not raw:
+        return dict(default)
+    try:
+        return {str(key): int(value) for key, value in json.loads(raw).items()}
+    except (ValueError, TypeError, AttributeError):
+        print(f"⚠️ Ignoring invalid {name}: {raw}")
+        return dict(default)
+
+
+# Tokens one investigation may spend, by anomaly type ("default" for the rest)
+INVESTIGATION_TOKEN_BUDGETS = _load_budgets("AGENT_TOKEN_BUDGETS", {"default": 8000})
+
+# Tokens a tenant may spend per UTC day, with per-tenant overrides
+TENANT_DAILY_TOKEN_BUDGET = int(os.getenv("AGENT_TENANT_DAILY_TOKEN_BUDGET", "500000"))
+TENANT_TOKEN_BUDGETS = _load_budgets("AGENT_TENANT_TOKEN_BUDGETS", {})
+
+# Tenant used when a request carries no identity
+DEFAULT_TENANT = "default"
+
+
+class TokenBudgetExceeded(Exception):
+    """Raised when an LLM call would take an investigation or tenant over budget"""
+    
+    def __init__(self, scope: str, key: str, used: int, budget: int):
+        self.scope = scope
+        self.key = key
+        self.used = used
+        self.budget = budget
+        super().__init__(f"{scope} token budget exceeded for {key}: {used}/{budget} tokens")
+
+
+def investigation_budget(anomaly_type: Optional[str]) -> int:
+    """Per-investigation token budget for an anomaly type"""
+    return INVESTIGATION_TOKEN_BUDGETS.get(anomaly_type or "", INVESTIGATION_TOKEN_BUDGETS.get("default", 8000))
+
+
+def estimate_cost(prompt_tokens: int, completion_tokens: int) -> float:
+    """Cost in USD of the given token counts"""
+    return round(prompt_tokens / 1000 * PROMPT_COST_PER_1K + completion_tokens / 1000 * COMPLETION_COST_PER_1K, 6)
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """Counts tokens, LLM latency and tool calls for one investigation and stops it at its budget"""
+    
+    # Let TokenBudgetExceeded propagate and abort the agent run
+    raise_error = True
+    
+    def __init__(
+        self,
+        budget: int,
+        count_tokens: Callable[[str], int],
+        max_completion_tokens: int,
+        budget_scope: str = "investigation",
+        budget_key: str = "this investigation"
+    ):
+        self.budget = budget
+        self.budget_scope = budget_scope
+        self.budget_key = budget_key
+        self.count_tokens = count_tokens
+        self.max_completion_tokens = max_completion_tokens
+        self.calls: List[Dict[str, Any]] = []
+        self.tool_calls = 0
+        self.budget_exceeded = False
+        self._pending: Dict[Any, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+    
+    @property
+    def prompt_tokens(self) -> int:
+        return sum(call["prompt_tokens"] for call in self.calls)
+    
+    @property
+    def completion_tokens(self) -> int:
+        return sum(call["completion_tokens"] for call in self.calls)
+    
+    def _start(self, prompt_text: str, run_id: Any):
+        """Count the prompt and refuse the call if its worst case does not fit the budget"""
+        prompt_tokens = self.count_tokens(prompt_text)
+        with self._lock:
+            committed = self.prompt_tokens + self.completion_tokens
+            committed += sum(pending["prompt_tokens"] for pending in self._pending.values())
+            if committed + prompt_tokens + self.max_completion_tokens > self.budget:
+                self.budget_exceeded = True
+                raise TokenBudgetExceeded(self.budget_scope, self.budget_key, committed + prompt_tokens, self.budget)
+            self._pending[run_id] = {"prompt_tokens": prompt_tokens, "started": time.perf_counter()}
+    
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kwargs) -> None:
+        """Called when the LLM is invoked"""
+        self._start("\n".join(prompts), kwargs.get("run_id"))
+    
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[Any], **kwargs) -> None:
+        """Called when the chat model is invoked"""
+        self._start(
+            "\n".join(str(message.content) for batch in messages for message in batch),
+            kwargs.get("run_id")
+        )
+    
+    def on_llm_end(self, response: Any, **kwargs) -> None:
+        """Record the call, preferring the provider's usage (absent when streaming) over local counts"""
+        with self._lock:
+            pending = self._pending.pop(kwargs.get("run_id"), None)
+        if pending is None:
+            return
+        
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        completion_text = "".join(
+            generation.text for generations in response.generations for generation in generations
+        )
+        call = {
+            "prompt_tokens": usage.get("prompt_tokens") or pending["prompt_tokens"],
+            "completion_tokens": usage.get("completion_tokens") or self.count_tokens(completion_text),
+            "latency_ms": round((time.perf_counter() - pending["started"]) * 1000, 1),
+            "reported": bool(usage)
+        }
+        with self._lock:
+            self.calls.append(call)
+    
+    def on_llm_error(self, error: BaseException, **kwargs) -> None:
+        """A failed call is charged its prompt"""
+        with self._lock:
+            pending = self._pending.pop(kwargs.get("run_id"), None)
+            if pending is not None:
+                self.calls.append({
+                    "prompt_tokens": pending["prompt_tokens"],
+                    "completion_tokens": 0,
+                    "latency_ms": round((time.perf_counter() - pending["started"]) * 1000, 1),
+                    "reported": False
+                })
+    
+    def on_tool_end(self, output: str, **kwargs) -> None:
+        """Called when a tool finishes"""
+        self.tool_calls += 1
+    
+    def on_tool_error(self, error: BaseException, **kwargs) -> None:
+        """Called when a tool raises"""
+        self.tool_calls += 1
+    
+    def summary(self) -> Dict[str, Any]:
+        """Totals for the investigation"""
+        with self._lock:
+            calls = list(self.calls)
+        prompt_tokens = sum(call["prompt_tokens"] for call in calls)
+        completion_tokens = sum(call["completion_tokens"] for call in calls)
+        return {
+            "llm_calls": len(calls),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "llm_latency_ms": [call["latency_ms"] for call in calls],
+            "tool_calls": self.tool_calls,
+            "cost_usd": estimate_cost(prompt_tokens, completion_tokens),
+            "budget": self.budget,
+            "budget_exceeded": self.budget_exceeded
+        }
+
+
+# Usage of an investigation answered without the LLM
+EMPTY_USAGE = {
+    "llm_calls": 0,
+    "prompt_tokens": 0,
+    "completion_tokens": 0,
+    "total_tokens": 0,
+    "llm_latency_ms": [],
+    "tool_calls": 0,
+    "cost_usd": 0.0,
+    "budget": 0,
+    "budget_exceeded": False
+}
+
+
+class TenantUsageLedger:
+    """Tokens spent per tenant in the current UTC day"""
+    
+    def __init__(
+        self,
+        daily_budget: int = TENANT_DAILY_TOKEN_BUDGET,
+        budgets: Optional[Dict[str, int]] = None
+    ):
+        self.daily_budget = daily_budget
+        self.budgets = dict(TENANT_TOKEN_BUDGETS if budgets is None else budgets)
+        self._day = datetime.utcnow().date()
+        self._used: Dict[str, int] = {}
+        self._lock = threading.Lock()
+    
+    def _roll_over(self):
+        today = datetime.utcnow().date()
+        if today != self._day:
+            self._day = today
+            self._used.clear()
+    
+    def budget_for(self, tenant_id: str) -> int:
+        return self.budgets.get(tenant_id, self.daily_budget)
+    
+    def remaining(self, tenant_id: str) -> int:
+        """Tokens the tenant may still spend today"""
+        with self._lock:
+            self._roll_over()
+            return max(0, self.budget_for(tenant_id) - self._used.get(tenant_id, 0))
+    
+    def add(self, tenant_id: str, tokens: int):
+        """Charge tokens to a tenant"""
+        if tokens <= 0:
+            return
+        with self._lock:
+            self._roll_over()
+            self._used[tenant_id] = self._used.get(tenant_id, 0) + tokens
+    
+    def reserve(self, tenant_id: str, tokens: int) -> int:
+        """Set aside up to `tokens` of what the tenant has left for a run; returns the tokens reserved"""
+        with self._lock:
+            self._roll_over()
+            reserved = max(0, min(tokens, self.budget_for(tenant_id) - self._used.get(tenant_id, 0)))
+            if reserved:
+                self._used[tenant_id] = self._used.get(tenant_id, 0) + reserved
+            return reserved
+    
+    def settle(self, tenant_id: str, reserved: int, tokens: int):
+        """Replace a run's reservation with the tokens it actually spent"""
+        with self._lock:
+            self._roll_over()
+            self._used[tenant_id] = max(0, self._used.get(tenant_id, 0) - reserved + tokens)
+    
+    def seed(self, used: Dict[str, int]):
+        """Restore today's usage (e.g. from the usage table after a restart)"""
+        with self._lock:
+            self._roll_over()
+            for tenant_id, tokens in used.items():
+                self._used[tenant_id] = max(self._used.get(tenant_id, 0), int(tokens or 0))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get today's usage against budget per tenant"""
+        with self._lock:
+            self._roll_over()
+            used = dict(self._used)
+        return {
+            "day": self._day.isoformat(),
+            "daily_budget": self.daily_budget,
+            "tenants": {
+                tenant_id: {"used": tokens, "budget": self.budget_for(tenant_id)}
+                for tenant_id, tokens in sorted(used.items())
+            }
+        }
+
+
+# Global tenant usage ledger instance
+usage_ledger = TenantUsageLedger()
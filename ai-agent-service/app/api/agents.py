@@ -2,15 +2,19 @@
 API endpoints for AI agents
 """
 
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
+import json
 
 from app.database import get_db
+from app.auth.dependencies import CurrentUser, get_current_user_optional
 from app.services.agent_service import AgentService
 from app.agents.investigator_agent import InvestigationType, InvestigationResult
+from app.services.investigation_queue import investigation_queue, PackagePriority
 
 router = APIRouter(prefix="/agents", tags=["agents"])
 
@@ -21,6 +25,7 @@ class AnomalyData(BaseModel):
     description: str
     current_status: Optional[str] = None
     location: Optional[str] = None
+    destination: Optional[str] = None
     timestamp: Optional[datetime] = None
 
 class DelayData(BaseModel):
@@ -43,6 +48,14 @@ class PredictiveAnalysisData(BaseModel):
     confidence: float
     current_status: str
 
+class BatchInvestigationItem(BaseModel):
+    package_id: str
+    priority: PackagePriority = PackagePriority.MEDIUM
+    anomaly: AnomalyData
+
+class BatchInvestigationRequest(BaseModel):
+    packages: List[BatchInvestigationItem] = Field(..., min_length=1)
+
 class InvestigationResponse(BaseModel):
     investigation_id: str
     package_id: str
@@ -54,13 +67,41 @@ class InvestigationResponse(BaseModel):
     estimated_resolution_time: Optional[str]
     next_actions: List[str]
     created_at: datetime
+    latency_breakdown: Dict[str, float] = {}
+    usage: Dict[str, Any] = {}
+    budget_exhausted: bool = False
+
+def _tenant_id(current_user: Optional[CurrentUser]) -> Optional[str]:
+    """Tenant charged for an investigation's tokens: the caller's organization, else the caller"""
+    if current_user is None:
+        return None
+    return current_user.metadata.get("org_id") or current_user.user_id
+
+def _investigation_response(result: InvestigationResult) -> InvestigationResponse:
+    """API representation of an investigation result (live or loaded from the database)"""
+    return InvestigationResponse(
+        investigation_id=result.investigation_id,
+        package_id=result.package_id,
+        investigation_type=result.investigation_type.value,
+        findings=result.findings,
+        recommendations=result.recommendations,
+        confidence_score=result.confidence_score,
+        priority=result.priority,
+        estimated_resolution_time=result.estimated_resolution_time,
+        next_actions=result.next_actions,
+        created_at=result.created_at,
+        latency_breakdown=result.latency_breakdown,
+        usage=result.usage,
+        budget_exhausted=result.budget_exhausted
+    )
 
 @router.post("/investigate/anomaly/{package_id}")
 async def investigate_anomaly(
     package_id: str,
     anomaly_data: AnomalyData,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    current_user: Optional[CurrentUser] = Depends(get_current_user_optional)
 ):
     """Investigate a package anomaly using AI agent"""
     try:
@@ -70,30 +111,83 @@ async def investigate_anomaly(
         anomaly_dict = anomaly_data.dict()
         
         # Process investigation in background
-        investigation_result = await agent_service.process_anomaly(package_id, anomaly_dict)
+        investigation_result = await agent_service.process_anomaly(package_id, anomaly_dict, _tenant_id(current_user))
         
-        return InvestigationResponse(
-            investigation_id=investigation_result.investigation_id,
-            package_id=investigation_result.package_id,
-            investigation_type=investigation_result.investigation_type.value,
-            findings=investigation_result.findings,
-            recommendations=investigation_result.recommendations,
-            confidence_score=investigation_result.confidence_score,
-            priority=investigation_result.priority,
-            estimated_resolution_time=investigation_result.estimated_resolution_time,
-            next_actions=investigation_result.next_actions,
-            created_at=investigation_result.created_at
-        )
+        return _investigation_response(investigation_result)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Investigation failed: {str(e)}")
 
+@router.post("/investigate/anomaly/{package_id}/stream")
+async def investigate_anomaly_stream(
+    package_id: str,
+    anomaly_data: AnomalyData,
+    db: Session = Depends(get_db),
+    current_user: Optional[CurrentUser] = Depends(get_current_user_optional)
+):
+    """Investigate a package anomaly, streaming progress as Server-Sent Events
+    
+    Events: prefetch_complete, tool_start, tool_end, tool_error, llm_token and
+    finally result (an InvestigationResponse). The same events are broadcast
+    on the agent_activity WebSocket subscription, with step names and timings
+    only (no prefetched context or tool payloads).
+    """
+    agent_service = AgentService(db)
+    
+    async def event_stream():
+        try:
+            async for event, data in agent_service.stream_anomaly(
+                package_id, anomaly_data.dict(), _tenant_id(current_user)
+            ):
+                if event == "result":
+                    data = _investigation_response(data).dict()
+                yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': f'Investigation failed: {str(e)}'})}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/investigate/batch", status_code=202)
+async def investigate_batch(
+    request: BatchInvestigationRequest,
+    current_user: Optional[CurrentUser] = Depends(get_current_user_optional)
+):
+    """Queue investigations for many packages (critical first) and return a job id for progress polling"""
+    try:
+        job = investigation_queue.submit([
+            (item.package_id, item.priority, item.anomaly.dict())
+            for item in request.packages
+        ], _tenant_id(current_user))
+        return job.get_progress()
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to queue investigations: {str(e)}")
+
+@router.get("/investigate/batch/{job_id}")
+async def get_batch_investigation(job_id: str, include_results: bool = False):
+    """Get progress (and optionally results) of a batch investigation"""
+    job = investigation_queue.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    
+    progress = job.get_progress()
+    if include_results:
+        progress["results"] = [_investigation_response(result) for result in job.results.values()]
+        progress["errors"] = job.errors
+    
+    return progress
+
 @router.post("/investigate/delay/{package_id}")
 async def investigate_delay(
     package_id: str,
     delay_data: DelayData,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    current_user: Optional[CurrentUser] = Depends(get_current_user_optional)
 ):
     """Investigate a package delay using AI agent"""
     try:
@@ -103,20 +197,9 @@ async def investigate_delay(
         delay_dict = delay_data.dict()
         
         # Process delay investigation
-        investigation_result = await agent_service.process_delay(package_id, delay_dict)
+        investigation_result = await agent_service.process_delay(package_id, delay_dict, _tenant_id(current_user))
         
-        return InvestigationResponse(
-            investigation_id=investigation_result.investigation_id,
-            package_id=investigation_result.package_id,
-            investigation_type=investigation_result.investigation_type.value,
-            findings=investigation_result.findings,
-            recommendations=investigation_result.recommendations,
-            confidence_score=investigation_result.confidence_score,
-            priority=investigation_result.priority,
-            estimated_resolution_time=investigation_result.estimated_resolution_time,
-            next_actions=investigation_result.next_actions,
-            created_at=investigation_result.created_at
-        )
+        return _investigation_response(investigation_result)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Delay investigation failed: {str(e)}")
@@ -126,7 +209,8 @@ async def optimize_route(
     package_id: str,
     route_data: RouteOptimizationData,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    current_user: Optional[CurrentUser] = Depends(get_current_user_optional)
 ):
     """Optimize package route using AI agent"""
     try:
@@ -136,20 +220,9 @@ async def optimize_route(
         route_dict = route_data.dict()
         
         # Process route optimization
-        investigation_result = await agent_service.process_route_optimization(package_id, route_dict)
+        investigation_result = await agent_service.process_route_optimization(package_id, route_dict, _tenant_id(current_user))
         
-        return InvestigationResponse(
-            investigation_id=investigation_result.investigation_id,
-            package_id=investigation_result.package_id,
-            investigation_type=investigation_result.investigation_type.value,
-            findings=investigation_result.findings,
-            recommendations=investigation_result.recommendations,
-            confidence_score=investigation_result.confidence_score,
-            priority=investigation_result.priority,
-            estimated_resolution_time=investigation_result.estimated_resolution_time,
-            next_actions=investigation_result.next_actions,
-            created_at=investigation_result.created_at
-        )
+        return _investigation_response(investigation_result)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Route optimization failed: {str(e)}")
@@ -159,7 +232,8 @@ async def analyze_predictive(
     package_id: str,
     prediction_data: PredictiveAnalysisData,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    current_user: Optional[CurrentUser] = Depends(get_current_user_optional)
 ):
     """Perform predictive analysis using AI agent"""
     try:
@@ -169,20 +243,9 @@ async def analyze_predictive(
         prediction_dict = prediction_data.dict()
         
         # Process predictive analysis
-        investigation_result = await agent_service.process_predictive_analysis(package_id, prediction_dict)
+        investigation_result = await agent_service.process_predictive_analysis(package_id, prediction_dict, _tenant_id(current_user))
         
-        return InvestigationResponse(
-            investigation_id=investigation_result.investigation_id,
-            package_id=investigation_result.package_id,
-            investigation_type=investigation_result.investigation_type.value,
-            findings=investigation_result.findings,
-            recommendations=investigation_result.recommendations,
-            confidence_score=investigation_result.confidence_score,
-            priority=investigation_result.priority,
-            estimated_resolution_time=investigation_result.estimated_resolution_time,
-            next_actions=investigation_result.next_actions,
-            created_at=investigation_result.created_at
-        )
+        return _investigation_response(investigation_result)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Predictive analysis failed: {str(e)}")
@@ -200,18 +263,7 @@ async def get_investigation_status(
         if not investigation:
             raise HTTPException(status_code=404, detail="No investigation found for this package")
         
-        return InvestigationResponse(
-            investigation_id=investigation.investigation_id,
-            package_id=investigation.package_id,
-            investigation_type=investigation.investigation_type.value,
-            findings=investigation.findings,
-            recommendations=investigation.recommendations,
-            confidence_score=investigation.confidence_score,
-            priority=investigation.priority,
-            estimated_resolution_time=investigation.estimated_resolution_time,
-            next_actions=investigation.next_actions,
-            created_at=investigation.created_at
-        )
+        return _investigation_response(investigation)
         
     except HTTPException:
         raise
@@ -222,6 +274,7 @@ async def get_investigation_status(
 async def get_all_investigations(
     priority: Optional[str] = None,
     investigation_type: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
     db: Session = Depends(get_db)
 ):
     """Get all investigations with optional filtering"""
@@ -229,31 +282,17 @@ async def get_all_investigations(
         agent_service = AgentService(db)
         
         if priority:
-            investigations = agent_service.get_investigations_by_priority(priority)
+            investigations = agent_service.get_investigations_by_priority(priority, limit)
         elif investigation_type:
             try:
                 inv_type = InvestigationType(investigation_type)
-                investigations = agent_service.get_investigations_by_type(inv_type)
+                investigations = agent_service.get_investigations_by_type(inv_type, limit)
             except ValueError:
                 raise HTTPException(status_code=400, detail="Invalid investigation type")
         else:
-            investigations = agent_service.get_all_investigations()
+            investigations = agent_service.get_all_investigations(limit)
         
-        return [
-            InvestigationResponse(
-                investigation_id=inv.investigation_id,
-                package_id=inv.package_id,
-                investigation_type=inv.investigation_type.value,
-                findings=inv.findings,
-                recommendations=inv.recommendations,
-                confidence_score=inv.confidence_score,
-                priority=inv.priority,
-                estimated_resolution_time=inv.estimated_resolution_time,
-                next_actions=inv.next_actions,
-                created_at=inv.created_at
-            )
-            for inv in investigations
-        ]
+        return [_investigation_response(inv) for inv in investigations]
         
     except HTTPException:
         raise
@@ -271,6 +310,19 @@ async def get_agent_analytics(db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get analytics: {str(e)}")
 
+@router.get("/usage")
+async def get_usage_analytics(
+    hours: int = Query(24, ge=1, le=24 * 30),
+    db: Session = Depends(get_db)
+):
+    """Get token, cost, tool call and wall-time totals by anomaly type, tenant and source"""
+    try:
+        agent_service = AgentService(db)
+        return agent_service.get_usage_analytics(hours)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get usage analytics: {str(e)}")
+
 @router.post("/cleanup")
 async def cleanup_old_investigations(
     hours: int = 24,
@@ -279,12 +331,19 @@ async def cleanup_old_investigations(
     """Clean up old investigations"""
     try:
         agent_service = AgentService(db)
-        await agent_service.cleanup_old_investigations(hours)
-        return {"message": f"Cleaned up investigations older than {hours} hours"}
+        removed = await agent_service.cleanup_old_investigations(hours)
+        return {"message": f"Cleaned up {removed} investigations older than {hours} hours"}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Cleanup failed: {str(e)}")
 
+@router.post("/cache/clear")
+async def clear_investigation_cache(db: Session = Depends(get_db)):
+    """Drop all cached LLM analyses"""
+    agent_service = AgentService(db)
+    cleared = agent_service.investigator_agent.result_cache.clear()
+    return {"message": f"Cleared {cleared} cached analyses"}
+
 @router.get("/health")
 async def agent_health_check(db: Session = Depends(get_db)):
     """Health check for agent service"""
@@ -296,7 +355,9 @@ async def agent_health_check(db: Session = Depends(get_db)):
             "status": "healthy",
             "active_investigations": analytics.get("active_investigations", 0),
             "total_investigations": analytics.get("total_investigations", 0),
-            "average_confidence": analytics.get("average_confidence", 0.0)
+            "average_confidence": analytics.get("average_confidence", 0.0),
+            "batch_queue": investigation_queue.get_stats(),
+            "agent_pool": agent_service.investigator_agent.agent_pool.get_stats()
         }
         
     except Exception as e:
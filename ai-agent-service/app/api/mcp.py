@@ -5,36 +5,30 @@ This module provides API endpoints for MCP server integration
 and tool management.
 """
 
-import asyncio
 import logging
+from datetime import datetime
 from typing import Dict, Any, List, Optional
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Depends, Query, Header
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 
 from app.database import get_db
-from app.mcp.server import get_mcp_server
-from app.mcp.tools import ToolResult
+from app.services.agent_service import AgentService
+from app.mcp.catalog import etag_response
+from app.mcp.dispatch import json_response, execution_payload, execution_response
+from app.mcp.server import get_mcp_server, ToolExecutionRequest, ToolExecutionResponse
+from app.mcp.metrics import tool_metrics
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
-class ToolExecutionRequest(BaseModel):
-    """Request model for tool execution"""
-    tool_name: str = Field(..., description="Name of the tool to execute")
-    parameters: Dict[str, Any] = Field(default_factory=dict, description="Tool parameters")
-
-
-class ToolExecutionResponse(BaseModel):
-    """Response model for tool execution"""
-    success: bool = Field(..., description="Whether the tool execution was successful")
-    data: Any = Field(None, description="Tool execution result data")
-    error: Optional[str] = Field(None, description="Error message if execution failed")
-    execution_time: float = Field(..., description="Tool execution time in seconds")
-    metadata: Dict[str, Any] = Field(default_factory=dict, description="Additional metadata")
+class CacheInvalidationRequest(BaseModel):
+    """Request model for tool cache invalidation"""
+    tool_name: Optional[str] = Field(None, description="Tool whose results to drop (all tools if omitted)")
+    match: Dict[str, Any] = Field(default_factory=dict, description="Argument values an entry must match")
+    match_any: Dict[str, List[Any]] = Field(default_factory=dict, description="Argument name -> values, one of which an entry must match (batch invalidation)")
 
 
 class MCPStatusResponse(BaseModel):
@@ -50,7 +44,7 @@ async def get_mcp_status(db: Session = Depends(get_db)) -> MCPStatusResponse:
     """Get MCP server status and available tools"""
     try:
         mcp_server = get_mcp_server()
-        tools_info = mcp_server.tool_registry.list_tools()
+        tools_info = mcp_server.tool_registry.catalog.info
         
         return MCPStatusResponse(
             status="operational",
@@ -69,33 +63,27 @@ async def get_mcp_status(db: Session = Depends(get_db)) -> MCPStatusResponse:
 
 
 @router.get("/tools")
-async def list_mcp_tools(db: Session = Depends(get_db)) -> Dict[str, Any]:
-    """List all available MCP tools"""
+async def list_mcp_tools(if_none_match: Optional[str] = Header(None)):
+    """List all available MCP tools (pre-serialized catalog, revalidate with If-None-Match)"""
     try:
-        mcp_server = get_mcp_server()
-        tools_info = mcp_server.tool_registry.list_tools()
-        
-        return {
-            "tools": tools_info,
-            "count": len(tools_info),
-            "status": "success"
-        }
+        catalog = get_mcp_server().tool_registry.catalog
+        return etag_response(catalog.body, catalog.etag, if_none_match)
     except Exception as e:
         logger.error(f"Failed to list MCP tools: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/tools/{tool_name}")
-async def get_tool_info(tool_name: str, db: Session = Depends(get_db)) -> Dict[str, Any]:
+async def get_tool_info(tool_name: str, if_none_match: Optional[str] = Header(None)):
     """Get information about a specific tool"""
     try:
         mcp_server = get_mcp_server()
-        tool = mcp_server.tool_registry.get_tool(tool_name)
+        tool_body = mcp_server.tool_registry.catalog.tool_bodies.get(tool_name)
         
-        if not tool:
+        if not tool_body:
             raise HTTPException(status_code=404, detail=f"Tool '{tool_name}' not found")
         
-        return tool.get_info()
+        return etag_response(*tool_body, if_none_match)
     except HTTPException:
         raise
     except Exception as e:
@@ -103,109 +91,26 @@ async def get_tool_info(tool_name: str, db: Session = Depends(get_db)) -> Dict[s
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/tools/{tool_name}/execute")
-async def execute_tool(
-    tool_name: str, 
-    request: ToolExecutionRequest,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
-) -> ToolExecutionResponse:
+@router.post("/tools/{tool_name}/execute", response_model=ToolExecutionResponse)
+async def execute_tool(tool_name: str, request: ToolExecutionRequest):
     """Execute a specific MCP tool"""
-    try:
-        if tool_name != request.tool_name:
-            raise HTTPException(
-                status_code=400, 
-                detail="Tool name in URL must match tool_name in request body"
-            )
-        
-        mcp_server = get_mcp_server()
-        
-        # Execute the tool
-        result = await mcp_server.tool_registry.execute_tool_async(
-            tool_name, 
-            **request.parameters
+    if tool_name != request.tool_name:
+        raise HTTPException(
+            status_code=400, 
+            detail="Tool name in URL must match tool_name in request body"
         )
-        
-        # Log tool execution for analytics
-        background_tasks.add_task(
-            log_tool_execution,
-            tool_name=tool_name,
-            success=result.success,
-            execution_time=result.execution_time,
-            db=db
-        )
-        
-        return ToolExecutionResponse(
-            success=result.success,
-            data=result.data,
-            error=result.error,
-            execution_time=result.execution_time,
-            metadata=result.metadata or {}
-        )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Failed to execute tool {tool_name}: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    
+    result = await get_mcp_server().dispatcher.call(tool_name, request.parameters)
+    return execution_response(result)
 
 
-@router.post("/tools/batch-execute")
-async def batch_execute_tools(
-    requests: List[ToolExecutionRequest],
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
-) -> List[ToolExecutionResponse]:
-    """Execute multiple tools in batch"""
-    try:
-        mcp_server = get_mcp_server()
-        results = []
-        
-        # Execute tools concurrently
-        tasks = []
-        for request in requests:
-            task = mcp_server.tool_registry.execute_tool_async(
-                request.tool_name,
-                **request.parameters
-            )
-            tasks.append(task)
-        
-        # Wait for all tasks to complete
-        tool_results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # Process results
-        for i, result in enumerate(tool_results):
-            if isinstance(result, Exception):
-                results.append(ToolExecutionResponse(
-                    success=False,
-                    data=None,
-                    error=str(result),
-                    execution_time=0.0,
-                    metadata={"tool_name": requests[i].tool_name}
-                ))
-            else:
-                # Log tool execution for analytics
-                background_tasks.add_task(
-                    log_tool_execution,
-                    tool_name=requests[i].tool_name,
-                    success=result.success,
-                    execution_time=result.execution_time,
-                    db=db
-                )
-                
-                results.append(ToolExecutionResponse(
-                    success=result.success,
-                    data=result.data,
-                    error=result.error,
-                    execution_time=result.execution_time,
-                    metadata=result.metadata or {}
-                ))
-        
-        return results
-        
-    except Exception as e:
-        logger.error(f"Failed to execute batch tools: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+@router.post("/tools/batch-execute", response_model=List[ToolExecutionResponse])
+async def batch_execute_tools(requests: List[ToolExecutionRequest]):
+    """Execute multiple tools in batch (concurrently)"""
+    results = await get_mcp_server().dispatcher.call_many(
+        [(request.tool_name, request.parameters) for request in requests]
+    )
+    return json_response([execution_payload(result) for result in results])
 
 
 @router.get("/health")
@@ -214,20 +119,23 @@ async def mcp_health_check(db: Session = Depends(get_db)) -> Dict[str, Any]:
     try:
         mcp_server = get_mcp_server()
         
-        # Check tool registry health
+        # Check tool registry health, including each tool's circuit breaker
         tools_status = {}
-        for tool_name, tool in mcp_server.tool_registry.tools.items():
+        for tool_name, static_status in mcp_server.tool_registry.catalog.status.items():
+            circuit = mcp_server.tool_registry.breakers[tool_name].get_state()
             tools_status[tool_name] = {
-                "enabled": tool.config.enabled,
-                "timeout": tool.config.timeout,
-                "status": "healthy"
+                **static_status,
+                "status": "healthy" if circuit["state"] == "closed" else "degraded",
+                "circuit": circuit
             }
         
+        degraded = any(status["status"] != "healthy" for status in tools_status.values())
+        
         return {
-            "status": "healthy",
+            "status": "degraded" if degraded else "healthy",
             "mcp_server": "operational",
             "tools": tools_status,
-            "timestamp": "2024-01-15T10:30:00Z"
+            "timestamp": datetime.utcnow().isoformat()
         }
     except Exception as e:
         logger.error(f"MCP health check failed: {e}")
@@ -235,42 +143,53 @@ async def mcp_health_check(db: Session = Depends(get_db)) -> Dict[str, Any]:
             "status": "unhealthy",
             "mcp_server": "error",
             "error": str(e),
-            "timestamp": "2024-01-15T10:30:00Z"
+            "timestamp": datetime.utcnow().isoformat()
         }
 
 
-async def log_tool_execution(
-    tool_name: str,
-    success: bool,
-    execution_time: float,
-    db: Session
-):
-    """Log tool execution for analytics (background task)"""
+@router.get("/analytics")
+async def get_tool_analytics(
+    hours: int = Query(24, ge=1, le=24 * 7),
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """Get analytics about tool usage: executions, error and cache hit rates, p50/p95/p99 latency per tool"""
     try:
-        # In a real implementation, you would log this to a database
-        # For now, we'll just log it
-        logger.info(
-            f"Tool execution logged: {tool_name}, success: {success}, "
-            f"execution_time: {execution_time:.3f}s"
-        )
+        mcp_server = get_mcp_server()
+        executions = tool_metrics.get_analytics(db, hours)
+        total = executions["total_executions"]
+        most_used = sorted(executions["tools"].items(), key=lambda item: item[1]["count"], reverse=True)[:5]
+        
+        return {
+            "window_hours": hours,
+            "total_executions": total,
+            "success_rate": round(1 - executions["error_rate"], 3) if total else 0.0,
+            "average_execution_time": round(executions["latency_ms"]["mean_ms"] / 1000, 6),  # seconds
+            "most_used_tools": [{"tool": name, "executions": stats["count"]} for name, stats in most_used],
+            "error_rate": executions["error_rate"],
+            "cache_hit_rate": executions["cache_hit_rate"],
+            "latency_ms": executions["latency_ms"],
+            "tools": executions["tools"],
+            "cache": mcp_server.tool_registry.cache.get_stats(),
+            "scheduler": mcp_server.tool_registry.scheduler.get_stats(),
+            "llm_usage": AgentService(db).get_usage_analytics(),
+            "timestamp": datetime.utcnow().isoformat()
+        }
     except Exception as e:
-        logger.error(f"Failed to log tool execution: {e}")
+        logger.error(f"Failed to get tool analytics: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/analytics")
-async def get_tool_analytics(db: Session = Depends(get_db)) -> Dict[str, Any]:
-    """Get analytics about tool usage"""
+@router.post("/cache/invalidate")
+async def invalidate_tool_cache(request: CacheInvalidationRequest) -> Dict[str, Any]:
+    """Invalidate cached tool results, e.g. when package-service reports a package change"""
     try:
-        # In a real implementation, you would query analytics from a database
-        # For now, return mock data
+        mcp_server = get_mcp_server()
+        invalidated = mcp_server.tool_registry.invalidate_cache(request.tool_name, request.match_any, **request.match)
+        
         return {
-            "total_executions": 0,
-            "success_rate": 0.0,
-            "average_execution_time": 0.0,
-            "most_used_tools": [],
-            "error_rate": 0.0,
-            "timestamp": "2024-01-15T10:30:00Z"
+            "invalidated": invalidated,
+            "status": "success"
         }
     except Exception as e:
-        logger.error(f"Failed to get tool analytics: {e}")
+        logger.error(f"Failed to invalidate tool cache: {e}")
         raise HTTPException(status_code=500, detail=str(e))
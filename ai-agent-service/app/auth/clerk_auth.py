@@ -2,7 +2,6 @@
 Clerk JWT Authentication for FastAPI Backend
 """
 import os
-import httpx
 import json
 from typing import Optional, Dict, Any
 from fastapi import HTTPException, status
@@ -10,6 +9,8 @@ from jose import jwt, JWTError
 from datetime import datetime, timezone
 import logging
 
+from app.services.http_pool import http_pool, UpstreamConfig
+
 logger = logging.getLogger(__name__)
 
 class ClerkJWTAuth:
@@ -19,6 +20,7 @@ class ClerkJWTAuth:
         self.clerk_jwks_url = f"https://api.clerk.com/v1/jwks"
         self._jwks_cache = None
         self._jwks_cache_time = None
+        http_pool.configure("clerk", UpstreamConfig(base_url="https://api.clerk.com", timeout=10.0, http2=True))
         
         if not self.clerk_secret_key:
             logger.warning("CLERK_SECRET_KEY not found in environment variables")
@@ -31,17 +33,17 @@ class ClerkJWTAuth:
             return self._jwks_cache
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    self.clerk_jwks_url,
-                    headers={"Authorization": f"Bearer {self.clerk_secret_key}"}
-                )
-                response.raise_for_status()
-                
-                self._jwks_cache = response.json()
-                self._jwks_cache_time = datetime.now(timezone.utc)
-                return self._jwks_cache
-                
+            client = http_pool.get("clerk")
+            response = await client.get(
+                self.clerk_jwks_url,
+                headers={"Authorization": f"Bearer {self.clerk_secret_key}"}
+            )
+            response.raise_for_status()
+            
+            self._jwks_cache = response.json()
+            self._jwks_cache_time = datetime.now(timezone.utc)
+            return self._jwks_cache
+            
         except Exception as e:
             logger.error(f"Failed to fetch JWKS from Clerk: {e}")
             raise HTTPException(
@@ -128,14 +130,14 @@ class ClerkJWTAuth:
     async def get_user_info(self, user_id: str) -> Dict[str, Any]:
         """Get user information from Clerk"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"https://api.clerk.com/v1/users/{user_id}",
-                    headers={"Authorization": f"Bearer {self.clerk_secret_key}"}
-                )
-                response.raise_for_status()
-                return response.json()
-                
+            client = http_pool.get("clerk")
+            response = await client.get(
+                f"https://api.clerk.com/v1/users/{user_id}",
+                headers={"Authorization": f"Bearer {self.clerk_secret_key}"}
+            )
+            response.raise_for_status()
+            return response.json()
+            
         except Exception as e:
             logger.error(f"Failed to fetch user info from Clerk: {e}")
             return {}
@@ -42,7 +42,7 @@ async def get_current_user_optional(
             email=email,
             first_name=payload.get("given_name"),
             last_name=payload.get("family_name"),
-            **payload
+            **{key: value for key, value in payload.items() if key != "email"}
         )
     except HTTPException:
         return None
@@ -78,7 +78,7 @@ async def get_current_user(
             email=email,
             first_name=payload.get("given_name"),
             last_name=payload.get("family_name"),
-            **payload
+            **{key: value for key, value in payload.items() if key != "email"}
         )
     except HTTPException:
         raise
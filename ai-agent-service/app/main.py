@@ -4,19 +4,30 @@ from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 import uvicorn
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 import time
+import asyncio
 import logging
 
-from app.database import engine, get_db
+from app.database import engine, get_db, SessionLocal
 from app.api.agents import router as agents_router
 from app.api.mcp import router as mcp_router
 from app.auth.dependencies import get_current_user, get_current_user_optional, get_active_user
 from app.mcp.server import initialize_mcp_server
+from app.agents.investigator_agent import warm_up_tokenizer, get_investigator_agent
+from app.services.http_pool import http_pool
+from app.services.async_bridge import async_bridge
+from app.services.investigation_queue import investigation_queue
+from app.services.websocket_client import websocket_service_client
+from app.services.agent_service import sweep_expired_investigations, load_tenant_usage
+from app.models.investigation import Base, Investigation
+from app.models.tool_metrics import ToolExecutionStats
+from app.mcp.metrics import flush_tool_metrics_periodically
 
 # Create tables
 try:
     # Only create AI-specific tables here
+    Base.metadata.create_all(bind=engine)
     print("✅ AI Agent Service database tables created successfully!")
 except Exception as e:
     print(f"❌ AI Agent Service database setup failed: {e}")
@@ -37,10 +48,57 @@ async def lifespan(app: FastAPI):
         print(f"❌ MCP Server initialization failed: {e}")
         print("   Service will continue without MCP functionality")
     
+    # Load the tokenizer now rather than on the first investigation
+    try:
+        await asyncio.to_thread(warm_up_tokenizer)
+        print("✅ Tokenizer loaded")
+    except Exception as e:
+        print(f"⚠️ Tokenizer warmup failed: {e}")
+    
+    # Open pooled HTTP clients for MCP tools and auth
+    await http_pool.start()
+    
+    # Sync tool calls from worker threads run on this loop
+    async_bridge.bind(asyncio.get_running_loop())
+    
+    # Build the investigator (LLM client, tools, prompt, executor pool) before the first request
+    try:
+        agent = get_investigator_agent(None)
+        print(f"✅ Investigator agent ready ({agent.agent_pool.size} pooled executors)")
+    except Exception as e:
+        print(f"⚠️ Investigator agent warmup failed: {e}")
+    
+    # Restore today's per-tenant token usage so budgets survive restarts
+    db = SessionLocal()
+    try:
+        load_tenant_usage(db)
+    except Exception as e:
+        print(f"⚠️ Tenant usage restore failed: {e}")
+    finally:
+        db.close()
+    
+    # Start batch investigation workers
+    investigation_queue.start()
+    
+    # Sweep investigations past their TTL
+    sweeper = asyncio.create_task(sweep_expired_investigations())
+    
+    # Persist tool execution metrics
+    metrics_flusher = asyncio.create_task(flush_tool_metrics_periodically())
+    
     yield
     
     # Shutdown
     print("🛑 AI Agent Service shutting down...")
+    # Wait for both background tasks to stop (the flusher writes a final flush) before closing anything
+    for task in (sweeper, metrics_flusher):
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await investigation_queue.stop()
+    await websocket_service_client.close()
+    await http_pool.close()
+    async_bridge.close()
 
 app = FastAPI(
     title="AI Agent Service",
@@ -52,7 +110,8 @@ app = FastAPI(
 # Security middleware
 app.add_middleware(
     TrustedHostMiddleware, 
-    allowed_hosts=["localhost", "127.0.0.1", "*.vercel.app", "*.clearpath-ai.com"]
+    # "ai-agent-service" is the Docker service name other services call us by
+    allowed_hosts=["localhost", "127.0.0.1", "*.vercel.app", "*.clearpath-ai.com", "ai-agent-service"]
 )
 
 # CORS middleware
@@ -87,7 +146,7 @@ async def rate_limit_middleware(request: Request, call_next):
     return response
 
 # Include routers
-app.include_router(agents_router, prefix="/api/v1/agents")
+app.include_router(agents_router, prefix="/api/v1")
 app.include_router(mcp_router, prefix="/api/v1/mcp")
 
 @app.get("/")
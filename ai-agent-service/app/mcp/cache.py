@@ -0,0 +1,181 @@
+"""
+MCP Tool Result Cache
+
+This module provides a TTL + LRU cache for tool results, keyed by tool name
+and normalized arguments, with single-flight deduplication of concurrent
+identical calls.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+
+from .tools import ToolResult
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheEntry:
+    """A cached tool result"""
+    tool_name: str
+    arguments: Dict[str, Any]
+    result: ToolResult
+    expires_at: float
+
+
+class ToolResultCache:
+    """TTL + LRU cache for tool results with single-flight execution"""
+    
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+    
+    @staticmethod
+    def normalize_arguments(arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Normalize arguments so equivalent calls share a cache entry"""
+        return {
+            key: value.strip().casefold() if isinstance(value, str) else value
+            for key, value in arguments.items()
+        }
+    
+    @staticmethod
+    def make_key(tool_name: str, arguments: Dict[str, Any]) -> str:
+        """Build a cache key from a tool name and normalized arguments"""
+        return f"{tool_name}:{json.dumps(arguments, sort_keys=True, default=str)}"
+    
+    def _tool_stats(self, tool_name: str) -> Dict[str, int]:
+        """Get the counters for a tool"""
+        if tool_name not in self._stats:
+            self._stats[tool_name] = {
+                "hits": 0,
+                "misses": 0,
+                "coalesced": 0,
+                "evictions": 0,
+                "invalidations": 0
+            }
+        return self._stats[tool_name]
+    
+    async def get_or_execute(
+        self,
+        tool_name: str,
+        arguments: Dict[str, Any],
+        ttl: float,
+        execute: Callable[[], Awaitable[ToolResult]]
+    ) -> ToolResult:
+        """Return a cached result, join an identical in-flight call, or execute"""
+        arguments = self.normalize_arguments(arguments)
+        key = self.make_key(tool_name, arguments)
+        stats = self._tool_stats(tool_name)
+        
+        # Expired entries stay until replaced or evicted, as a fallback while a tool is failing
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at > time.monotonic():
+            self._entries.move_to_end(key)
+            stats["hits"] += 1
+            return replace(entry.result, metadata={**entry.result.metadata, "cache_hit": True})
+        
+        task = self._inflight.get(key)
+        # Only join calls running on this event loop (sync callers use their own loop)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            stats["coalesced"] += 1
+            return await asyncio.shield(task)
+        
+        stats["misses"] += 1
+        task = asyncio.ensure_future(execute())
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._complete(key, tool_name, arguments, ttl, done))
+        
+        # Shield so a cancelled caller does not cancel the call for other waiters
+        return await asyncio.shield(task)
+    
+    def _complete(
+        self,
+        key: str,
+        tool_name: str,
+        arguments: Dict[str, Any],
+        ttl: float,
+        task: asyncio.Task
+    ):
+        """Store a finished call's result if it succeeded"""
+        self._inflight.pop(key, None)
+        
+        if task.cancelled() or task.exception() is not None:
+            return
+        
+        result = task.result()
+        if not result.success or result.metadata.get("fallback"):
+            return
+        
+        self._entries[key] = CacheEntry(
+            tool_name=tool_name,
+            arguments=arguments,
+            result=result,
+            expires_at=time.monotonic() + ttl
+        )
+        self._entries.move_to_end(key)
+        
+        while len(self._entries) > self.max_entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._tool_stats(evicted.tool_name)["evictions"] += 1
+    
+    def get_stale(self, tool_name: str, arguments: Dict[str, Any]) -> Optional[ToolResult]:
+        """Get the last cached result for a call, even if it has expired"""
+        entry = self._entries.get(self.make_key(tool_name, self.normalize_arguments(arguments)))
+        if entry is None:
+            return None
+        return replace(entry.result, metadata={**entry.result.metadata, "cache_hit": True, "stale": entry.expires_at <= time.monotonic()})
+    
+    def invalidate(self, tool_name: Optional[str] = None, match_any: Optional[Dict[str, List[Any]]] = None, **match: Any) -> int:
+        """Drop cached results for a tool and/or matching argument values (match_any: argument -> accepted values)"""
+        match = self.normalize_arguments(match)
+        match_any = {
+            name: {self.normalize_arguments({name: value})[name] for value in values}
+            for name, values in (match_any or {}).items()
+        }
+        to_remove = [
+            key for key, entry in self._entries.items()
+            if (tool_name is None or entry.tool_name == tool_name)
+            and all(entry.arguments.get(name) == value for name, value in match.items())
+            and all(entry.arguments.get(name) in values for name, values in match_any.items())
+        ]
+        
+        for key in to_remove:
+            entry = self._entries.pop(key)
+            self._tool_stats(entry.tool_name)["invalidations"] += 1
+        
+        if to_remove:
+            logger.info(f"Invalidated {len(to_remove)} cached tool results ({tool_name or 'all tools'}, {match}, {match_any})")
+        
+        return len(to_remove)
+    
+    def clear(self):
+        """Drop all cached results"""
+        self._entries.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache size and per-tool hit rates"""
+        tools = {}
+        for tool_name, stats in self._stats.items():
+            lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+            tools[tool_name] = {
+                **stats,
+                "hit_rate": round((stats["hits"] + stats["coalesced"]) / lookups, 3) if lookups else 0.0
+            }
+        
+        total_hits = sum(stats["hits"] + stats["coalesced"] for stats in self._stats.values())
+        total_lookups = total_hits + sum(stats["misses"] for stats in self._stats.values())
+        
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "in_flight": len(self._inflight),
+            "hit_rate": round(total_hits / total_lookups, 3) if total_lookups else 0.0,
+            "tools": tools
+        }
@@ -0,0 +1,70 @@
+"""
+MCP Tool Catalog
+
+This module builds the tool catalog (info, input schemas and argument
+defaults for every registered tool) once, together with its JSON encoding
+and ETag, so listing and schema endpoints serve pre-serialized bytes and
+clients can revalidate with If-None-Match. The registry rebuilds it only
+when a tool's configuration changes.
+"""
+
+import copy
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Tuple
+
+from fastapi import Response
+
+
+def _encode(payload: Any) -> Tuple[bytes, str]:
+    """Compact JSON encoding and a strong ETag derived from it"""
+    body = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode()
+    return body, f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+@dataclass(frozen=True)
+class ToolCatalog:
+    """Snapshot of the registered tools; treat the dicts as read-only"""
+    info: Dict[str, Dict[str, Any]]  # tool name -> get_info()
+    schemas: Dict[str, Dict[str, Any]]  # tool name -> input schema
+    defaults: Dict[str, Dict[str, Any]]  # tool name -> argument defaults from the schema
+    status: Dict[str, Dict[str, Any]]  # tool name -> static health fields
+    body: bytes  # {"tools": ..., "count": ..., "status": "success"}
+    etag: str
+    tool_bodies: Dict[str, Tuple[bytes, str]]  # tool name -> (get_info() JSON, ETag)
+    
+    @classmethod
+    def build(cls, tools: Dict[str, Any]) -> "ToolCatalog":
+        """Build a catalog from tool instances (MCPTool)"""
+        info = {name: copy.deepcopy(tool.get_info()) for name, tool in sorted(tools.items())}
+        schemas = {name: tool_info["schema"] for name, tool_info in info.items()}
+        defaults = {
+            name: {
+                argument: spec["default"]
+                for argument, spec in schema.get("properties", {}).items() if "default" in spec
+            }
+            for name, schema in schemas.items()
+        }
+        status = {
+            name: {"enabled": tool.config.enabled, "timeout": tool.config.timeout, "retry_attempts": tool.config.retry_attempts}
+            for name, tool in sorted(tools.items())
+        }
+        body, etag = _encode({"tools": info, "count": len(info), "status": "success"})
+        return cls(
+            info=info,
+            schemas=schemas,
+            defaults=defaults,
+            status=status,
+            body=body,
+            etag=etag,
+            tool_bodies={name: _encode(tool_info) for name, tool_info in info.items()}
+        )
+
+
+def etag_response(body: bytes, etag: str, if_none_match: Optional[str] = None) -> Response:
+    """Serve pre-serialized JSON, or 304 when the client already has this version"""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -22,9 +22,22 @@ class MCPConfig:
     
     # Tool Configuration
     max_concurrent_tools: int = 10
+    max_queued_tools: int = 100
+    queue_timeout: float = 5.0  # seconds a call may wait for a slot before rejection
     tool_timeout: int = 30
     enable_tool_caching: bool = True
-    cache_ttl: int = 300  # 5 minutes
+    cache_ttl: int = 300  # 5 minutes, used by tools without their own cache_ttl
+    cache_max_entries: int = 1000
+    
+    # Resilience
+    retry_backoff_base: float = 0.2  # seconds, doubled per retry with full jitter
+    retry_backoff_max: float = 2.0
+    circuit_failure_threshold: int = 5  # consecutive failed calls before a tool's circuit opens
+    circuit_recovery_timeout: float = 30.0  # seconds before an open circuit is probed
+    
+    # JSON-RPC transport
+    max_batch_size: int = 50  # requests per JSON-RPC batch array
+    sse_keepalive: float = 15.0  # seconds between keepalive comments on idle SSE streams
     
     # External Service Configuration
     package_service_url: str = "http://package-service:8001"
@@ -53,7 +66,18 @@ class MCPConfig:
         self.server_host = os.getenv("MCP_SERVER_HOST", self.server_host)
         self.server_port = int(os.getenv("MCP_SERVER_PORT", self.server_port))
         self.max_concurrent_tools = int(os.getenv("MCP_MAX_CONCURRENT_TOOLS", self.max_concurrent_tools))
+        self.max_queued_tools = int(os.getenv("MCP_MAX_QUEUED_TOOLS", self.max_queued_tools))
+        self.queue_timeout = float(os.getenv("MCP_QUEUE_TIMEOUT", self.queue_timeout))
         self.tool_timeout = int(os.getenv("MCP_TOOL_TIMEOUT", self.tool_timeout))
+        self.rate_limit_per_minute = int(os.getenv("MCP_RATE_LIMIT_PER_MINUTE", self.rate_limit_per_minute))
+        self.rate_limit_per_hour = int(os.getenv("MCP_RATE_LIMIT_PER_HOUR", self.rate_limit_per_hour))
+        self.enable_tool_caching = os.getenv("MCP_ENABLE_TOOL_CACHING", str(self.enable_tool_caching)).lower() == "true"
+        self.cache_ttl = int(os.getenv("MCP_CACHE_TTL", self.cache_ttl))
+        self.cache_max_entries = int(os.getenv("MCP_CACHE_MAX_ENTRIES", self.cache_max_entries))
+        self.circuit_failure_threshold = int(os.getenv("MCP_CIRCUIT_FAILURE_THRESHOLD", self.circuit_failure_threshold))
+        self.circuit_recovery_timeout = float(os.getenv("MCP_CIRCUIT_RECOVERY_TIMEOUT", self.circuit_recovery_timeout))
+        self.max_batch_size = int(os.getenv("MCP_MAX_BATCH_SIZE", self.max_batch_size))
+        self.sse_keepalive = float(os.getenv("MCP_SSE_KEEPALIVE", self.sse_keepalive))
 
 
 class ToolConfig(BaseModel):
@@ -64,7 +88,9 @@ class ToolConfig(BaseModel):
     enabled: bool = True
     timeout: int = 30
     retry_attempts: int = 3
-    rate_limit: Optional[int] = None
+    rate_limit: Optional[int] = None  # calls per minute
+    # Seconds to cache successful results; None uses MCPConfig.cache_ttl, 0 disables
+    cache_ttl: Optional[int] = None
     api_key: Optional[str] = None
     base_url: Optional[str] = None
     headers: Dict[str, str] = {}
@@ -90,7 +116,8 @@ class MCPToolRegistry:
             description="Retrieve detailed package information including status, location, and tracking history",
             base_url=self.config.package_service_url,
             timeout=15,
-            retry_attempts=3
+            retry_attempts=3,
+            cache_ttl=60  # invalidated early by package-service update events
         ))
         
         # Weather Data Tool
@@ -100,7 +127,9 @@ class MCPToolRegistry:
             api_key=self.config.openweather_api_key,
             base_url="https://api.openweathermap.org/data/2.5",
             timeout=10,
-            retry_attempts=2
+            retry_attempts=2,
+            rate_limit=60,  # OpenWeather free tier
+            cache_ttl=600  # weather changes over minutes
         ))
         
         # Traffic Data Tool
@@ -110,7 +139,8 @@ class MCPToolRegistry:
             api_key=self.config.google_maps_api_key,
             base_url="https://maps.googleapis.com/maps/api",
             timeout=15,
-            retry_attempts=2
+            retry_attempts=2,
+            cache_ttl=120
         ))
         
         # Carrier Tools
@@ -120,7 +150,8 @@ class MCPToolRegistry:
             api_key=self.config.fedex_api_key,
             base_url="https://apis.fedex.com",
             timeout=20,
-            retry_attempts=3
+            retry_attempts=3,
+            cache_ttl=30  # tracking changes within seconds
         ))
         
         self.register_tool(ToolConfig(
@@ -129,7 +160,8 @@ class MCPToolRegistry:
             api_key=self.config.ups_api_key,
             base_url="https://onlinetools.ups.com",
             timeout=20,
-            retry_attempts=3
+            retry_attempts=3,
+            cache_ttl=30
         ))
         
         self.register_tool(ToolConfig(
@@ -138,7 +170,8 @@ class MCPToolRegistry:
             api_key=self.config.dhl_api_key,
             base_url="https://api-eu.dhl.com",
             timeout=20,
-            retry_attempts=3
+            retry_attempts=3,
+            cache_ttl=30
         ))
     
     def register_tool(self, tool_config: ToolConfig):
@@ -0,0 +1,87 @@
+"""
+MCP Tool Dispatch
+
+This module is the single execution path for tool calls made in-process
+(LangChain tools, prefetch) and over HTTP (the /api/v1/mcp router and the
+standalone MCP server). The dispatcher returns ToolResult objects and never
+raises; each boundary then encodes the result exactly once, compactly: JSON
+bytes for HTTP responses, a JSON-RPC tools/call result, or text for the LLM.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+from fastapi import Response
+
+from .tools import ToolRegistry, ToolResult
+
+logger = logging.getLogger(__name__)
+
+
+def encode_json(payload: Any) -> bytes:
+    """Compact JSON encoding used at every boundary"""
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=str).encode()
+
+
+def json_response(payload: Any, status_code: int = 200) -> Response:
+    """HTTP response from a payload, encoded once (no response-model validation pass)"""
+    return Response(content=encode_json(payload), status_code=status_code, media_type="application/json")
+
+
+def execution_payload(result: ToolResult) -> Dict[str, Any]:
+    """REST representation of a result (ToolExecutionResponse fields)"""
+    return {
+        "success": result.success,
+        "data": result.data,
+        "error": result.error,
+        "execution_time": result.execution_time,
+        "metadata": result.metadata
+    }
+
+
+def execution_response(result: ToolResult) -> Response:
+    """REST response for one call; overload is reported as 429 rather than a slow failure"""
+    if result.metadata.get("rejected"):
+        return json_response({"detail": result.error}, status_code=429)
+    return json_response(execution_payload(result))
+
+
+def tool_call_result(result: ToolResult, structured: bool = False) -> Dict[str, Any]:
+    """JSON-RPC tools/call result: always a text content block, plus structuredContent when the client negotiated it"""
+    if not result.success:
+        return {"content": [{"type": "text", "text": result.error or "Tool execution failed"}], "isError": True}
+    
+    call_result = {"content": [{"type": "text", "text": agent_text(result)}], "isError": False}
+    if structured and not isinstance(result.data, str):
+        call_result["structuredContent"] = result.data if isinstance(result.data, dict) else {"result": result.data}
+    return call_result
+
+
+def agent_text(result: ToolResult) -> str:
+    """Observation text for the LLM (compact JSON: indentation only costs tokens)"""
+    if not result.success:
+        return f"Error: {result.error}"
+    if isinstance(result.data, str):
+        return result.data
+    return json.dumps(result.data, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+class ToolDispatcher:
+    """Executes tool calls through the registry and returns results, never exceptions"""
+    
+    def __init__(self, registry: ToolRegistry):
+        self.registry = registry
+    
+    async def call(self, tool_name: str, arguments: Optional[Dict[str, Any]] = None) -> ToolResult:
+        """Execute one tool call"""
+        try:
+            return await self.registry.execute_tool_async(tool_name, **(arguments or {}))
+        except Exception as e:
+            logger.error(f"Failed to execute tool {tool_name}: {e}")
+            return ToolResult(success=False, data=None, error=str(e), metadata={"tool_name": tool_name})
+    
+    async def call_many(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[ToolResult]:
+        """Execute calls concurrently (bounded by the registry's scheduler), results in call order"""
+        return list(await asyncio.gather(*(self.call(tool_name, arguments) for tool_name, arguments in calls)))
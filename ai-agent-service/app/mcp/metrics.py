@@ -0,0 +1,305 @@
+"""
+MCP Tool Execution Metrics
+
+In-process counters and latency histograms per tool and outcome. Every
+thread records into its own shard, so the hot path takes no lock; readers
+merge the shards. Histograms are HDR-style log-linear: exact below 32 µs,
+then 16 sub-buckets per power of two (about 6% relative error). A flusher
+writes the deltas since the previous flush to the tool_execution_stats
+table, one compact row per tool and outcome.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Tuple
+
+from app.models.tool_metrics import ToolExecutionStats
+
+logger = logging.getLogger(__name__)
+
+# Metrics configuration
+TOOL_METRICS_FLUSH_INTERVAL = int(os.getenv("TOOL_METRICS_FLUSH_INTERVAL", "60"))  # seconds
+TOOL_METRICS_RETENTION_HOURS = int(os.getenv("TOOL_METRICS_RETENTION_HOURS", "168"))
+
+# Histogram layout
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_TRACKABLE_US = (1 << 32) - 1  # ~71 minutes; slower calls are clamped
+BUCKET_COUNT = (32 - SUB_BUCKET_BITS) * SUB_BUCKETS + 2 * SUB_BUCKETS
+
+# Outcomes counted as failures
+ERROR_OUTCOMES = ("error", "rejected")
+
+SeriesKey = Tuple[str, str]  # (tool_name, outcome)
+
+
+def bucket_index(value_us: int) -> int:
+    """Histogram bucket of a latency in microseconds"""
+    if value_us < 2 * SUB_BUCKETS:
+        return max(0, value_us)
+    if value_us > MAX_TRACKABLE_US:
+        value_us = MAX_TRACKABLE_US
+    shift = value_us.bit_length() - SUB_BUCKET_BITS - 1
+    return shift * SUB_BUCKETS + (value_us >> shift)
+
+
+def bucket_value(index: int) -> int:
+    """Representative latency (bucket midpoint) of a bucket, in microseconds"""
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift = index // SUB_BUCKETS - 1
+    return ((index - shift * SUB_BUCKETS) << shift) + (1 << shift >> 1)
+
+
+def classify_outcome(result: Any) -> str:
+    """Outcome of a tool call from its ToolResult"""
+    metadata = result.metadata or {}
+    if metadata.get("cache_hit"):
+        return "cache_hit"
+    if metadata.get("fallback"):
+        return "fallback"
+    if metadata.get("rejected"):
+        return "rejected"
+    return "success" if result.success else "error"
+
+
+class _Series:
+    """Counters of one tool/outcome in one thread's shard (written by that thread only)"""
+    __slots__ = ("count", "total_us", "buckets")
+    
+    def __init__(self):
+        self.count = 0
+        self.total_us = 0
+        self.buckets = [0] * BUCKET_COUNT
+    
+    def record(self, value_us: int):
+        self.count += 1
+        self.total_us += value_us
+        self.buckets[bucket_index(value_us)] += 1
+
+
+class _Aggregate:
+    """Merged counters used for reporting and flushing"""
+    
+    def __init__(self):
+        self.count = 0
+        self.total_us = 0
+        self.buckets: Dict[int, int] = {}
+    
+    def add_counts(self, count: int, total_us: int, buckets: Dict[int, int]):
+        self.count += count
+        self.total_us += total_us
+        for index, bucket_count in buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + bucket_count
+    
+    def percentile_ms(self, quantile: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = max(1, int(round(quantile * self.count + 0.5)))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return round(bucket_value(index) / 1000, 3)
+        return round(bucket_value(max(self.buckets)) / 1000, 3)
+    
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_us / self.count / 1000, 3) if self.count else 0.0,
+            "p50_ms": self.percentile_ms(0.50),
+            "p95_ms": self.percentile_ms(0.95),
+            "p99_ms": self.percentile_ms(0.99),
+            "max_ms": round(bucket_value(max(self.buckets)) / 1000, 3) if self.buckets else 0.0
+        }
+
+
+class ToolMetrics:
+    """Per-tool, per-outcome call counters and latency histograms"""
+    
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[Dict[SeriesKey, _Series]] = []
+        self._shards_lock = threading.Lock()
+        # Cumulative totals already written to the table
+        self._flushed: Dict[SeriesKey, Tuple[int, int, List[int]]] = {}
+        self._flush_lock = threading.Lock()
+        self._last_flush = datetime.utcnow()
+    
+    def _shard(self) -> Dict[SeriesKey, _Series]:
+        """This thread's shard, registered on first use"""
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+    
+    def record(self, tool_name: str, outcome: str, seconds: float):
+        """Count one call (lock-free: touches only this thread's shard)"""
+        shard = getattr(self._local, "shard", None) or self._shard()
+        series = shard.get((tool_name, outcome))
+        if series is None:
+            series = shard[(tool_name, outcome)] = _Series()
+        series.record(int(seconds * 1_000_000))
+    
+    def _cumulative(self) -> Dict[SeriesKey, Tuple[int, int, List[int]]]:
+        """Totals since start, merged across shards"""
+        with self._shards_lock:
+            shards = list(self._shards)
+        
+        totals: Dict[SeriesKey, Tuple[int, int, List[int]]] = {}
+        for shard in shards:
+            for key, series in list(shard.items()):
+                buckets = list(series.buckets)
+                if key in totals:
+                    count, total_us, merged = totals[key]
+                    totals[key] = (count + series.count, total_us + series.total_us, [a + b for a, b in zip(merged, buckets)])
+                else:
+                    totals[key] = (series.count, series.total_us, buckets)
+        return totals
+    
+    @staticmethod
+    def _deltas(
+        cumulative: Dict[SeriesKey, Tuple[int, int, List[int]]],
+        baseline: Dict[SeriesKey, Tuple[int, int, List[int]]]
+    ) -> Dict[SeriesKey, Tuple[int, int, Dict[int, int]]]:
+        """Counts recorded since baseline, with sparse histograms"""
+        deltas = {}
+        for key, (count, total_us, buckets) in cumulative.items():
+            base_count, base_total, base_buckets = baseline.get(key, (0, 0, None))
+            if count == base_count:
+                continue
+            if base_buckets is None:
+                delta = {index: value for index, value in enumerate(buckets) if value}
+            else:
+                delta = {
+                    index: value - base_buckets[index]
+                    for index, value in enumerate(buckets) if value != base_buckets[index]
+                }
+            deltas[key] = (count - base_count, total_us - base_total, delta)
+        return deltas
+    
+    def flush(self, db) -> int:
+        """Write counts recorded since the last flush to the table; returns rows written"""
+        with self._flush_lock:
+            window_start, window_end = self._last_flush, datetime.utcnow()
+            cumulative = self._cumulative()
+            rows = [
+                ToolExecutionStats(
+                    tool_name=tool_name,
+                    outcome=outcome,
+                    window_start=window_start,
+                    window_end=window_end,
+                    count=count,
+                    total_ms=round(total_us / 1000, 3),
+                    histogram=json.dumps(buckets, separators=(",", ":"))
+                )
+                for (tool_name, outcome), (count, total_us, buckets) in self._deltas(cumulative, self._flushed).items()
+            ]
+            
+            cutoff = window_end - timedelta(hours=TOOL_METRICS_RETENTION_HOURS)
+            db.add_all(rows)
+            db.query(ToolExecutionStats).filter(ToolExecutionStats.window_start < cutoff).delete(synchronize_session=False)
+            db.commit()
+            
+            self._flushed = cumulative
+            self._last_flush = window_end
+            return len(rows)
+    
+    def get_analytics(self, db=None, hours: int = 24) -> Dict[str, Any]:
+        """Executions, outcome mix, error and cache hit rates and latency percentiles per tool"""
+        aggregates: Dict[SeriesKey, _Aggregate] = {}
+        
+        def add(key: SeriesKey, count: int, total_us: int, buckets: Dict[int, int]):
+            aggregates.setdefault(key, _Aggregate()).add_counts(count, total_us, buckets)
+        
+        with self._flush_lock:
+            if db is not None:
+                since = datetime.utcnow() - timedelta(hours=hours)
+                rows = (
+                    db.query(
+                        ToolExecutionStats.tool_name,
+                        ToolExecutionStats.outcome,
+                        ToolExecutionStats.count,
+                        ToolExecutionStats.total_ms,
+                        ToolExecutionStats.histogram
+                    )
+                    .filter(ToolExecutionStats.window_start >= since)
+                    .all()
+                )
+                for tool_name, outcome, count, total_ms, histogram in rows:
+                    buckets = {int(index): value for index, value in json.loads(histogram or "{}").items()}
+                    add((tool_name, outcome), count, int(total_ms * 1000), buckets)
+                pending = self._deltas(self._cumulative(), self._flushed)
+            else:
+                pending = self._deltas(self._cumulative(), {})
+        
+        for key, (count, total_us, buckets) in pending.items():
+            add(key, count, total_us, buckets)
+        
+        tools: Dict[str, Dict[str, Any]] = {}
+        overall = _Aggregate()
+        for (tool_name, outcome), aggregate in aggregates.items():
+            tool = tools.setdefault(tool_name, {"aggregate": _Aggregate(), "outcomes": {}})
+            tool["aggregate"].add_counts(aggregate.count, aggregate.total_us, aggregate.buckets)
+            tool["outcomes"][outcome] = aggregate.summary()
+            overall.add_counts(aggregate.count, aggregate.total_us, aggregate.buckets)
+        
+        def rate(outcomes: Dict[str, Dict[str, Any]], names, total: int) -> float:
+            return round(sum(outcomes.get(name, {}).get("count", 0) for name in names) / total, 3) if total else 0.0
+        
+        report = {}
+        for tool_name, tool in sorted(tools.items()):
+            total = tool["aggregate"].count
+            report[tool_name] = {
+                **tool["aggregate"].summary(),
+                "error_rate": rate(tool["outcomes"], ERROR_OUTCOMES, total),
+                "cache_hit_rate": rate(tool["outcomes"], ("cache_hit",), total),
+                "outcomes": tool["outcomes"]
+            }
+        
+        all_outcomes: Dict[str, Dict[str, Any]] = {}
+        for tool in report.values():
+            for outcome, summary in tool["outcomes"].items():
+                all_outcomes.setdefault(outcome, {"count": 0})["count"] += summary["count"]
+        
+        return {
+            "window_hours": hours if db is not None else None,
+            "total_executions": overall.count,
+            "error_rate": rate(all_outcomes, ERROR_OUTCOMES, overall.count),
+            "cache_hit_rate": rate(all_outcomes, ("cache_hit",), overall.count),
+            "latency_ms": overall.summary(),
+            "tools": report
+        }
+
+
+async def flush_tool_metrics_periodically(interval: int = TOOL_METRICS_FLUSH_INTERVAL):
+    """Flush tool metrics to the database every interval seconds, and once more on cancellation"""
+    from app.database import SessionLocal
+    
+    def flush_once():
+        db = SessionLocal()
+        try:
+            tool_metrics.flush(db)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Tool metrics flush failed: {e}")
+        finally:
+            db.close()
+    
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(flush_once)
+    finally:
+        flush_once()
+
+
+# Global tool metrics instance
+tool_metrics = ToolMetrics()
@@ -0,0 +1,94 @@
+"""
+MCP Tool Resilience
+
+This module provides the retry backoff policy and per-tool circuit breakers
+used by the tool registry. Retries use exponential backoff with full jitter
+and never run past the tool's overall deadline; a breaker that has seen too
+many consecutive failures opens and short-circuits calls until it is probed
+again.
+"""
+
+import random
+import threading
+import time
+from typing import Dict, Any, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff before retry number `attempt` (1-based)"""
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one tool"""
+    
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.short_circuited = 0
+        self.times_opened = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+    
+    def allow_request(self) -> bool:
+        """Whether a call may go to the upstream; after the recovery timeout one probe is let through"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+                self.state = HALF_OPEN
+            
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            
+            self.short_circuited += 1
+            return False
+    
+    def record_success(self):
+        """Close the breaker after a successful call"""
+        with self._lock:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._probe_in_flight = False
+    
+    def record_failure(self):
+        """Count a failed call, opening the breaker at the threshold or on a failed probe"""
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.times_opened += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+    
+    def release_probe(self):
+        """Give up a probe slot without recording an outcome (e.g. the call was rejected)"""
+        with self._lock:
+            self._probe_in_flight = False
+    
+    def get_state(self) -> Dict[str, Any]:
+        """Get the breaker state for health reporting"""
+        retry_in = None
+        if self.state == OPEN:
+            retry_in = round(max(0.0, self.recovery_timeout - (time.monotonic() - self.opened_at)), 1)
+        
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "times_opened": self.times_opened,
+            "short_circuited": self.short_circuited,
+            "retry_in": retry_in
+        }
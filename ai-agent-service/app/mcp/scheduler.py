@@ -0,0 +1,220 @@
+"""
+MCP Tool Scheduler
+
+This module enforces the MCP concurrency and rate limits: a global limit on
+concurrently executing tools, global per-minute/per-hour token buckets,
+per-tool token buckets, and a bounded wait queue with deadlines. Calls that
+cannot start before their deadline are rejected immediately.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Optional, List, Deque
+
+from .config import MCPConfig, ToolConfig
+
+logger = logging.getLogger(__name__)
+
+
+class ToolRejectedError(Exception):
+    """Raised when a tool call is rejected by the scheduler"""
+    
+    def __init__(self, tool_name: str, reason: str, message: str):
+        super().__init__(message)
+        self.tool_name = tool_name
+        self.reason = reason
+
+
+class TokenBucket:
+    """Token bucket allowing `rate` calls per `period` seconds"""
+    
+    def __init__(self, rate: int, period: float):
+        self.capacity = float(rate)
+        self.tokens = float(rate)
+        self.fill_rate = rate / period
+        self.updated_at = time.monotonic()
+    
+    def _refill(self, now: float):
+        """Add tokens for the time elapsed since the last refill"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.fill_rate)
+        self.updated_at = now
+    
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is available now)"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.fill_rate
+    
+    def consume(self):
+        """Take a token, reserving a future one if none are available"""
+        self.tokens -= 1
+    
+    def refund(self):
+        """Return a token taken by a call that was not admitted"""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class ToolScheduler:
+    """Admission control for tool executions"""
+    
+    def __init__(self, config: MCPConfig):
+        self.max_concurrent = config.max_concurrent_tools
+        self.max_queued = config.max_queued_tools
+        self.queue_timeout = config.queue_timeout
+        
+        self._global_buckets: List[TokenBucket] = [
+            TokenBucket(config.rate_limit_per_minute, 60),
+            TokenBucket(config.rate_limit_per_hour, 3600)
+        ]
+        self._tool_buckets: Dict[str, TokenBucket] = {}
+        
+        # Callers may run on different event loops (sync bridges), so slot
+        # bookkeeping is guarded by a lock and waiters are woken thread-safely
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+    
+    def configure_tool(self, tool_config: ToolConfig):
+        """Create the per-tool token bucket (ToolConfig.rate_limit is calls per minute)"""
+        if tool_config.rate_limit:
+            self._tool_buckets[tool_config.name] = TokenBucket(tool_config.rate_limit, 60)
+    
+    def _tool_stats(self, tool_name: str) -> Dict[str, Any]:
+        """Get the counters for a tool"""
+        if tool_name not in self._stats:
+            self._stats[tool_name] = {
+                "admitted": 0,
+                "rejected": {"rate_limited": 0, "queue_full": 0, "queue_timeout": 0},
+                "queue_wait_total": 0.0,
+                "queue_wait_max": 0.0
+            }
+        return self._stats[tool_name]
+    
+    async def acquire(self, tool_name: str, timeout: Optional[float] = None):
+        """Wait for rate limit tokens and an execution slot, or raise ToolRejectedError"""
+        start = time.monotonic()
+        deadline = start + (self.queue_timeout if timeout is None else timeout)
+        stats = self._tool_stats(tool_name)
+        
+        buckets = await self._acquire_tokens(tool_name, start, deadline, stats)
+        try:
+            await self._acquire_slot(tool_name, deadline, stats)
+        except BaseException:
+            # Only admitted calls count against the rate limits
+            self._refund_tokens(buckets)
+            raise
+        
+        wait = time.monotonic() - start
+        stats["admitted"] += 1
+        stats["queue_wait_total"] += wait
+        stats["queue_wait_max"] = max(stats["queue_wait_max"], wait)
+    
+    async def _acquire_tokens(self, tool_name: str, now: float, deadline: float, stats: Dict[str, Any]) -> List[TokenBucket]:
+        """Reserve a token from the global and per-tool buckets; returns the buckets charged"""
+        buckets = list(self._global_buckets)
+        if tool_name in self._tool_buckets:
+            buckets.append(self._tool_buckets[tool_name])
+        
+        with self._lock:
+            delay = max(bucket.delay(now) for bucket in buckets)
+            if now + delay > deadline:
+                stats["rejected"]["rate_limited"] += 1
+                raise ToolRejectedError(
+                    tool_name, "rate_limited",
+                    f"Rate limit exceeded for '{tool_name}', retry in {delay:.1f}s"
+                )
+            for bucket in buckets:
+                bucket.consume()
+        
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self._refund_tokens(buckets)
+                raise
+        return buckets
+    
+    def _refund_tokens(self, buckets: List[TokenBucket]):
+        """Give back the tokens reserved for a call that was not admitted"""
+        with self._lock:
+            for bucket in buckets:
+                bucket.refund()
+    
+    async def _acquire_slot(self, tool_name: str, deadline: float, stats: Dict[str, Any]):
+        """Take a concurrency slot, queueing until the deadline if none is free"""
+        with self._lock:
+            if self._active < self.max_concurrent and not self._waiters:
+                self._active += 1
+                return
+            if len(self._waiters) >= self.max_queued:
+                stats["rejected"]["queue_full"] += 1
+                raise ToolRejectedError(
+                    tool_name, "queue_full",
+                    f"Tool queue is full ({self.max_queued} waiting), rejecting '{tool_name}'"
+                )
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+        
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), max(0.0, deadline - time.monotonic()))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    granted = False
+                else:
+                    # The slot was handed over just as we gave up; pass it on
+                    granted = True
+            if granted:
+                self.release()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            stats["rejected"]["queue_timeout"] += 1
+            raise ToolRejectedError(
+                tool_name, "queue_timeout",
+                f"Timed out waiting for an execution slot for '{tool_name}'"
+            )
+    
+    def release(self):
+        """Free a concurrency slot, handing it to the next waiter if any"""
+        with self._lock:
+            if not self._waiters:
+                self._active -= 1
+                return
+            waiter = self._waiters.popleft()
+        
+        # The slot passes directly to the waiter, so the active count is unchanged
+        loop = waiter.get_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if loop is running:
+            waiter.set_result(None)
+        else:
+            loop.call_soon_threadsafe(waiter.set_result, None)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get current load and per-tool admission and queue wait statistics"""
+        tools = {}
+        for tool_name, stats in self._stats.items():
+            tools[tool_name] = {
+                "admitted": stats["admitted"],
+                "rejected": dict(stats["rejected"]),
+                "avg_queue_wait": round(stats["queue_wait_total"] / stats["admitted"], 4) if stats["admitted"] else 0.0,
+                "max_queue_wait": round(stats["queue_wait_max"], 4)
+            }
+        
+        return {
+            "active": self._active,
+            "queued": len(self._waiters),
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+            "queue_timeout": self.queue_timeout,
+            "tools": tools
+        }
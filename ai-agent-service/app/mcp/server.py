@@ -2,37 +2,87 @@
 MCP Server Implementation
 
 This module implements the MCP server that provides standardized tool access
-for AI agents and external clients.
+for AI agents and external clients. JSON-RPC messages are accepted one per
+POST to /mcp or as batch arrays (members run concurrently under the
+registry's concurrency and rate limits), and over the MCP HTTP+SSE transport:
+a client holds GET /sse open and posts messages to the endpoint it announces,
+receiving responses as events on the stream.
 """
 
 import asyncio
 import json
 import logging
+import time
+import uuid
+from dataclasses import dataclass
 from typing import Dict, Any, List, Optional, Union
 from datetime import datetime
-from fastapi import FastAPI, HTTPException, Depends, Request
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field
+from fastapi import FastAPI, HTTPException, Depends, Request, Header
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
 import uvicorn
 
+from .catalog import etag_response
 from .config import MCPConfig
+from .dispatch import ToolDispatcher, encode_json, json_response, execution_response, tool_call_result
 from .tools import ToolRegistry, ToolResult, MCPTool
 
 logger = logging.getLogger(__name__)
 
+# MCP protocol revisions: the default (HTTP+SSE transport) and those a client may negotiate
+PROTOCOL_VERSION = "2024-11-05"
+SUPPORTED_PROTOCOL_VERSIONS = ("2024-11-05", "2025-06-18")
+# First revision with structuredContent in tools/call results
+STRUCTURED_CONTENT_VERSION = "2025-06-18"
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+
+class MCPError(Exception):
+    """JSON-RPC error raised by an MCP method handler"""
+    
+    def __init__(self, code: int, message: str, data: Any = None):
+        self.code = code
+        self.message = message
+        self.data = data
+        super().__init__(message)
+
+
+@dataclass
+class MCPSession:
+    """Protocol state of one client connection (an SSE stream or a single POST to /mcp)"""
+    protocol_version: str = PROTOCOL_VERSION
+    queue: Optional[asyncio.Queue] = None  # serialized messages for an SSE stream
+    
+    @property
+    def structured_content(self) -> bool:
+        return self.protocol_version >= STRUCTURED_CONTENT_VERSION
+
 
 class MCPRequest(BaseModel):
     """MCP request model"""
+    jsonrpc: str = Field("2.0", description="JSON-RPC version")
     method: str = Field(..., description="MCP method to call")
     params: Dict[str, Any] = Field(default_factory=dict, description="Method parameters")
-    id: Optional[str] = Field(None, description="Request ID for correlation")
+    id: Optional[Union[str, int]] = Field(None, description="Request ID for correlation (absent for notifications)")
+
 
+def rpc_result(result: Any, request_id: Optional[Union[str, int]]) -> Dict[str, Any]:
+    """JSON-RPC success response"""
+    return {"jsonrpc": "2.0", "result": result, "id": request_id}
 
-class MCPResponse(BaseModel):
-    """MCP response model"""
-    result: Optional[Any] = Field(None, description="Response result")
-    error: Optional[Dict[str, Any]] = Field(None, description="Error information")
-    id: Optional[str] = Field(None, description="Request ID for correlation")
+
+def rpc_error(code: int, message: str, request_id: Optional[Union[str, int]] = None, data: Any = None) -> Dict[str, Any]:
+    """JSON-RPC error response"""
+    error = {"code": code, "message": message}
+    if data is not None:
+        error["data"] = data
+    return {"jsonrpc": "2.0", "error": error, "id": request_id}
 
 
 class ToolExecutionRequest(BaseModel):
@@ -50,12 +100,43 @@ class ToolExecutionResponse(BaseModel):
     metadata: Dict[str, Any] = Field(default_factory=dict, description="Additional metadata")
 
 
+class RequestLoggingMiddleware:
+    """Logs method, path, status and time to response headers for every request"""
+    
+    # Plain ASGI: @app.middleware("http") adds a task and a body copy per request
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start_time = time.perf_counter()
+        
+        async def send_logged(message):
+            if message["type"] == "http.response.start":
+                logger.info(
+                    f"MCP Request: {scope['method']} {scope['path']} - "
+                    f"Status: {message['status']} - Time: {time.perf_counter() - start_time:.3f}s"
+                )
+            await send(message)
+        
+        await self.app(scope, receive, send_logged)
+
+
 class MCPServer:
     """MCP Server for tool management and execution"""
     
     def __init__(self, config: MCPConfig):
         self.config = config
         self.tool_registry = ToolRegistry(config)
+        # Single execution path for in-process and HTTP tool calls
+        self.dispatcher = ToolDispatcher(self.tool_registry)
+        # Open SSE streams by session id, each fed by its session's queue of serialized messages
+        self._sse_sessions: Dict[str, MCPSession] = {}
+        self._sse_tasks: set = set()
         self.app = FastAPI(
             title=config.server_name,
             version=config.server_version,
@@ -66,19 +147,7 @@ class MCPServer:
     
     def _setup_middleware(self):
         """Setup middleware for the MCP server"""
-        
-        @self.app.middleware("http")
-        async def logging_middleware(request: Request, call_next):
-            start_time = datetime.now()
-            response = await call_next(request)
-            process_time = (datetime.now() - start_time).total_seconds()
-            
-            logger.info(
-                f"MCP Request: {request.method} {request.url.path} - "
-                f"Status: {response.status_code} - Time: {process_time:.3f}s"
-            )
-            
-            return response
+        self.app.add_middleware(RequestLoggingMiddleware)
     
     def _setup_routes(self):
         """Setup API routes for the MCP server"""
@@ -89,26 +158,18 @@ class MCPServer:
                 "name": self.config.server_name,
                 "version": self.config.server_version,
                 "status": "operational",
-                "tools_count": len(self.tool_registry.tools)
+                "tools_count": len(self.tool_registry.catalog.info)
             }
         
         @self.app.get("/health")
         async def health_check():
             """Health check endpoint"""
             try:
-                # Check tool registry health
-                tools_status = {}
-                for tool_name, tool in self.tool_registry.tools.items():
-                    tools_status[tool_name] = {
-                        "enabled": tool.config.enabled,
-                        "timeout": tool.config.timeout
-                    }
-                
                 return {
                     "status": "healthy",
                     "server": self.config.server_name,
                     "version": self.config.server_version,
-                    "tools": tools_status,
+                    "tools": self.tool_registry.catalog.status,
                     "timestamp": datetime.now().isoformat()
                 }
             except Exception as e:
@@ -120,92 +181,183 @@ class MCPServer:
                 }
         
         @self.app.get("/tools")
-        async def list_tools():
-            """List all available tools"""
+        async def list_tools(if_none_match: Optional[str] = Header(None)):
+            """List all available tools (pre-serialized catalog, revalidate with If-None-Match)"""
             try:
-                tools_info = self.tool_registry.list_tools()
-                return {
-                    "tools": tools_info,
-                    "count": len(tools_info),
-                    "timestamp": datetime.now().isoformat()
-                }
+                catalog = self.tool_registry.catalog
+                return etag_response(catalog.body, catalog.etag, if_none_match)
             except Exception as e:
                 logger.error(f"Failed to list tools: {e}")
                 raise HTTPException(status_code=500, detail=str(e))
         
         @self.app.get("/tools/{tool_name}")
-        async def get_tool_info(tool_name: str):
+        async def get_tool_info(tool_name: str, if_none_match: Optional[str] = Header(None)):
             """Get information about a specific tool"""
             try:
-                tool = self.tool_registry.get_tool(tool_name)
-                if not tool:
+                tool_body = self.tool_registry.catalog.tool_bodies.get(tool_name)
+                if not tool_body:
                     raise HTTPException(status_code=404, detail=f"Tool '{tool_name}' not found")
                 
-                return tool.get_info()
+                return etag_response(*tool_body, if_none_match)
             except HTTPException:
                 raise
             except Exception as e:
                 logger.error(f"Failed to get tool info for {tool_name}: {e}")
                 raise HTTPException(status_code=500, detail=str(e))
         
-        @self.app.post("/tools/{tool_name}/execute")
+        @self.app.post("/tools/{tool_name}/execute", response_model=ToolExecutionResponse)
         async def execute_tool(tool_name: str, request: ToolExecutionRequest):
             """Execute a specific tool"""
-            try:
-                if tool_name != request.tool_name:
-                    raise HTTPException(
-                        status_code=400, 
-                        detail="Tool name in URL must match tool_name in request body"
-                    )
-                
-                # Execute the tool
-                result = await self.tool_registry.execute_tool_async(
-                    tool_name, 
-                    **request.parameters
-                )
-                
-                response = ToolExecutionResponse(
-                    success=result.success,
-                    data=result.data,
-                    error=result.error,
-                    execution_time=result.execution_time,
-                    metadata=result.metadata or {}
+            if tool_name != request.tool_name:
+                raise HTTPException(
+                    status_code=400, 
+                    detail="Tool name in URL must match tool_name in request body"
                 )
-                
-                return response
-                
-            except HTTPException:
-                raise
-            except Exception as e:
-                logger.error(f"Failed to execute tool {tool_name}: {e}")
-                raise HTTPException(status_code=500, detail=str(e))
+            
+            result = await self.dispatcher.call(tool_name, request.parameters)
+            return execution_response(result)
         
         @self.app.post("/mcp")
-        async def mcp_endpoint(request: MCPRequest):
-            """Main MCP endpoint for standardized protocol communication"""
+        async def mcp_endpoint(request: Request, mcp_protocol_version: Optional[str] = Header(None)):
+            """Main MCP endpoint: one JSON-RPC request or a batch array, members run concurrently"""
             try:
-                result = await self._handle_mcp_request(request)
-                return MCPResponse(result=result, id=request.id)
-                
-            except Exception as e:
-                logger.error(f"MCP request failed: {e}")
-                return MCPResponse(
-                    error={
-                        "code": -32603,
-                        "message": "Internal error",
-                        "data": str(e)
-                    },
-                    id=request.id
-                )
+                payload = json.loads(await request.body())
+            except ValueError as e:
+                return json_response(rpc_error(PARSE_ERROR, "Parse error", data=str(e)))
+            
+            # Stateless: the negotiated revision comes with each request (MCP-Protocol-Version header)
+            session = MCPSession()
+            if mcp_protocol_version in SUPPORTED_PROTOCOL_VERSIONS:
+                session.protocol_version = mcp_protocol_version
+            response = await self.handle_payload(payload, session)
+            if response is None:
+                # Only notifications: nothing to answer
+                return Response(status_code=202)
+            return json_response(response)
+        
+        @self.app.get("/sse")
+        async def sse_endpoint():
+            """Open a streaming MCP session; responses to posted messages arrive as events"""
+            session_id = uuid.uuid4().hex
+            session = MCPSession(queue=asyncio.Queue())
+            queue = session.queue
+            self._sse_sessions[session_id] = session
+            
+            async def event_stream():
+                try:
+                    yield f"event: endpoint\ndata: /messages?session_id={session_id}\n\n"
+                    while True:
+                        try:
+                            message = await asyncio.wait_for(queue.get(), timeout=self.config.sse_keepalive)
+                        except asyncio.TimeoutError:
+                            yield ": keepalive\n\n"
+                            continue
+                        yield f"event: message\ndata: {message}\n\n"
+                finally:
+                    self._sse_sessions.pop(session_id, None)
+            
+            return StreamingResponse(
+                event_stream(),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+        
+        @self.app.post("/messages")
+        async def sse_messages(session_id: str, request: Request):
+            """Accept a message or batch for an SSE session; the response is sent on its stream"""
+            session = self._sse_sessions.get(session_id)
+            if session is None:
+                raise HTTPException(status_code=404, detail=f"Unknown session '{session_id}'")
+            
+            try:
+                payload = json.loads(await request.body())
+            except ValueError as e:
+                session.queue.put_nowait(encode_json(rpc_error(PARSE_ERROR, "Parse error", data=str(e))).decode())
+                return Response(status_code=202)
+            
+            # Answer asynchronously so one session can have many calls in flight
+            task = asyncio.create_task(self._answer_on_stream(session, payload))
+            self._sse_tasks.add(task)
+            task.add_done_callback(self._sse_tasks.discard)
+            return Response(status_code=202)
+    
+    async def _answer_on_stream(self, session: MCPSession, payload: Any):
+        """Handle a payload and queue its response for the session's stream"""
+        response = await self.handle_payload(payload, session)
+        if response is not None:
+            session.queue.put_nowait(encode_json(response).decode())
     
-    async def _handle_mcp_request(self, request: MCPRequest) -> Any:
+    async def handle_payload(
+        self,
+        payload: Any,
+        session: Optional[MCPSession] = None
+    ) -> Optional[Union[Dict[str, Any], List[Dict[str, Any]]]]:
+        """Handle a JSON-RPC message or batch array; returns None when nothing needs answering"""
+        session = session or MCPSession()
+        if not isinstance(payload, list):
+            return await self.handle_message(payload, session)
+        
+        if not payload:
+            return rpc_error(INVALID_REQUEST, "Invalid Request", data="Empty batch")
+        if len(payload) > self.config.max_batch_size:
+            return rpc_error(
+                INVALID_REQUEST, "Invalid Request",
+                data=f"Batch of {len(payload)} exceeds the limit of {self.config.max_batch_size}"
+            )
+        
+        # The registry's scheduler bounds how many of these actually run at once
+        responses = await asyncio.gather(*(self.handle_message(message, session) for message in payload))
+        responses = [response for response in responses if response is not None]
+        return responses or None
+    
+    async def handle_message(self, message: Any, session: Optional[MCPSession] = None) -> Optional[Dict[str, Any]]:
+        """Handle one JSON-RPC message; returns None for notifications"""
+        session = session or MCPSession()
+        if not isinstance(message, dict):
+            return rpc_error(INVALID_REQUEST, "Invalid Request")
+        
+        try:
+            request = MCPRequest.model_validate(message)
+        except ValidationError as e:
+            request_id = message.get("id")
+            return rpc_error(
+                INVALID_REQUEST, "Invalid Request",
+                request_id if isinstance(request_id, (str, int)) else None,
+                data=str(e)
+            )
+        
+        is_notification = "id" not in message
+        try:
+            response = rpc_result(await self._handle_mcp_request(request, session), request.id)
+        except MCPError as e:
+            response = rpc_error(e.code, e.message, request.id, e.data)
+        except Exception as e:
+            logger.error(f"MCP request failed: {e}")
+            response = rpc_error(INTERNAL_ERROR, "Internal error", request.id, str(e))
+        
+        return None if is_notification else response
+    
+    async def _handle_mcp_request(self, request: MCPRequest, session: MCPSession) -> Any:
         """Handle MCP protocol requests"""
         method = request.method
         params = request.params or {}
         
-        if method == "tools/list":
+        if method == "initialize":
+            # Agree to the client's revision when supported, else offer the default
+            requested = params.get("protocolVersion")
+            session.protocol_version = requested if requested in SUPPORTED_PROTOCOL_VERSIONS else PROTOCOL_VERSION
+            return {
+                "protocolVersion": session.protocol_version,
+                "capabilities": {"tools": {}},
+                "serverInfo": {"name": self.config.server_name, "version": self.config.server_version}
+            }
+        
+        elif method in ("ping", "notifications/initialized"):
+            return {}
+        
+        elif method == "tools/list":
             return {
-                "tools": self.tool_registry.list_tools()
+                "tools": self.tool_registry.catalog.info
             }
         
         elif method == "tools/call":
@@ -213,37 +365,30 @@ class MCPServer:
             tool_params = params.get("arguments", {})
             
             if not tool_name:
-                raise ValueError("Tool name is required")
-            
-            result = await self.tool_registry.execute_tool_async(tool_name, **tool_params)
+                raise MCPError(INVALID_PARAMS, "Tool name is required")
+            if not isinstance(tool_params, dict):
+                raise MCPError(INVALID_PARAMS, "Tool arguments must be an object")
             
-            return {
-                "content": [
-                    {
-                        "type": "text",
-                        "text": json.dumps(result.data) if result.success else result.error
-                    }
-                ],
-                "isError": not result.success
-            }
+            result = await self.dispatcher.call(tool_name, tool_params)
+            return tool_call_result(result, structured=session.structured_content)
         
         elif method == "tools/get_schema":
             tool_name = params.get("name")
             
             if not tool_name:
-                raise ValueError("Tool name is required")
+                raise MCPError(INVALID_PARAMS, "Tool name is required")
             
-            tool = self.tool_registry.get_tool(tool_name)
-            if not tool:
-                raise ValueError(f"Tool '{tool_name}' not found")
+            schema = self.tool_registry.catalog.schemas.get(tool_name)
+            if schema is None:
+                raise MCPError(INVALID_PARAMS, f"Tool '{tool_name}' not found")
             
             return {
                 "name": tool_name,
-                "schema": tool.get_schema()
+                "schema": schema
             }
         
         else:
-            raise ValueError(f"Unknown MCP method: {method}")
+            raise MCPError(METHOD_NOT_FOUND, f"Unknown MCP method: {method}")
     
     async def start(self):
         """Start the MCP server"""
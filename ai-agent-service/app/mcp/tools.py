@@ -8,14 +8,19 @@ Tools are standardized interfaces that can be discovered and used by AI agents.
 import asyncio
 import json
 import logging
+import time
 from typing import Dict, Any, List, Optional, Union
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from datetime import datetime, timedelta
 import httpx
 import aiohttp
 
+from app.services.http_pool import http_pool, UpstreamConfig
+from app.services.async_bridge import async_bridge
 from .config import MCPConfig, ToolConfig
+from .resilience import CircuitBreaker, backoff_delay
+from .metrics import tool_metrics, classify_outcome
 
 logger = logging.getLogger(__name__)
 
@@ -52,6 +57,18 @@ class MCPTool(ABC):
         """Get the tool's input schema"""
         pass
     
+    def get_fallback_data(self, **kwargs) -> Optional[Dict[str, Any]]:
+        """Get mock data to serve while the tool's circuit breaker is open"""
+        return None
+    
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """Client errors (4xx other than 429) will fail the same way on retry"""
+        if isinstance(error, httpx.HTTPStatusError):
+            status_code = error.response.status_code
+            return status_code >= 500 or status_code == 429
+        return True
+    
     def get_info(self) -> Dict[str, Any]:
         """Get tool information"""
         return {
@@ -88,32 +105,32 @@ class PackageDataTool(MCPTool):
         start_time = datetime.now()
         
         try:
-            async with httpx.AsyncClient(timeout=self.config.timeout) as client:
-                # Call package service API
-                response = await client.get(
-                    f"{self.config.base_url}/api/v1/packages/{package_id}",
-                    headers={"Content-Type": "application/json"}
-                )
-                response.raise_for_status()
-                package_data = response.json()
-                
-                # If include_events is False, remove tracking events
-                if not include_events and "tracking_events" in package_data:
-                    del package_data["tracking_events"]
-                
-                execution_time = (datetime.now() - start_time).total_seconds()
-                
-                return ToolResult(
-                    success=True,
-                    data=package_data,
-                    execution_time=execution_time,
-                    metadata={
-                        "tool": self.config.name,
-                        "package_id": package_id,
-                        "include_events": include_events
-                    }
-                )
-                
+            client = http_pool.get(self.config.name)
+            # Call package service API
+            response = await client.get(
+                f"{self.config.base_url}/api/v1/packages/{package_id}",
+                headers={"Content-Type": "application/json"}
+            )
+            response.raise_for_status()
+            package_data = response.json()
+            
+            # If include_events is False, remove tracking events
+            if not include_events and "tracking_events" in package_data:
+                del package_data["tracking_events"]
+            
+            execution_time = (datetime.now() - start_time).total_seconds()
+            
+            return ToolResult(
+                success=True,
+                data=package_data,
+                execution_time=execution_time,
+                metadata={
+                    "tool": self.config.name,
+                    "package_id": package_id,
+                    "include_events": include_events
+                }
+            )
+        
         except httpx.HTTPError as e:
             execution_time = (datetime.now() - start_time).total_seconds()
             error_msg = f"HTTP error retrieving package data: {str(e)}"
@@ -124,7 +141,7 @@ class PackageDataTool(MCPTool):
                 data=None,
                 error=error_msg,
                 execution_time=execution_time,
-                metadata={"tool": self.config.name, "package_id": package_id}
+                metadata={"tool": self.config.name, "package_id": package_id, "retryable": self._is_retryable(e)}
             )
         except Exception as e:
             execution_time = (datetime.now() - start_time).total_seconds()
@@ -136,7 +153,7 @@ class PackageDataTool(MCPTool):
                 data=None,
                 error=error_msg,
                 execution_time=execution_time,
-                metadata={"tool": self.config.name, "package_id": package_id}
+                metadata={"tool": self.config.name, "package_id": package_id, "retryable": self._is_retryable(e)}
             )
 
 
@@ -167,15 +184,7 @@ class WeatherDataTool(MCPTool):
         try:
             if not self.config.api_key:
                 # Return mock data if no API key
-                weather_data = {
-                    "location": location,
-                    "temperature": "22°C",
-                    "conditions": "Clear",
-                    "wind_speed": "15 km/h",
-                    "visibility": "10 km",
-                    "weather_impact": "No significant impact on delivery",
-                    "source": "mock"
-                }
+                weather_data = self.get_fallback_data(location)
                 
                 execution_time = (datetime.now() - start_time).total_seconds()
                 return ToolResult(
@@ -186,38 +195,38 @@ class WeatherDataTool(MCPTool):
                 )
             
             # Call OpenWeatherMap API
-            async with httpx.AsyncClient(timeout=self.config.timeout) as client:
-                response = await client.get(
-                    f"{self.config.base_url}/weather",
-                    params={
-                        "q": location,
-                        "appid": self.config.api_key,
-                        "units": units
-                    }
-                )
-                response.raise_for_status()
-                weather_data = response.json()
-                
-                # Transform to our format
-                transformed_data = {
-                    "location": weather_data["name"],
-                    "temperature": f"{weather_data['main']['temp']}°{'C' if units == 'metric' else 'F'}",
-                    "conditions": weather_data["weather"][0]["description"].title(),
-                    "wind_speed": f"{weather_data['wind']['speed']} m/s",
-                    "visibility": f"{weather_data.get('visibility', 0) / 1000:.1f} km",
-                    "humidity": f"{weather_data['main']['humidity']}%",
-                    "weather_impact": self._assess_weather_impact(weather_data),
-                    "source": "openweathermap"
+            client = http_pool.get(self.config.name)
+            response = await client.get(
+                f"{self.config.base_url}/weather",
+                params={
+                    "q": location,
+                    "appid": self.config.api_key,
+                    "units": units
                 }
-                
-                execution_time = (datetime.now() - start_time).total_seconds()
-                return ToolResult(
-                    success=True,
-                    data=transformed_data,
-                    execution_time=execution_time,
-                    metadata={"tool": self.config.name, "location": location, "source": "api"}
-                )
-                
+            )
+            response.raise_for_status()
+            weather_data = response.json()
+            
+            # Transform to our format
+            transformed_data = {
+                "location": weather_data["name"],
+                "temperature": f"{weather_data['main']['temp']}°{'C' if units == 'metric' else 'F'}",
+                "conditions": weather_data["weather"][0]["description"].title(),
+                "wind_speed": f"{weather_data['wind']['speed']} m/s",
+                "visibility": f"{weather_data.get('visibility', 0) / 1000:.1f} km",
+                "humidity": f"{weather_data['main']['humidity']}%",
+                "weather_impact": self._assess_weather_impact(weather_data),
+                "source": "openweathermap"
+            }
+            
+            execution_time = (datetime.now() - start_time).total_seconds()
+            return ToolResult(
+                success=True,
+                data=transformed_data,
+                execution_time=execution_time,
+                metadata={"tool": self.config.name, "location": location, "source": "api"}
+            )
+        
         except Exception as e:
             execution_time = (datetime.now() - start_time).total_seconds()
             error_msg = f"Error retrieving weather data: {str(e)}"
@@ -228,9 +237,21 @@ class WeatherDataTool(MCPTool):
                 data=None,
                 error=error_msg,
                 execution_time=execution_time,
-                metadata={"tool": self.config.name, "location": location}
+                metadata={"tool": self.config.name, "location": location, "retryable": self._is_retryable(e)}
             )
     
+    def get_fallback_data(self, location: str, units: str = "metric") -> Dict[str, Any]:
+        """Get mock weather data"""
+        return {
+            "location": location,
+            "temperature": "22°C",
+            "conditions": "Clear",
+            "wind_speed": "15 km/h",
+            "visibility": "10 km",
+            "weather_impact": "No significant impact on delivery",
+            "source": "mock"
+        }
+    
     def _assess_weather_impact(self, weather_data: Dict[str, Any]) -> str:
         """Assess the impact of weather on delivery"""
         conditions = weather_data["weather"][0]["main"].lower()
@@ -276,15 +297,7 @@ class TrafficDataTool(MCPTool):
         try:
             if not self.config.api_key:
                 # Return mock data if no API key
-                traffic_data = {
-                    "route": f"{origin} → {destination}",
-                    "current_delay": "15 minutes",
-                    "traffic_level": "Moderate",
-                    "estimated_duration": "2h 30m",
-                    "incidents": [],
-                    "recommended_alternatives": ["Route A", "Route B"],
-                    "source": "mock"
-                }
+                traffic_data = self.get_fallback_data(origin, destination)
                 
                 execution_time = (datetime.now() - start_time).total_seconds()
                 return ToolResult(
@@ -295,50 +308,50 @@ class TrafficDataTool(MCPTool):
                 )
             
             # Call Google Maps API
-            async with httpx.AsyncClient(timeout=self.config.timeout) as client:
-                response = await client.get(
-                    f"{self.config.base_url}/directions/json",
-                    params={
-                        "origin": origin,
-                        "destination": destination,
-                        "departure_time": departure_time,
-                        "key": self.config.api_key,
-                        "traffic_model": "best_guess"
-                    }
-                )
-                response.raise_for_status()
-                traffic_data = response.json()
-                
-                # Transform to our format
-                if traffic_data["routes"]:
-                    route = traffic_data["routes"][0]
-                    leg = route["legs"][0]
-                    
-                    transformed_data = {
-                        "route": f"{origin} → {destination}",
-                        "current_delay": f"{leg['duration_in_traffic']['text']}",
-                        "traffic_level": self._assess_traffic_level(leg),
-                        "estimated_duration": leg["duration"]["text"],
-                        "distance": leg["distance"]["text"],
-                        "incidents": self._extract_incidents(route),
-                        "recommended_alternatives": self._get_alternatives(traffic_data["routes"]),
-                        "source": "google_maps"
-                    }
-                else:
-                    transformed_data = {
-                        "route": f"{origin} → {destination}",
-                        "error": "No route found",
-                        "source": "google_maps"
-                    }
-                
-                execution_time = (datetime.now() - start_time).total_seconds()
-                return ToolResult(
-                    success=True,
-                    data=transformed_data,
-                    execution_time=execution_time,
-                    metadata={"tool": self.config.name, "origin": origin, "destination": destination, "source": "api"}
-                )
+            client = http_pool.get(self.config.name)
+            response = await client.get(
+                f"{self.config.base_url}/directions/json",
+                params={
+                    "origin": origin,
+                    "destination": destination,
+                    "departure_time": departure_time,
+                    "key": self.config.api_key,
+                    "traffic_model": "best_guess"
+                }
+            )
+            response.raise_for_status()
+            traffic_data = response.json()
+            
+            # Transform to our format
+            if traffic_data["routes"]:
+                route = traffic_data["routes"][0]
+                leg = route["legs"][0]
                 
+                transformed_data = {
+                    "route": f"{origin} → {destination}",
+                    "current_delay": f"{leg['duration_in_traffic']['text']}",
+                    "traffic_level": self._assess_traffic_level(leg),
+                    "estimated_duration": leg["duration"]["text"],
+                    "distance": leg["distance"]["text"],
+                    "incidents": self._extract_incidents(route),
+                    "recommended_alternatives": self._get_alternatives(traffic_data["routes"]),
+                    "source": "google_maps"
+                }
+            else:
+                transformed_data = {
+                    "route": f"{origin} → {destination}",
+                    "error": "No route found",
+                    "source": "google_maps"
+                }
+            
+            execution_time = (datetime.now() - start_time).total_seconds()
+            return ToolResult(
+                success=True,
+                data=transformed_data,
+                execution_time=execution_time,
+                metadata={"tool": self.config.name, "origin": origin, "destination": destination, "source": "api"}
+            )
+        
         except Exception as e:
             execution_time = (datetime.now() - start_time).total_seconds()
             error_msg = f"Error retrieving traffic data: {str(e)}"
@@ -349,9 +362,21 @@ class TrafficDataTool(MCPTool):
                 data=None,
                 error=error_msg,
                 execution_time=execution_time,
-                metadata={"tool": self.config.name, "origin": origin, "destination": destination}
+                metadata={"tool": self.config.name, "origin": origin, "destination": destination, "retryable": self._is_retryable(e)}
             )
     
+    def get_fallback_data(self, origin: str, destination: str, departure_time: str = "now") -> Dict[str, Any]:
+        """Get mock traffic data"""
+        return {
+            "route": f"{origin} → {destination}",
+            "current_delay": "15 minutes",
+            "traffic_level": "Moderate",
+            "estimated_duration": "2h 30m",
+            "incidents": [],
+            "recommended_alternatives": ["Route A", "Route B"],
+            "source": "mock"
+        }
+    
     def _assess_traffic_level(self, leg: Dict[str, Any]) -> str:
         """Assess traffic level based on duration vs duration in traffic"""
         duration = leg["duration"]["value"]
@@ -435,7 +460,7 @@ class CarrierTrackingTool(MCPTool):
                 execution_time=execution_time,
                 metadata={"tool": self.config.name, "tracking_number": tracking_number, "source": "api"}
             )
-                
+        
         except Exception as e:
             execution_time = (datetime.now() - start_time).total_seconds()
             error_msg = f"Error retrieving tracking data: {str(e)}"
@@ -446,9 +471,13 @@ class CarrierTrackingTool(MCPTool):
                 data=None,
                 error=error_msg,
                 execution_time=execution_time,
-                metadata={"tool": self.config.name, "tracking_number": tracking_number}
+                metadata={"tool": self.config.name, "tracking_number": tracking_number, "retryable": self._is_retryable(e)}
             )
     
+    def get_fallback_data(self, tracking_number: str, include_events: bool = True) -> Dict[str, Any]:
+        """Get mock tracking data"""
+        return self._get_mock_tracking_data(tracking_number)
+    
     def _get_mock_tracking_data(self, tracking_number: str) -> Dict[str, Any]:
         """Get mock tracking data"""
         return {
@@ -513,10 +542,19 @@ class ToolRegistry:
     """Registry for managing MCP tools"""
     
     def __init__(self, mcp_config: MCPConfig):
+        from .cache import ToolResultCache
+        from .catalog import ToolCatalog
+        from .scheduler import ToolScheduler
+        
         self.config = mcp_config
         self.tools: Dict[str, MCPTool] = {}
         self.tool_configs = {}
+        self.cache = ToolResultCache(max_entries=mcp_config.cache_max_entries)
+        self.scheduler = ToolScheduler(mcp_config)
+        self.breakers: Dict[str, CircuitBreaker] = {}
         self._initialize_tools()
+        # Pre-serialized tool listing, rebuilt only when a tool's configuration changes
+        self.catalog = ToolCatalog.build(self.tools)
     
     def _initialize_tools(self):
         """Initialize all available tools"""
@@ -544,19 +582,55 @@ class ToolRegistry:
         tool_class = tool_class_map.get(tool_name)
         if tool_class:
             self.tools[tool_name] = tool_class(tool_config, self.config)
+            self.scheduler.configure_tool(tool_config)
+            self.breakers[tool_name] = CircuitBreaker(
+                failure_threshold=self.config.circuit_failure_threshold,
+                recovery_timeout=self.config.circuit_recovery_timeout
+            )
+            http_pool.configure(tool_name, UpstreamConfig(
+                timeout=tool_config.timeout,
+                headers=tool_config.headers,
+                http2=bool(tool_config.base_url and tool_config.base_url.startswith("https://"))
+            ))
         else:
             logger.warning(f"No tool class found for {tool_name}")
     
+    def configure_tool(self, tool_config: ToolConfig):
+        """Add, replace or disable a tool's configuration and rebuild the catalog"""
+        from .catalog import ToolCatalog
+        
+        self.tool_configs[tool_config.name] = tool_config
+        self.tools.pop(tool_config.name, None)
+        if tool_config.enabled:
+            self._create_tool_instance(tool_config.name, tool_config)
+        self.catalog = ToolCatalog.build(self.tools)
+    
     def get_tool(self, tool_name: str) -> Optional[MCPTool]:
         """Get a tool by name"""
         return self.tools.get(tool_name)
     
     def list_tools(self) -> Dict[str, Dict[str, Any]]:
-        """List all available tools with their information"""
-        return {name: tool.get_info() for name, tool in self.tools.items()}
+        """List all available tools with their information (from the catalog; do not modify)"""
+        return self.catalog.info
+    
+    def _get_cache_ttl(self, tool: MCPTool) -> int:
+        """Get how long a tool's results may be cached (0 = not cached)"""
+        if not self.config.enable_tool_caching:
+            return 0
+        if tool.config.cache_ttl is not None:
+            return tool.config.cache_ttl
+        return self.config.cache_ttl
+    
+    def invalidate_cache(self, tool_name: Optional[str] = None, match_any: Optional[Dict[str, List[Any]]] = None, **match) -> int:
+        """Invalidate cached results for a tool and/or matching arguments"""
+        return self.cache.invalidate(tool_name, match_any, **match)
     
     def execute_tool(self, tool_name: str, **kwargs) -> ToolResult:
-        """Execute a tool with given parameters"""
+        """Execute a tool with given parameters (blocking; runs on the shared loop)"""
+        return async_bridge.run(self.execute_tool_async(tool_name, **kwargs))
+    
+    async def execute_tool_async(self, tool_name: str, **kwargs) -> ToolResult:
+        """Execute a tool asynchronously"""
         tool = self.get_tool(tool_name)
         if not tool:
             return ToolResult(
@@ -565,16 +639,130 @@ class ToolRegistry:
                 error=f"Tool '{tool_name}' not found"
             )
         
-        return asyncio.run(tool.execute(**kwargs))
+        # Fill in schema defaults so explicit and implicit defaults share a cache entry
+        arguments = {**self.catalog.defaults.get(tool_name, {}), **kwargs}
+        
+        started = time.perf_counter()
+        ttl = self._get_cache_ttl(tool)
+        if not ttl:
+            result = await self._execute_guarded(tool, arguments, **kwargs)
+        else:
+            result = await self.cache.get_or_execute(
+                tool_name, arguments, ttl, lambda: self._execute_guarded(tool, arguments, **kwargs)
+            )
+        
+        tool_metrics.record(tool_name, classify_outcome(result), time.perf_counter() - started)
+        return result
     
-    async def execute_tool_async(self, tool_name: str, **kwargs) -> ToolResult:
-        """Execute a tool asynchronously"""
-        tool = self.get_tool(tool_name)
-        if not tool:
+    async def _execute_guarded(self, tool: MCPTool, arguments: Dict[str, Any], **kwargs) -> ToolResult:
+        """Execute a tool behind its circuit breaker and the scheduler"""
+        from .scheduler import ToolRejectedError
+        
+        tool_name = tool.config.name
+        breaker = self.breakers[tool_name]
+        if not breaker.allow_request():
+            return self._fallback_result(tool, arguments, **kwargs)
+        
+        result = None
+        try:
+            result = await self._execute_with_retries(tool, **kwargs)
+        except ToolRejectedError as e:
+            logger.warning(str(e))
             return ToolResult(
                 success=False,
                 data=None,
-                error=f"Tool '{tool_name}' not found"
+                error=str(e),
+                metadata={"tool": tool_name, "rejected": e.reason}
+            )
+        finally:
+            if result is None:
+                # Rejected or cancelled: says nothing about upstream health
+                breaker.release_probe()
+            elif result.success or result.metadata.get("retryable") is False:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+        
+        return result
+    
+    async def _execute_with_retries(self, tool: MCPTool, **kwargs) -> ToolResult:
+        """Run a tool, retrying retryable failures with jittered backoff within its timeout (ToolRejectedError if not admitted)"""
+        from .scheduler import ToolRejectedError
+        
+        tool_name = tool.config.name
+        deadline = None
+        attempt = 0
+        result = None
+        
+        while True:
+            if result is None:
+                await self.scheduler.acquire(tool_name)
+                deadline = time.monotonic() + tool.config.timeout
+            else:
+                try:
+                    await self.scheduler.acquire(
+                        tool_name, min(self.scheduler.queue_timeout, max(0.0, deadline - time.monotonic()))
+                    )
+                except ToolRejectedError as e:
+                    logger.warning(f"Not retrying {tool_name}: {e}")
+                    break
+            
+            attempt += 1
+            try:
+                result = await asyncio.wait_for(tool.execute(**kwargs), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                result = ToolResult(
+                    success=False,
+                    data=None,
+                    error=f"Tool '{tool_name}' timed out after {tool.config.timeout}s",
+                    metadata={"tool": tool_name, "retryable": True}
+                )
+            except Exception as e:
+                result = ToolResult(
+                    success=False,
+                    data=None,
+                    error=f"Tool '{tool_name}' failed: {str(e)}",
+                    metadata={"tool": tool_name, "retryable": True}
+                )
+            finally:
+                # Each attempt holds a slot only while it runs, not through the backoff
+                self.scheduler.release()
+            
+            if result.success or result.metadata.get("retryable") is False or attempt > tool.config.retry_attempts:
+                break
+            
+            delay = backoff_delay(attempt, self.config.retry_backoff_base, self.config.retry_backoff_max)
+            if time.monotonic() + delay >= deadline:
+                break
+            
+            logger.info(f"Retrying {tool_name} in {delay:.2f}s (attempt {attempt + 1}): {result.error}")
+            await asyncio.sleep(delay)
+        
+        result.metadata["attempts"] = attempt
+        return result
+    
+    def _fallback_result(self, tool: MCPTool, arguments: Dict[str, Any], **kwargs) -> ToolResult:
+        """Serve a stale cached or mock result while a tool's circuit is open"""
+        tool_name = tool.config.name
+        
+        stale = self.cache.get_stale(tool_name, arguments)
+        if stale is not None:
+            return replace(stale, metadata={**stale.metadata, "fallback": "stale_cache"})
+        
+        try:
+            data = tool.get_fallback_data(**kwargs)
+        except TypeError:
+            data = None
+        if data is not None:
+            return ToolResult(
+                success=True,
+                data=data,
+                metadata={"tool": tool_name, "source": "mock", "fallback": "mock"}
             )
         
-        return await tool.execute(**kwargs)
+        return ToolResult(
+            success=False,
+            data=None,
+            error=f"Circuit breaker open for '{tool_name}', upstream unavailable",
+            metadata={"tool": tool_name, "circuit": "open"}
+        )
@@ -0,0 +1,118 @@
+from sqlalchemy import Column, String, DateTime, Float, Integer, Boolean, Text, Index
+import json
+from app.database import Base
+from app.agents.investigator_agent import InvestigationResult, InvestigationType
+
+class Investigation(Base):
+    __tablename__ = "investigations"
+
+    id = Column(String(100), primary_key=True)  # investigation_id
+    package_id = Column(String(36), nullable=False, index=True)
+    investigation_type = Column(String(50), nullable=False, index=True)
+    priority = Column(String(20), nullable=False, index=True)
+    confidence_score = Column(Float, default=0.0)
+    estimated_resolution_time = Column(String(50))
+    
+    # Result details
+    findings = Column(Text)  # JSON as text for SQLite
+    recommendations = Column(Text)  # JSON as text for SQLite
+    next_actions = Column(Text)  # JSON as text for SQLite
+    latency_breakdown = Column(Text)  # JSON as text for SQLite
+    
+    # Metadata (naive UTC, like InvestigationResult.created_at)
+    created_at = Column(DateTime, nullable=False, index=True)
+    
+    __table_args__ = (
+        # Latest investigation for a package
+        Index("ix_investigations_package_created", "package_id", "created_at"),
+    )
+    
+    @classmethod
+    def from_result(cls, result: InvestigationResult) -> "Investigation":
+        return cls(
+            id=result.investigation_id,
+            package_id=result.package_id,
+            investigation_type=result.investigation_type.value,
+            priority=result.priority,
+            confidence_score=result.confidence_score,
+            estimated_resolution_time=result.estimated_resolution_time,
+            findings=json.dumps(result.findings),
+            recommendations=json.dumps(result.recommendations),
+            next_actions=json.dumps(result.next_actions),
+            latency_breakdown=json.dumps(result.latency_breakdown),
+            created_at=result.created_at
+        )
+    
+    def to_result(self) -> InvestigationResult:
+        return InvestigationResult(
+            investigation_id=self.id,
+            package_id=self.package_id,
+            investigation_type=InvestigationType(self.investigation_type),
+            findings=json.loads(self.findings or "[]"),
+            recommendations=json.loads(self.recommendations or "[]"),
+            confidence_score=self.confidence_score or 0.0,
+            priority=self.priority,
+            estimated_resolution_time=self.estimated_resolution_time,
+            next_actions=json.loads(self.next_actions or "[]"),
+            created_at=self.created_at,
+            latency_breakdown=json.loads(self.latency_breakdown or "{}")
+        )
+    
+    def __repr__(self):
+        return f"<Investigation(id='{self.id}', package_id='{self.package_id}', priority='{self.priority}')>"
+
+class InvestigationUsage(Base):
+    __tablename__ = "investigation_usage"
+
+    id = Column(String(100), primary_key=True)  # investigation_id
+    package_id = Column(String(36), nullable=False)
+    tenant_id = Column(String(100), nullable=False, index=True)
+    anomaly_type = Column(String(50), nullable=False, index=True)
+    source = Column(String(20), nullable=False)  # llm, rules, cache or budget
+    model = Column(String(50))
+    
+    # Consumption
+    llm_calls = Column(Integer, default=0)
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
+    total_tokens = Column(Integer, default=0)
+    tool_calls = Column(Integer, default=0)
+    llm_latency_ms = Column(Text)  # JSON as text for SQLite, one entry per LLM call
+    wall_time_ms = Column(Float, default=0.0)
+    cost_usd = Column(Float, default=0.0)
+    budget = Column(Integer, default=0)
+    budget_exceeded = Column(Boolean, default=False)
+    
+    # Metadata (naive UTC, like InvestigationResult.created_at)
+    created_at = Column(DateTime, nullable=False, index=True)
+    
+    __table_args__ = (
+        # Today's usage per tenant
+        Index("ix_investigation_usage_tenant_created", "tenant_id", "created_at"),
+    )
+    
+    @classmethod
+    def from_result(cls, result: InvestigationResult) -> "InvestigationUsage":
+        usage = result.usage
+        return cls(
+            id=result.investigation_id,
+            package_id=result.package_id,
+            tenant_id=usage.get("tenant_id", "default"),
+            anomaly_type=usage.get("anomaly_type", "unknown"),
+            source=usage.get("source", "llm"),
+            model=usage.get("model"),
+            llm_calls=usage.get("llm_calls", 0),
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+            total_tokens=usage.get("total_tokens", 0),
+            tool_calls=usage.get("tool_calls", 0),
+            llm_latency_ms=json.dumps(usage.get("llm_latency_ms", [])),
+            wall_time_ms=usage.get("wall_time_ms", 0.0),
+            cost_usd=usage.get("cost_usd", 0.0),
+            budget=usage.get("budget", 0),
+            budget_exceeded=usage.get("budget_exceeded", False),
+            created_at=result.created_at
+        )
+    
+    def __repr__(self):
+        return f"<InvestigationUsage(id='{self.id}', tenant_id='{self.tenant_id}', total_tokens={self.total_tokens})>"
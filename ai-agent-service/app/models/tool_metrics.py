@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float, Text, Index
+from app.database import Base
+
+class ToolExecutionStats(Base):
+    __tablename__ = "tool_execution_stats"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    tool_name = Column(String(100), nullable=False)
+    outcome = Column(String(20), nullable=False)  # success, cache_hit, fallback, error, rejected
+    
+    # One row per tool/outcome per flush window (naive UTC)
+    window_start = Column(DateTime, nullable=False, index=True)
+    window_end = Column(DateTime, nullable=False)
+    
+    count = Column(Integer, nullable=False, default=0)
+    total_ms = Column(Float, nullable=False, default=0.0)
+    histogram = Column(Text)  # sparse {bucket index: count} JSON, see app.mcp.metrics
+    
+    __table_args__ = (
+        Index("ix_tool_execution_stats_tool_window", "tool_name", "window_start"),
+    )
+    
+    def __repr__(self):
+        return f"<ToolExecutionStats(tool_name='{self.tool_name}', outcome='{self.outcome}', count={self.count})>"
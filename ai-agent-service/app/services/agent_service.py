@@ -3,16 +3,60 @@ Agent Service for managing AI agents and their operations
 """
 
 import asyncio
-from typing import Dict, List, Optional, Any
+import json
+import os
+from typing import Dict, List, Optional, Any, Tuple, AsyncIterator
 from datetime import datetime, timedelta
+from sqlalchemy import func, case
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from app.database import SessionLocal
+from app.models.investigation import Investigation, InvestigationUsage
+from app.services.websocket_client import websocket_service_client
+
 from app.agents.investigator_agent import (
     InvestigatorAgent, 
     InvestigationResult, 
     InvestigationType,
     get_investigator_agent
 )
+from app.agents.usage_accounting import usage_ledger
+
+# Stored investigations older than this are swept
+INVESTIGATION_TTL_HOURS = int(os.getenv("INVESTIGATION_TTL_HOURS", "168"))
+INVESTIGATION_SWEEP_INTERVAL = int(os.getenv("INVESTIGATION_SWEEP_INTERVAL", "3600"))  # seconds
+
+# Streamed LLM tokens are forwarded to WebSocket subscribers in chunks of this many
+TOKEN_BROADCAST_CHUNK = 40
+
+# Progress fields broadcast to every agent_activity subscriber: step names and timings only.
+# Prefetched context, tool inputs/outputs and errors stay in the caller's SSE response
+ACTIVITY_FIELDS = ("investigation_id", "tool", "duration_ms")
+
+# Recent investigations sampled for the average latency breakdown
+LATENCY_SAMPLE_SIZE = 200
+
+def cluster_key(package_id: str, anomaly_data: Dict[str, Any]) -> Tuple[str, ...]:
+    """Incident key: (last scan location, destination, anomaly type)"""
+    location = anomaly_data.get("last_scan_location") or anomaly_data.get("location")
+    destination = anomaly_data.get("destination")
+    
+    # Without a location there is nothing to tie the package to other reports
+    if not location:
+        return ("package", package_id)
+    
+    return tuple(
+        str(value or "").strip().casefold()
+        for value in (location, destination, anomaly_data.get("anomaly_type"))
+    )
+
+def cluster_anomalies(items: List[Tuple[str, Dict[str, Any]]]) -> List[List[Tuple[str, Dict[str, Any]]]]:
+    """Group (package_id, anomaly_data) pairs that share an incident, keeping input order"""
+    clusters: Dict[Tuple[str, ...], List[Tuple[str, Dict[str, Any]]]] = {}
+    for package_id, anomaly_data in items:
+        clusters.setdefault(cluster_key(package_id, anomaly_data), []).append((package_id, anomaly_data))
+    return list(clusters.values())
 
 class AgentService:
     """Service for managing AI agents"""
@@ -20,26 +64,31 @@ class AgentService:
     def __init__(self, db: Session):
         self.db = db
         self.investigator_agent = get_investigator_agent(db)
-        self.active_investigations: Dict[str, InvestigationResult] = {}
     
-    async def process_anomaly(self, package_id: str, anomaly_data: Dict[str, Any]) -> InvestigationResult:
+    async def process_anomaly(
+        self,
+        package_id: str,
+        anomaly_data: Dict[str, Any],
+        tenant_id: Optional[str] = None
+    ) -> InvestigationResult:
         """Process a package anomaly using the investigator agent"""
         
         try:
             # Start investigation
             investigation_result = await self.investigator_agent.investigate_anomaly(
                 package_id=package_id,
-                anomaly_data=anomaly_data
+                anomaly_data=anomaly_data,
+                tenant_id=tenant_id
             )
             
             # Store investigation result
-            self.active_investigations[package_id] = investigation_result
+            self._store_investigations([investigation_result])
             
             # Log investigation
             self._log_investigation(investigation_result)
             
             return investigation_result
-            
+        
         except Exception as e:
             print(f"Error processing anomaly for package {package_id}: {str(e)}")
             
@@ -54,12 +103,110 @@ class AgentService:
                 priority="high",
                 estimated_resolution_time="Unknown",
                 next_actions=["Escalate to human investigator"],
-                created_at=datetime.utcnow()
+                created_at=datetime.utcnow(),
+                error=str(e)
             )
             
             return error_result
     
-    async def process_delay(self, package_id: str, delay_data: Dict[str, Any]) -> InvestigationResult:
+    async def stream_anomaly(
+        self,
+        package_id: str,
+        anomaly_data: Dict[str, Any],
+        tenant_id: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Process a package anomaly, yielding progress events as they happen and the result last"""
+        agent_id = f"investigator_{package_id}"
+        tokens: List[str] = []
+        
+        async def flush_tokens():
+            if tokens:
+                await websocket_service_client.broadcast_agent_activity(
+                    agent_id=agent_id,
+                    action="llm_tokens",
+                    package_id=package_id,
+                    performance_metrics={"text": "".join(tokens)}
+                )
+                tokens.clear()
+        
+        async for event, data in self.investigator_agent.stream_investigation(package_id, anomaly_data, tenant_id):
+            if event == "llm_token":
+                tokens.append(data["token"])
+                if len(tokens) >= TOKEN_BROADCAST_CHUNK:
+                    await flush_tokens()
+            elif event == "result":
+                await flush_tokens()
+                self._store_investigations([data])
+                self._log_investigation(data)
+                await websocket_service_client.broadcast_agent_activity(
+                    agent_id=agent_id,
+                    action="investigation_completed",
+                    package_id=package_id,
+                    status="completed",
+                    performance_metrics={
+                        "investigation_id": data.investigation_id,
+                        "priority": data.priority,
+                        "confidence_score": data.confidence_score
+                    }
+                )
+            else:
+                await flush_tokens()
+                await websocket_service_client.broadcast_agent_activity(
+                    agent_id=agent_id,
+                    action=event,
+                    package_id=package_id,
+                    performance_metrics={key: data[key] for key in ACTIVITY_FIELDS if key in data}
+                )
+            
+            yield event, data
+    
+    async def process_anomaly_cluster(
+        self,
+        members: List[Tuple[str, Dict[str, Any]]],
+        tenant_id: Optional[str] = None
+    ) -> Dict[str, InvestigationResult]:
+        """Investigate packages sharing one incident with a single agent run"""
+        
+        if len(members) == 1:
+            package_id, anomaly_data = members[0]
+            return {package_id: await self.process_anomaly(package_id, anomaly_data, tenant_id)}
+        
+        try:
+            results = await self.investigator_agent.investigate_cluster(members, tenant_id)
+        except Exception as e:
+            print(f"Error processing anomaly cluster of {len(members)} packages: {str(e)}")
+            results = {
+                package_id: await self.process_anomaly(package_id, anomaly_data, tenant_id)
+                for package_id, anomaly_data in members
+            }
+            return results
+        
+        self._store_investigations(list(results.values()))
+        self._log_investigation(next(iter(results.values())))
+        
+        return results
+    
+    async def process_anomalies(
+        self,
+        items: List[Tuple[str, Dict[str, Any]]],
+        tenant_id: Optional[str] = None
+    ) -> Dict[str, InvestigationResult]:
+        """Cluster anomalies by incident and investigate each cluster once"""
+        cluster_results = await asyncio.gather(*[
+            self.process_anomaly_cluster(members, tenant_id) for members in cluster_anomalies(items)
+        ])
+        
+        results: Dict[str, InvestigationResult] = {}
+        for cluster_result in cluster_results:
+            results.update(cluster_result)
+        return results
+    
+    async def process_delay(
+        self,
+        package_id: str,
+        delay_data: Dict[str, Any],
+        tenant_id: Optional[str] = None
+    ) -> InvestigationResult:
         """Process a package delay using the investigator agent"""
         
         # Convert delay to anomaly format for investigation
@@ -72,9 +219,14 @@ class AgentService:
             "affected_route": delay_data.get("affected_route", "Unknown")
         }
         
-        return await self.process_anomaly(package_id, anomaly_data)
+        return await self.process_anomaly(package_id, anomaly_data, tenant_id)
     
-    async def process_route_optimization(self, package_id: str, route_data: Dict[str, Any]) -> InvestigationResult:
+    async def process_route_optimization(
+        self,
+        package_id: str,
+        route_data: Dict[str, Any],
+        tenant_id: Optional[str] = None
+    ) -> InvestigationResult:
         """Process route optimization using the investigator agent"""
         
         # Convert route data to investigation format
@@ -88,9 +240,14 @@ class AgentService:
             "optimization_goals": route_data.get("goals", ["reduce_delivery_time", "minimize_cost"])
         }
         
-        return await self.process_anomaly(package_id, anomaly_data)
+        return await self.process_anomaly(package_id, anomaly_data, tenant_id)
     
-    async def process_predictive_analysis(self, package_id: str, prediction_data: Dict[str, Any]) -> InvestigationResult:
+    async def process_predictive_analysis(
+        self,
+        package_id: str,
+        prediction_data: Dict[str, Any],
+        tenant_id: Optional[str] = None
+    ) -> InvestigationResult:
         """Process predictive analysis using the investigator agent"""
         
         # Convert prediction data to investigation format
@@ -104,29 +261,68 @@ class AgentService:
             "confidence": prediction_data.get("confidence", 0.5)
         }
         
-        return await self.process_anomaly(package_id, anomaly_data)
+        return await self.process_anomaly(package_id, anomaly_data, tenant_id)
+    
+    def _store_investigations(self, investigation_results: List[InvestigationResult]):
+        """Persist investigation results and their usage (inserts: an ID collision raises)"""
+        try:
+            for investigation_result in investigation_results:
+                self.db.add(Investigation.from_result(investigation_result))
+                if investigation_result.usage:
+                    self.db.add(InvestigationUsage.from_result(investigation_result))
+            self.db.commit()
+        except IntegrityError:
+            self.db.rollback()
+            raise
+        except Exception as e:
+            self.db.rollback()
+            print(f"Error storing investigations: {str(e)}")
     
     def get_investigation_status(self, package_id: str) -> Optional[InvestigationResult]:
-        """Get investigation status for a package"""
-        return self.active_investigations.get(package_id)
+        """Get the latest investigation for a package"""
+        investigation = (
+            self.db.query(Investigation)
+            .filter(Investigation.package_id == package_id)
+            .order_by(Investigation.created_at.desc())
+            .first()
+        )
+        return investigation.to_result() if investigation else None
     
-    def get_all_investigations(self) -> List[InvestigationResult]:
-        """Get all active investigations"""
-        return list(self.active_investigations.values())
+    def get_all_investigations(self, limit: int = 100) -> List[InvestigationResult]:
+        """Get the most recent investigations"""
+        investigations = (
+            self.db.query(Investigation)
+            .order_by(Investigation.created_at.desc())
+            .limit(limit)
+            .all()
+        )
+        return [inv.to_result() for inv in investigations]
     
-    def get_investigations_by_priority(self, priority: str) -> List[InvestigationResult]:
+    def get_investigations_by_priority(self, priority: str, limit: int = 100) -> List[InvestigationResult]:
         """Get investigations by priority level"""
-        return [
-            inv for inv in self.active_investigations.values()
-            if inv.priority == priority
-        ]
+        investigations = (
+            self.db.query(Investigation)
+            .filter(Investigation.priority == priority)
+            .order_by(Investigation.created_at.desc())
+            .limit(limit)
+            .all()
+        )
+        return [inv.to_result() for inv in investigations]
     
-    def get_investigations_by_type(self, investigation_type: InvestigationType) -> List[InvestigationResult]:
+    def get_investigations_by_type(
+        self,
+        investigation_type: InvestigationType,
+        limit: int = 100
+    ) -> List[InvestigationResult]:
         """Get investigations by type"""
-        return [
-            inv for inv in self.active_investigations.values()
-            if inv.investigation_type == investigation_type
-        ]
+        investigations = (
+            self.db.query(Investigation)
+            .filter(Investigation.investigation_type == investigation_type.value)
+            .order_by(Investigation.created_at.desc())
+            .limit(limit)
+            .all()
+        )
+        return [inv.to_result() for inv in investigations]
     
     def _log_investigation(self, investigation_result: InvestigationResult):
         """Log investigation result"""
@@ -140,54 +336,164 @@ Investigation Complete:
 - Findings: {len(investigation_result.findings)} items
 - Recommendations: {len(investigation_result.recommendations)} items
 - Resolution Time: {investigation_result.estimated_resolution_time}
+- Latency (ms): {investigation_result.latency_breakdown}
 """)
     
-    async def cleanup_old_investigations(self, hours: int = 24):
-        """Clean up investigations older than specified hours"""
-        cutoff_time = datetime.utcnow() - timedelta(hours=hours)
-        
-        to_remove = []
-        for package_id, investigation in self.active_investigations.items():
-            if investigation.created_at < cutoff_time:
-                to_remove.append(package_id)
-        
-        for package_id in to_remove:
-            del self.active_investigations[package_id]
-        
-        print(f"Cleaned up {len(to_remove)} old investigations")
+    async def cleanup_old_investigations(self, hours: int = INVESTIGATION_TTL_HOURS) -> int:
+        """Delete investigations older than specified hours"""
+        removed = delete_expired_investigations(self.db, hours)
+        print(f"Cleaned up {removed} old investigations")
+        return removed
     
     async def get_agent_analytics(self) -> Dict[str, Any]:
         """Get analytics about agent performance"""
-        investigations = list(self.active_investigations.values())
+        total_investigations, average_confidence = self.db.query(
+            func.count(Investigation.id),
+            func.avg(Investigation.confidence_score)
+        ).one()
         
-        if not investigations:
+        if not total_investigations:
             return {
                 "total_investigations": 0,
                 "average_confidence": 0.0,
                 "priority_distribution": {},
                 "type_distribution": {},
-                "average_resolution_time": "N/A"
+                "average_resolution_time": "N/A",
+                "llm_cache": self.investigator_agent.result_cache.get_stats(),
+                "output_parsing": self.investigator_agent.output_parser.get_stats(),
+                "rules_engine": self.investigator_agent.rules_engine.get_stats()
             }
         
-        # Calculate analytics
-        total_investigations = len(investigations)
-        average_confidence = sum(inv.confidence_score for inv in investigations) / total_investigations
-        
         # Priority distribution
-        priority_distribution = {}
-        for inv in investigations:
-            priority_distribution[inv.priority] = priority_distribution.get(inv.priority, 0) + 1
+        priority_distribution = dict(
+            self.db.query(Investigation.priority, func.count(Investigation.id))
+            .group_by(Investigation.priority)
+            .all()
+        )
         
         # Type distribution
-        type_distribution = {}
-        for inv in investigations:
-            type_name = inv.investigation_type.value
-            type_distribution[type_name] = type_distribution.get(type_name, 0) + 1
+        type_distribution = dict(
+            self.db.query(Investigation.investigation_type, func.count(Investigation.id))
+            .group_by(Investigation.investigation_type)
+            .all()
+        )
+        
+        active_investigations = (
+            self.db.query(func.count(Investigation.id))
+            .filter(Investigation.created_at > datetime.utcnow() - timedelta(hours=1))
+            .scalar()
+        )
+        
+        # Average latency per stage over recent investigations (stored as JSON, so sampled)
+        stage_samples: Dict[str, List[float]] = {}
+        recent = (
+            self.db.query(Investigation.latency_breakdown)
+            .order_by(Investigation.created_at.desc())
+            .limit(LATENCY_SAMPLE_SIZE)
+            .all()
+        )
+        for (latency_breakdown,) in recent:
+            for stage, value in json.loads(latency_breakdown or "{}").items():
+                stage_samples.setdefault(stage, []).append(value)
+        average_latency = {
+            stage: round(sum(values) / len(values), 1) for stage, values in stage_samples.items()
+        }
         
         return {
             "total_investigations": total_investigations,
-            "average_confidence": round(average_confidence, 2),
+            "average_confidence": round(average_confidence or 0.0, 2),
             "priority_distribution": priority_distribution,
             "type_distribution": type_distribution,
-            "active_investigations": len([inv for inv in investigations if inv.created_at > datetime.utcnow() - timedelta(hours=1)])
+            "average_latency_breakdown": average_latency,
+            "llm_cache": self.investigator_agent.result_cache.get_stats(),
+            "output_parsing": self.investigator_agent.output_parser.get_stats(),
+            "rules_engine": self.investigator_agent.rules_engine.get_stats(),
+            "active_investigations": active_investigations
+        }
+
+    def get_usage_analytics(self, hours: int = 24) -> Dict[str, Any]:
+        """Token, cost, tool call and wall-time aggregates by anomaly type, tenant and source"""
+        since = datetime.utcnow() - timedelta(hours=hours)
+        columns = [
+            func.count(InvestigationUsage.id),
+            func.sum(InvestigationUsage.llm_calls),
+            func.sum(InvestigationUsage.prompt_tokens),
+            func.sum(InvestigationUsage.completion_tokens),
+            func.sum(InvestigationUsage.total_tokens),
+            func.sum(InvestigationUsage.tool_calls),
+            func.sum(InvestigationUsage.cost_usd),
+            func.avg(InvestigationUsage.wall_time_ms),
+            func.sum(case((InvestigationUsage.budget_exceeded.is_(True), 1), else_=0))
+        ]
+        
+        def aggregate(row) -> Dict[str, Any]:
+            count, llm_calls, prompt_tokens, completion_tokens, total_tokens, tool_calls, cost, wall_time, exceeded = row
+            return {
+                "investigations": count or 0,
+                "llm_calls": int(llm_calls or 0),
+                "prompt_tokens": int(prompt_tokens or 0),
+                "completion_tokens": int(completion_tokens or 0),
+                "total_tokens": int(total_tokens or 0),
+                "average_tokens": round((total_tokens or 0) / count, 1) if count else 0.0,
+                "tool_calls": int(tool_calls or 0),
+                "cost_usd": round(cost or 0.0, 4),
+                "average_wall_time_ms": round(wall_time or 0.0, 1),
+                "budget_exceeded": int(exceeded or 0)
+            }
+        
+        def grouped(column) -> Dict[str, Dict[str, Any]]:
+            rows = (
+                self.db.query(column, *columns)
+                .filter(InvestigationUsage.created_at >= since)
+                .group_by(column)
+                .all()
+            )
+            return {row[0]: aggregate(row[1:]) for row in rows}
+        
+        totals = self.db.query(*columns).filter(InvestigationUsage.created_at >= since).one()
+        return {
+            "window_hours": hours,
+            "totals": aggregate(totals),
+            "by_anomaly_type": grouped(InvestigationUsage.anomaly_type),
+            "by_tenant": grouped(InvestigationUsage.tenant_id),
+            "by_source": grouped(InvestigationUsage.source),
+            "tenant_budgets": usage_ledger.get_stats()
         }
+
+def load_tenant_usage(db: Session):
+    """Restore today's per-tenant token usage into the budget ledger (after a restart)"""
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    rows = (
+        db.query(InvestigationUsage.tenant_id, func.sum(InvestigationUsage.total_tokens))
+        .filter(InvestigationUsage.created_at >= today)
+        .group_by(InvestigationUsage.tenant_id)
+        .all()
+    )
+    usage_ledger.seed(dict(rows))
+
+def delete_expired_investigations(db: Session, hours: int = INVESTIGATION_TTL_HOURS) -> int:
+    """Delete investigations created more than `hours` ago (uses the created_at index)"""
+    cutoff_time = datetime.utcnow() - timedelta(hours=hours)
+    removed = (
+        db.query(Investigation)
+        .filter(Investigation.created_at < cutoff_time)
+        .delete(synchronize_session=False)
+    )
+    db.query(InvestigationUsage).filter(InvestigationUsage.created_at < cutoff_time).delete(synchronize_session=False)
+    db.commit()
+    return removed
+
+async def sweep_expired_investigations(interval: int = INVESTIGATION_SWEEP_INTERVAL):
+    """Periodically delete investigations past their TTL"""
+    while True:
+        await asyncio.sleep(interval)
+        db = SessionLocal()
+        try:
+            removed = delete_expired_investigations(db)
+            if removed:
+                print(f"🧹 Swept {removed} expired investigations")
+        except Exception as e:
+            db.rollback()
+            print(f"Investigation sweep failed: {str(e)}")
+        finally:
+            db.close()
@@ -0,0 +1,93 @@
+"""
+Sync-to-async bridge
+
+Runs coroutines for synchronous callers (LangChain's sync tool path,
+ToolRegistry.execute_tool) without creating an event loop per call. Calls
+from worker threads are scheduled on the server's event loop, so they share
+its pooled HTTP clients and the tool cache's single-flight; calls made where
+that loop cannot be used (no server loop, or from the loop's own thread) go
+to a dedicated background loop thread.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from typing import Any, Coroutine, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncBridge:
+    """Blocking entry point into long-lived event loops"""
+    
+    def __init__(self):
+        self._server_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._background_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._background_thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+    
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """Use the server's loop for calls coming from other threads"""
+        self._server_loop = loop
+    
+    def _get_background_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the background loop thread on first use"""
+        with self._lock:
+            if self._background_loop is None or self._background_loop.is_closed():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="async-bridge", daemon=True)
+                thread.start()
+                self._background_loop = loop
+                self._background_thread = thread
+                logger.info("Async bridge background loop started")
+            return self._background_loop
+    
+    def _target_loop(self) -> asyncio.AbstractEventLoop:
+        """Pick the loop a blocking call can safely wait on"""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        
+        server_loop = self._server_loop
+        if server_loop is not None and server_loop.is_running() and server_loop is not running:
+            return server_loop
+        
+        loop = self._get_background_loop()
+        if loop is running:
+            raise RuntimeError("Blocking bridge call made from the bridge's own loop; await the coroutine instead")
+        return loop
+    
+    def run(self, coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+        """Run a coroutine to completion from synchronous code"""
+        try:
+            loop = self._target_loop()
+        except RuntimeError:
+            coro.close()
+            raise
+        
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+    
+    def close(self):
+        """Stop the background loop thread"""
+        with self._lock:
+            loop, thread = self._background_loop, self._background_thread
+            self._background_loop = None
+            self._background_thread = None
+        
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            if thread is not None:
+                thread.join(timeout=5)
+            loop.close()
+        self._server_loop = None
+
+
+# Global async bridge instance
+async_bridge = AsyncBridge()
@@ -0,0 +1,125 @@
+"""
+Shared HTTP client pool
+
+Holds one keep-alive httpx.AsyncClient per upstream service, so outbound calls
+reuse TCP/TLS connections instead of paying connection setup on every request.
+Upstreams are configured where their callers are defined; clients are created
+in the FastAPI lifespan and closed on shutdown.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+@dataclass
+class UpstreamConfig:
+    """Connection settings for one upstream service"""
+    base_url: str = ""
+    timeout: float = 30.0
+    connect_timeout: float = 5.0
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+class HTTPClientPool:
+    """Process-wide registry of pooled HTTP clients, one per upstream"""
+    
+    def __init__(self):
+        self._upstreams: Dict[str, UpstreamConfig] = {}
+        # httpx clients are bound to the event loop they were first used on, so
+        # callers running their own loop get their own client: (name, loop id) -> (loop, client)
+        self._clients: Dict[Tuple[str, int], Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = {}
+    
+    def configure(self, name: str, config: UpstreamConfig):
+        """Register or replace the settings for an upstream"""
+        self._upstreams[name] = config
+    
+    def _create_client(self, name: str) -> httpx.AsyncClient:
+        """Build a client from the upstream's settings"""
+        config = self._upstreams.get(name)
+        if config is None:
+            logger.warning(f"HTTP upstream '{name}' is not configured, using defaults")
+            config = UpstreamConfig()
+        
+        if config.http2 and not HTTP2_AVAILABLE:
+            logger.warning(f"HTTP/2 requested for '{name}' but h2 is not installed, using HTTP/1.1")
+        
+        return httpx.AsyncClient(
+            base_url=config.base_url,
+            headers=config.headers,
+            http2=config.http2 and HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(config.timeout, connect=config.connect_timeout),
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_keepalive_connections,
+                keepalive_expiry=config.keepalive_expiry
+            )
+        )
+    
+    def get(self, name: str) -> httpx.AsyncClient:
+        """Get the pooled client for an upstream, creating it on first use"""
+        loop = asyncio.get_running_loop()
+        key = (name, id(loop))
+        
+        entry = self._clients.get(key)
+        if entry is not None and entry[0] is loop and not entry[1].is_closed:
+            return entry[1]
+        
+        self._prune()
+        client = self._create_client(name)
+        self._clients[key] = (loop, client)
+        return client
+    
+    def _prune(self):
+        """Forget clients whose event loop has been closed"""
+        for key, (loop, _) in list(self._clients.items()):
+            if loop.is_closed():
+                del self._clients[key]
+    
+    async def start(self):
+        """Create clients for all configured upstreams on the running loop"""
+        for name in self._upstreams:
+            self.get(name)
+        logger.info(f"HTTP client pool started for {len(self._upstreams)} upstreams")
+    
+    async def close(self):
+        """Close all clients"""
+        loop = asyncio.get_running_loop()
+        
+        for (name, _), (client_loop, client) in list(self._clients.items()):
+            try:
+                if client_loop is loop:
+                    await client.aclose()
+                elif client_loop.is_running():
+                    asyncio.run_coroutine_threadsafe(client.aclose(), client_loop)
+            except Exception as e:
+                logger.error(f"Error closing HTTP client for {name}: {e}")
+        
+        self._clients.clear()
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Get the number of open clients per upstream"""
+        stats = {name: 0 for name in self._upstreams}
+        for (name, _), (_, client) in self._clients.items():
+            if not client.is_closed:
+                stats[name] = stats.get(name, 0) + 1
+        return stats
+
+
+# Global HTTP client pool instance
+http_pool = HTTPClientPool()
@@ -0,0 +1,221 @@
+"""
+Batch investigation queue
+
+Batch requests enqueue packages into a priority queue (critical first) that a
+fixed pool of workers drains. Packages sharing an incident (last scan
+location, destination, anomaly type) are queued as one cluster and
+investigated once, at the highest priority among them. The LLM concurrency limit lives in the
+investigator agent, so batch and single investigations share the same quota.
+Progress is tracked per job and published as agent activity over WebSocket.
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from typing import Dict, List, Optional, Any, Tuple
+
+from app.database import SessionLocal
+from app.agents.investigator_agent import InvestigationResult
+from app.services.agent_service import AgentService, cluster_anomalies
+from app.services.websocket_client import websocket_service_client
+
+logger = logging.getLogger(__name__)
+
+# Number of investigations processed concurrently by the queue
+INVESTIGATION_WORKERS = int(os.getenv("INVESTIGATION_WORKERS", "8"))
+
+# Finished jobs kept for progress polling
+MAX_RETAINED_JOBS = int(os.getenv("INVESTIGATION_MAX_RETAINED_JOBS", "100"))
+
+class PackagePriority(str, Enum):
+    """Package priority levels (mirrors package-service PackagePriority)"""
+    LOW = "low"
+    MEDIUM = "medium"
+    HIGH = "high"
+    CRITICAL = "critical"
+
+# Queue order: lower rank is investigated first
+PRIORITY_RANK = {
+    PackagePriority.CRITICAL: 0,
+    PackagePriority.HIGH: 1,
+    PackagePriority.MEDIUM: 2,
+    PackagePriority.LOW: 3
+}
+
+@dataclass
+class BatchJob:
+    """Progress of a batch investigation"""
+    job_id: str
+    total: int
+    created_at: datetime
+    status: str = "queued"
+    completed: int = 0
+    failed: int = 0
+    clusters: int = 0
+    tenant_id: Optional[str] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    results: Dict[str, InvestigationResult] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+    
+    @property
+    def processed(self) -> int:
+        return self.completed + self.failed
+    
+    def get_progress(self) -> Dict[str, Any]:
+        """Get the job's progress counters"""
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "total": self.total,
+            "completed": self.completed,
+            "failed": self.failed,
+            "clusters": self.clusters,
+            "progress": round(self.processed / self.total, 3) if self.total else 1.0,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class InvestigationQueue:
+    """Priority queue of package investigations drained by a worker pool"""
+    
+    def __init__(self, workers: int = INVESTIGATION_WORKERS):
+        self.worker_count = workers
+        self.jobs: "OrderedDict[str, BatchJob]" = OrderedDict()
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._workers: List[asyncio.Task] = []
+        # Tie-breaker keeping FIFO order within a priority
+        self._sequence = itertools.count()
+    
+    def start(self):
+        """Start the worker pool on the running event loop"""
+        if self._workers:
+            return
+        
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [
+            asyncio.create_task(self._worker(index)) for index in range(self.worker_count)
+        ]
+        logger.info(f"Investigation queue started with {self.worker_count} workers")
+    
+    async def stop(self):
+        """Stop the worker pool; queued investigations are dropped"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+    
+    def submit(
+        self,
+        items: List[Tuple[str, PackagePriority, Dict[str, Any]]],
+        tenant_id: Optional[str] = None
+    ) -> BatchJob:
+        """Enqueue (package_id, priority, anomaly_data) items as one job, charged to tenant_id"""
+        self.start()
+        
+        # A package listed twice is investigated once, at its highest priority
+        unique: Dict[str, Tuple[PackagePriority, Dict[str, Any]]] = {}
+        for package_id, priority, anomaly_data in items:
+            current = unique.get(package_id)
+            if current is None or PRIORITY_RANK[priority] < PRIORITY_RANK[current[0]]:
+                unique[package_id] = (priority, anomaly_data)
+        
+        clusters = cluster_anomalies([
+            (package_id, anomaly_data) for package_id, (_, anomaly_data) in unique.items()
+        ])
+        job = BatchJob(
+            job_id=str(uuid.uuid4()), total=len(unique), created_at=datetime.utcnow(), clusters=len(clusters),
+            tenant_id=tenant_id
+        )
+        self.jobs[job.job_id] = job
+        self._trim_jobs()
+        
+        for members in clusters:
+            rank = min(PRIORITY_RANK[unique[package_id][0]] for package_id, _ in members)
+            self._queue.put_nowait((rank, next(self._sequence), job.job_id, members))
+        
+        logger.info(
+            f"Queued batch investigation {job.job_id} with {job.total} packages in {job.clusters} clusters"
+        )
+        return job
+    
+    def _trim_jobs(self):
+        """Forget the oldest finished jobs beyond the retention limit"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.status == "completed"]
+        for job_id in finished[:max(0, len(self.jobs) - MAX_RETAINED_JOBS)]:
+            del self.jobs[job_id]
+    
+    def get_job(self, job_id: str) -> Optional[BatchJob]:
+        """Get a job by id"""
+        return self.jobs.get(job_id)
+    
+    async def _worker(self, index: int):
+        """Take the highest-priority investigation off the queue until cancelled"""
+        while True:
+            _, _, job_id, members = await self._queue.get()
+            try:
+                job = self.jobs.get(job_id)
+                if job is not None:
+                    await self._investigate(job, members)
+            except Exception as e:
+                logger.error(f"Investigation worker {index} failed on cluster of {members[0][0]}: {e}")
+            finally:
+                self._queue.task_done()
+    
+    async def _investigate(self, job: BatchJob, members: List[Tuple[str, Dict[str, Any]]]):
+        """Investigate one cluster and publish the job's progress"""
+        if job.status == "queued":
+            job.status = "running"
+            job.started_at = datetime.utcnow()
+        
+        db = SessionLocal()
+        try:
+            results = await AgentService(db).process_anomaly_cluster(members, job.tenant_id)
+        except Exception as e:
+            results = {}
+            for package_id, _ in members:
+                job.errors[package_id] = str(e)
+        finally:
+            db.close()
+        
+        # Failed investigations come back as placeholder results carrying the error
+        for package_id, result in results.items():
+            if result.error:
+                job.errors[package_id] = result.error
+            else:
+                job.results[package_id] = result
+        failed = sum(1 for package_id, _ in members if package_id in job.errors)
+        job.completed += len(members) - failed
+        job.failed += failed
+        action = "investigation_failed" if failed else "investigation_completed"
+        
+        if job.processed >= job.total:
+            job.status = "completed"
+            job.finished_at = datetime.utcnow()
+        
+        await websocket_service_client.broadcast_agent_activity(
+            agent_id=f"batch_{job.job_id}",
+            action=action,
+            package_id=members[0][0],
+            status="completed" if job.status == "completed" else "active",
+            performance_metrics={**job.get_progress(), "cluster_size": len(members)}
+        )
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue depth and job counts"""
+        return {
+            "workers": len(self._workers),
+            "queued": self._queue.qsize() if self._queue else 0,
+            "jobs": len(self.jobs),
+            "running_jobs": sum(1 for job in self.jobs.values() if job.status != "completed")
+        }
+
+# Global investigation queue instance
+investigation_queue = InvestigationQueue()
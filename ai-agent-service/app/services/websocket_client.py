@@ -0,0 +1,91 @@
+"""
+WebSocket Service Client for inter-service communication
+
+Publishes agent activity (such as batch investigation progress). Events are
+buffered and flushed to the WebSocket Service batch endpoint over the shared
+keep-alive client pool, instead of opening a new connection per event.
+"""
+
+import asyncio
+import httpx
+from typing import Dict, Any, List, Optional
+import logging
+
+from app.services.http_pool import http_pool, UpstreamConfig
+
+logger = logging.getLogger(__name__)
+
+class WebSocketServiceClient:
+    """Client for communicating with WebSocket Service"""
+    
+    def __init__(self):
+        self.base_url = "http://websocket-service:8003"
+        self.timeout = 10.0
+        # Flush as soon as this many events are buffered...
+        self.max_batch_size = 100
+        # ...or after this many seconds, whichever comes first
+        self.flush_interval = 0.05
+        http_pool.configure("websocket_service", UpstreamConfig(base_url=self.base_url, timeout=self.timeout))
+        
+        self._buffer: List[Dict[str, Any]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+    
+    async def _enqueue(self, event_type: str, data: Dict[str, Any]):
+        """Buffer an event and schedule a flush"""
+        self._buffer.append({"type": event_type, "data": data})
+        
+        if len(self._buffer) >= self.max_batch_size:
+            await self.flush()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+    
+    async def _delayed_flush(self):
+        """Flush the buffer after the flush interval"""
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+    
+    async def flush(self):
+        """Send all buffered events to the WebSocket service in one request"""
+        if not self._buffer:
+            return
+        
+        events, self._buffer = self._buffer, []
+        
+        try:
+            response = await http_pool.get("websocket_service").post(
+                "/ws/broadcast/batch",
+                json={"events": events}
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            logger.error(f"HTTP error calling WebSocket service ({len(events)} events dropped): {e}")
+        except Exception as e:
+            logger.error(f"Error calling WebSocket service ({len(events)} events dropped): {e}")
+    
+    async def close(self):
+        """Flush pending events (the HTTP client is closed with the shared pool)"""
+        if self._flush_task is not None and not self._flush_task.done():
+            await self._flush_task
+        await self.flush()
+    
+    async def broadcast_agent_activity(
+        self,
+        agent_id: str,
+        action: str,
+        package_id: Optional[str] = None,
+        location: Optional[str] = None,
+        status: str = "active",
+        performance_metrics: Optional[Dict[str, Any]] = None
+    ):
+        """Broadcast agent activity via WebSocket"""
+        await self._enqueue("agent_activity", {
+            "agent_id": agent_id,
+            "action": action,
+            "package_id": package_id,
+            "location": location,
+            "status": status,
+            "performance_metrics": performance_metrics
+        })
+
+# Global WebSocket service client instance
+websocket_service_client = WebSocketServiceClient()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Per-call overhead benchmark for sync tool execution
+
+Compares the previous sync path (asyncio.run per call: a new event loop, and
+so a new pooled HTTP client and connection, every time) with the async
+bridge (coroutines scheduled on one long-lived loop), for an empty coroutine
+and for an HTTP call to a local stub upstream. Also checks that a sync call
+made from inside a running loop works through the bridge.
+
+Usage: python benchmark_async_bridge.py [calls]
+"""
+
+import asyncio
+import statistics
+import sys
+import threading
+import time
+
+import uvicorn
+
+from app.services.async_bridge import AsyncBridge
+from app.services.http_pool import HTTPClientPool, UpstreamConfig
+
+HOST = "127.0.0.1"
+PORT = 8766
+
+async def stub_app(scope, receive, send):
+    """Minimal ASGI upstream returning a small JSON body"""
+    if scope["type"] != "http":
+        return
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b'{"status": "ok"}'})
+
+def start_stub_server() -> uvicorn.Server:
+    """Run the stub upstream in a background thread"""
+    server = uvicorn.Server(uvicorn.Config(stub_app, host=HOST, port=PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+def measure(call, count: int) -> list:
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def report(label: str, latencies: list):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1_000_000
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1_000_000
+    print(f"{label:<36} p50 {p50:9.1f} µs   p95 {p95:9.1f} µs")
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    bridge = AsyncBridge()
+    pool = HTTPClientPool()
+    pool.configure("stub", UpstreamConfig(base_url=f"http://{HOST}:{PORT}", timeout=10.0))
+    server = start_stub_server()
+    
+    async def noop():
+        return None
+    
+    async def http_call():
+        response = await pool.get("stub").get("/api/v1/packages/benchmark")
+        response.raise_for_status()
+    
+    try:
+        print(f"Calls per scenario: {count}")
+        # Warm up both paths
+        measure(lambda: asyncio.run(noop()), 20)
+        measure(lambda: bridge.run(noop()), 20)
+        measure(lambda: bridge.run(http_call()), 20)
+        
+        report("empty coroutine, asyncio.run", measure(lambda: asyncio.run(noop()), count))
+        report("empty coroutine, bridge", measure(lambda: bridge.run(noop()), count))
+        report("HTTP call, asyncio.run", measure(lambda: asyncio.run(http_call()), count))
+        report("HTTP call, bridge", measure(lambda: bridge.run(http_call()), count))
+        
+        async def sync_call_inside_loop():
+            coro = noop()
+            try:
+                asyncio.run(coro)
+                legacy = "ok"
+            except RuntimeError as e:
+                coro.close()
+                legacy = f"fails ({e})"
+            bridged = "ok" if bridge.run(noop()) is None else "unexpected"
+            return legacy, bridged
+        
+        legacy, bridged = asyncio.run(sync_call_inside_loop())
+        print(f"\nSync call inside a running loop: asyncio.run {legacy}; bridge {bridged}")
+    finally:
+        bridge.run(pool.close())
+        bridge.close()
+        server.should_exit = True
+
+if __name__ == "__main__":
+    main()
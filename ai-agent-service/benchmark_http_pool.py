@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark for the shared HTTP client pool
+
+Starts a local stub upstream and compares the previous pattern (a new
+httpx.AsyncClient per call) with a pooled keep-alive client, for sequential
+calls and for concurrent bursts.
+
+Usage: python benchmark_http_pool.py [requests]
+"""
+
+import asyncio
+import statistics
+import sys
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from app.services.http_pool import HTTPClientPool, UpstreamConfig
+
+HOST = "127.0.0.1"
+PORT = 8765
+CONCURRENCY = 20
+
+async def stub_app(scope, receive, send):
+    """Minimal ASGI upstream returning a small JSON body"""
+    if scope["type"] != "http":
+        return
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b'{"status": "ok"}'})
+
+def start_stub_server() -> uvicorn.Server:
+    """Run the stub upstream in a background thread"""
+    server = uvicorn.Server(uvicorn.Config(stub_app, host=HOST, port=PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+async def per_call_client(url: str) -> float:
+    """Previous pattern: open a client (and connection) for every request"""
+    start = time.perf_counter()
+    async with httpx.AsyncClient(timeout=10.0) as client:
+        response = await client.get(url)
+        response.raise_for_status()
+    return time.perf_counter() - start
+
+async def pooled_client(pool: HTTPClientPool, url: str) -> float:
+    """Pooled pattern: reuse the upstream's keep-alive client"""
+    start = time.perf_counter()
+    response = await pool.get("stub").get(url)
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+async def run_sequential(call, count: int) -> list:
+    return [await call() for _ in range(count)]
+
+async def run_concurrent(call, count: int) -> list:
+    latencies = []
+    for _ in range(count // CONCURRENCY):
+        latencies.extend(await asyncio.gather(*[call() for _ in range(CONCURRENCY)]))
+    return latencies
+
+def report(label: str, latencies: list):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1000
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+    print(f"{label:<32} p50 {p50:7.3f} ms   p95 {p95:7.3f} ms")
+
+async def benchmark(count: int):
+    url = f"http://{HOST}:{PORT}/api/v1/packages/benchmark"
+    pool = HTTPClientPool()
+    pool.configure("stub", UpstreamConfig(timeout=10.0))
+    await pool.start()
+    
+    # Warm up both paths
+    await run_sequential(lambda: per_call_client(url), 10)
+    await run_sequential(lambda: pooled_client(pool, url), 10)
+    
+    report("sequential, client per call", await run_sequential(lambda: per_call_client(url), count))
+    report("sequential, pooled client", await run_sequential(lambda: pooled_client(pool, url), count))
+    report(f"concurrent x{CONCURRENCY}, client per call", await run_concurrent(lambda: per_call_client(url), count))
+    report(f"concurrent x{CONCURRENCY}, pooled client", await run_concurrent(lambda: pooled_client(pool, url), count))
+    
+    await pool.close()
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    server = start_stub_server()
+    try:
+        print(f"Requests per scenario: {count}")
+        asyncio.run(benchmark(count))
+    finally:
+        server.should_exit = True
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Dispatch overhead benchmark for MCP tool calls
+
+Times one tool call through each path that reaches the dispatcher: in-process
+(what prefetch uses), a LangChain tool called the way the ReAct executor
+calls it (a single Action Input string), the /api/v1/mcp REST router, the
+standalone server's REST endpoint, and JSON-RPC on /mcp (single and batched),
+against the previous encodings (pretty-printed JSON for the agent, a pydantic
+response model validated and re-encoded by FastAPI for REST). The tool is
+get_weather_data without an API key, answered from the result cache after
+the first call, so the numbers are dispatch and serialization overhead.
+HTTP paths go through an in-memory ASGI transport (no sockets).
+
+Usage: python benchmark_mcp_dispatch.py [calls]
+"""
+
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from app.agents.mcp_tools import MCPWeatherDataTool
+from app.api.mcp import router as mcp_router
+from app.mcp.dispatch import agent_text
+from app.mcp.server import get_mcp_server, ToolExecutionRequest, ToolExecutionResponse
+
+TOOL = "get_weather_data"
+ARGUMENTS = {"location": "Chicago"}
+BATCH_SIZE = 10
+
+def build_legacy_app(server) -> FastAPI:
+    """The previous REST shape: a pydantic response model FastAPI validates and re-encodes"""
+    app = FastAPI()
+    
+    @app.post("/tools/{tool_name}/execute")
+    async def execute_tool(tool_name: str, request: ToolExecutionRequest) -> ToolExecutionResponse:
+        result = await server.tool_registry.execute_tool_async(tool_name, **request.parameters)
+        return ToolExecutionResponse(
+            success=result.success,
+            data=result.data,
+            error=result.error,
+            execution_time=result.execution_time,
+            metadata=result.metadata or {}
+        )
+    
+    return app
+
+async def measure(call, count: int) -> list:
+    for _ in range(20):
+        await call()
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def report(label: str, latencies: list, per: int = 1):
+    latencies = sorted(latency / per for latency in latencies)
+    p50 = statistics.median(latencies) * 1_000_000
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1_000_000
+    print(f"{label:<44} p50 {p50:8.1f} µs   p95 {p95:8.1f} µs")
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    server = get_mcp_server()
+    registry = server.tool_registry
+    
+    api = FastAPI()
+    api.include_router(mcp_router, prefix="/api/v1/mcp")
+    clients = {
+        name: httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+        for name, app in (("api", api), ("server", server.get_app()), ("legacy", build_legacy_app(server)))
+    }
+    body = {"tool_name": TOOL, "parameters": ARGUMENTS}
+    rpc = {"jsonrpc": "2.0", "id": 1, "method": "tools/call", "params": {"name": TOOL, "arguments": ARGUMENTS}}
+    batch = [{**rpc, "id": i} for i in range(BATCH_SIZE)]
+    
+    async def legacy_in_process():
+        result = await registry.execute_tool_async(TOOL, **ARGUMENTS)
+        return json.dumps(result.data, indent=2)
+    
+    async def in_process():
+        return agent_text(await server.dispatcher.call(TOOL, ARGUMENTS))
+    
+    langchain_tool = MCPWeatherDataTool()
+    
+    async def langchain_react():
+        return await langchain_tool.arun(ARGUMENTS["location"])
+    
+    try:
+        print(f"Calls per scenario: {count}")
+        report("in-process, indent=2 (previous)", await measure(legacy_in_process, count))
+        report("in-process, dispatcher + compact text", await measure(in_process, count))
+        report("LangChain tool, ReAct string input", await measure(langchain_react, count))
+        report("REST, response model (previous)", await measure(lambda: clients["legacy"].post(f"/tools/{TOOL}/execute", json=body), count))
+        report("REST /api/v1/mcp, dispatcher", await measure(lambda: clients["api"].post(f"/api/v1/mcp/tools/{TOOL}/execute", json=body), count))
+        report("REST standalone server, dispatcher", await measure(lambda: clients["server"].post(f"/tools/{TOOL}/execute", json=body), count))
+        report("JSON-RPC tools/call", await measure(lambda: clients["server"].post("/mcp", json=rpc), count))
+        report(f"JSON-RPC batch of {BATCH_SIZE}, per call", await measure(lambda: clients["server"].post("/mcp", json=batch), count // BATCH_SIZE), BATCH_SIZE)
+        
+        result = await server.dispatcher.call(TOOL, ARGUMENTS)
+        print(f"\nAgent observation size: indent=2 {len(json.dumps(result.data, indent=2))} chars, compact {len(agent_text(result))} chars")
+    finally:
+        for client in clients.values():
+            await client.aclose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
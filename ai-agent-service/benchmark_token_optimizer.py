@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark for TokenOptimizer context budgeting
+
+Compares the previous optimize_context (up to two encodes per field, fields
+that do not fit are dropped) with the current one (one encode per field,
+token counts cached by content hash, the overflowing field truncated) on
+package contexts with growing tracking histories. Also measures how long the
+event loop is blocked when the budgeting runs inline versus offloaded.
+
+Usage: python benchmark_token_optimizer.py [iterations]
+"""
+
+import asyncio
+import json
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict
+
+from app.agents.investigator_agent import TokenOptimizer, get_encoding, warm_up_tokenizer
+
+BUDGET = 4000
+HISTORY_SIZES = [10, 100, 1000]
+
+class LegacyTokenOptimizer:
+    """optimize_context as it was before the single-encode budgeter"""
+    
+    priority_fields = TokenOptimizer.PRIORITY_FIELDS
+    
+    def __init__(self):
+        self.encoding = get_encoding()
+    
+    def count_tokens(self, text: str) -> int:
+        return len(self.encoding.encode(text))
+    
+    def optimize_context(self, context: Dict[str, Any], max_tokens: int) -> Dict[str, Any]:
+        optimized = {}
+        remaining_tokens = max_tokens
+        
+        for field in self.priority_fields:
+            if field in context and remaining_tokens > 50:
+                value = str(context[field])
+                if self.count_tokens(value) <= remaining_tokens:
+                    optimized[field] = value
+                    remaining_tokens -= self.count_tokens(value)
+        
+        for key, value in context.items():
+            if key not in optimized and remaining_tokens > 50:
+                value_str = str(value)
+                if self.count_tokens(value_str) <= remaining_tokens:
+                    optimized[key] = value_str
+                    remaining_tokens -= self.count_tokens(value_str)
+        
+        return optimized
+
+def build_context(history_size: int) -> Dict[str, Any]:
+    """Package context with a tracking history of history_size events"""
+    start = datetime(2024, 1, 1, 8, 0)
+    history = [
+        {
+            "timestamp": (start + timedelta(hours=index * 3)).isoformat(),
+            "location": f"Distribution Center {index % 17}, Chicago, IL",
+            "scan_type": "in_transit",
+            "status": "in_transit",
+            "description": f"Package processed at sorting facility, departed towards next hub (scan {index})"
+        }
+        for index in range(history_size)
+    ]
+    return {
+        "package_id": "PKG-2024-000123",
+        "status": "delayed",
+        "anomaly_type": "delayed_delivery",
+        "severity": "high",
+        "current_location": "Chicago, IL",
+        "destination": "New York, NY",
+        "estimated_delivery": "2024-01-05T17:00:00",
+        "historical_data": json.dumps(history),
+        "weather": {"conditions": "Snow", "temperature": "-4°C", "weather_impact": "High impact - delivery may be delayed"},
+        "traffic": {"traffic_level": "Heavy", "current_delay": "45 minutes", "incidents": ["I-90 closure"]},
+        "customer_notes": "Customer requested delivery before the weekend; previous delivery attempt failed"
+    }
+
+def time_calls(optimizer, context: Dict[str, Any], iterations: int) -> float:
+    """Median milliseconds per optimize_context call"""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        optimizer.optimize_context(context, BUDGET)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+async def max_loop_lag(work) -> float:
+    """Longest event loop stall (ms) observed while work runs"""
+    lags = []
+    running = True
+    
+    async def ticker():
+        while running:
+            before = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append((time.perf_counter() - before) * 1000 - 1)
+    
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    await work()
+    running = False
+    await task
+    return max(lags)
+
+async def measure_loop_lag(context: Dict[str, Any]):
+    async def inline():
+        TokenOptimizer().optimize_context(context, BUDGET)
+    
+    async def offloaded():
+        await TokenOptimizer().optimize_context_async(context, BUDGET)
+    
+    return await max_loop_lag(inline), await max_loop_lag(offloaded)
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    
+    start = time.perf_counter()
+    warm_up_tokenizer()
+    print(f"Tokenizer warmup: {(time.perf_counter() - start) * 1000:.1f} ms\n")
+    
+    print(f"{'history':>8} {'chars':>9} {'legacy ms':>10} {'cold ms':>9} {'warm ms':>9} {'legacy kept':>12} {'new kept':>9}")
+    for history_size in HISTORY_SIZES:
+        context = build_context(history_size)
+        chars = sum(len(str(value)) for value in context.values())
+        
+        legacy = LegacyTokenOptimizer()
+        legacy_ms = time_calls(legacy, context, iterations)
+        
+        # Cold: a fresh cache every call; warm: the same optimizer reused
+        cold_ms = statistics.median(time_calls(TokenOptimizer(), context, 1) for _ in range(iterations))
+        warm_ms = time_calls(TokenOptimizer(), context, iterations)
+        
+        legacy_kept = len(legacy.optimize_context(context, BUDGET))
+        new_kept = len(TokenOptimizer().optimize_context(context, BUDGET))
+        print(
+            f"{history_size:>8} {chars:>9} {legacy_ms:>10.3f} {cold_ms:>9.3f} {warm_ms:>9.3f} "
+            f"{legacy_kept:>9}/{len(context)} {new_kept:>6}/{len(context)}"
+        )
+    
+    inline_lag, offloaded_lag = asyncio.run(measure_loop_lag(build_context(HISTORY_SIZES[-1])))
+    print(f"\nMax event loop stall, {HISTORY_SIZES[-1]} events: inline {inline_lag:.2f} ms, offloaded {offloaded_lag:.2f} ms")
+
+if __name__ == "__main__":
+    main()
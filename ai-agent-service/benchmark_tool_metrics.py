@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Hot-path overhead benchmark for tool execution metrics
+
+Measures what the registry adds to every tool call (classify_outcome plus
+ToolMetrics.record) from one thread and from several threads recording at
+once, checks that no counts are lost without a lock, and compares the
+histogram's p50/p95/p99 with exact percentiles of the same samples. The
+target is under 50 µs per call.
+
+Usage: python benchmark_tool_metrics.py [calls]
+"""
+
+import random
+import statistics
+import sys
+import threading
+import time
+
+from app.mcp.metrics import ToolMetrics, classify_outcome
+from app.mcp.tools import ToolResult
+
+TOOLS = ["get_package_data", "get_weather_data", "get_traffic_data", "fedex_tracking"]
+THREADS = 8
+
+def per_call_us(metrics: ToolMetrics, results: list, count: int) -> float:
+    start = time.perf_counter()
+    for i in range(count):
+        result = results[i % len(results)]
+        metrics.record(TOOLS[i % len(TOOLS)], classify_outcome(result), 0.0123)
+    return (time.perf_counter() - start) / count * 1_000_000
+
+def exact_percentile(samples: list, quantile: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    results = [
+        ToolResult(success=True, data={}, execution_time=0.01, metadata={}),
+        ToolResult(success=True, data={}, execution_time=0.0, metadata={"cache_hit": True}),
+        ToolResult(success=False, data=None, error="timeout", execution_time=1.0, metadata={})
+    ]
+    
+    print(f"Calls per scenario: {count}")
+    metrics = ToolMetrics()
+    per_call_us(metrics, results, 10_000)  # warm up
+    single = [per_call_us(metrics, results, count // 5) for _ in range(5)]
+    print(f"{'record, 1 thread':<36} {statistics.median(single):7.2f} µs/call")
+    
+    metrics = ToolMetrics()
+    timings = []
+    
+    def worker():
+        timings.append(per_call_us(metrics, results, count))
+    
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    recorded = metrics.get_analytics()["total_executions"]
+    print(f"{f'record, {THREADS} threads':<36} {statistics.median(timings):7.2f} µs/call (GIL-shared)")
+    print(f"{'counts recorded / expected':<36} {recorded} / {THREADS * count}")
+    
+    # Histogram accuracy on a long-tailed latency distribution
+    metrics = ToolMetrics()
+    rng = random.Random(7)
+    samples = [rng.lognormvariate(-3.5, 1.0) for _ in range(50_000)]  # seconds, median ~30 ms
+    for seconds in samples:
+        metrics.record("get_weather_data", "success", seconds)
+    latency = metrics.get_analytics()["latency_ms"]
+    for name, quantile in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99)):
+        exact = exact_percentile(samples, quantile) * 1000
+        estimate = latency[f"{name}_ms"]
+        print(f"{name:<4} exact {exact:8.3f} ms   histogram {estimate:8.3f} ms   error {abs(estimate - exact) / exact:6.2%}")
+
+if __name__ == "__main__":
+    main()
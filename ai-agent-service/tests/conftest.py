@@ -0,0 +1,35 @@
+"""
+Shared fixtures
+"""
+
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+# In-memory database; these tests do not persist investigations
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest
+
+from app.agents import investigator_agent
+from app.agents.investigator_agent import InvestigatorAgent, AgentExecutorPool
+from tests.fakes import ByteEncoding, FakeLLM
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def make_agent(monkeypatch):
+    """Build an investigator whose executors run on a FakeLLM replaying `responses`"""
+    # The tiktoken encoding is downloaded on first use; keep tests offline
+    monkeypatch.setattr(investigator_agent, "get_encoding", ByteEncoding)
+    def build(responses):
+        agent = InvestigatorAgent(None)
+        agent.llm = FakeLLM(responses=list(responses))
+        agent.agent = agent._create_agent()
+        agent.agent_pool = AgentExecutorPool(agent._create_executor, size=1)
+        return agent
+    
+    return build
@@ -0,0 +1,34 @@
+"""
+Scripted fake LLM for agent tests
+"""
+
+import json
+
+from langchain_community.llms.fake import FakeListLLM
+
+
+class FakeLLM(FakeListLLM):
+    """Replays scripted ReAct turns and counts calls"""
+    model_name: str = "fake-llm"
+    max_tokens: int = 500
+    calls: int = 0
+    
+    async def _acall(self, *args, **kwargs) -> str:
+        self.calls += 1
+        return await super()._acall(*args, **kwargs)
+
+
+class ByteEncoding:
+    """Offline stand-in for the tiktoken encoding (one token per UTF-8 byte)"""
+    
+    def encode(self, text: str) -> list:
+        return list(text.encode())
+    
+    def decode(self, tokens: list) -> str:
+        return bytes(tokens).decode(errors="ignore")
+
+
+def final_answer(findings, recommendations, confidence=0.9, priority="high") -> str:
+    """A ReAct turn ending the investigation with a structured answer"""
+    answer = {"findings": findings, "recommendations": recommendations, "confidence": confidence, "priority": priority}
+    return f"Thought: I now know the final answer\nFinal Answer: {json.dumps(answer)}"
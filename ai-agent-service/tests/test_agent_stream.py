@@ -0,0 +1,51 @@
+"""
+Tests for streaming investigation progress to SSE and WebSocket subscribers
+"""
+
+import pytest
+
+from app.services import agent_service
+from app.services.agent_service import AgentService
+from app.services.websocket_client import websocket_service_client
+
+CONTEXT = {"package": {"recipient": "Jane Doe", "destination": "12 Elm St"}}
+EVENTS = [
+    ("prefetch_complete", {"investigation_id": "inv-1", "duration_ms": 12.5, "context": CONTEXT}),
+    ("tool_start", {"tool": "get_package_data", "input": "PKG-1"}),
+    ("tool_end", {"tool": "get_package_data", "duration_ms": 3.1, "output": "Jane Doe, 12 Elm St"}),
+    ("tool_error", {"tool": "get_traffic_data", "duration_ms": 1.0, "error": "upstream said 12 Elm St"})
+]
+
+
+class FakeInvestigator:
+    async def stream_investigation(self, package_id, anomaly_data, tenant_id=None):
+        for event in EVENTS:
+            yield event
+
+
+@pytest.fixture
+def broadcasts(monkeypatch):
+    sent = []
+    
+    async def broadcast_agent_activity(**kwargs):
+        sent.append(kwargs)
+    
+    monkeypatch.setattr(agent_service, "get_investigator_agent", lambda db: FakeInvestigator())
+    monkeypatch.setattr(websocket_service_client, "broadcast_agent_activity", broadcast_agent_activity)
+    return sent
+
+
+@pytest.mark.anyio
+async def test_websocket_gets_step_names_and_timings_only(broadcasts):
+    streamed = [event async for event in AgentService(None).stream_anomaly("PKG-1", {})]
+    
+    # The caller's stream keeps the full payloads
+    assert streamed == EVENTS
+    assert [sent["action"] for sent in broadcasts] == [event for event, _ in EVENTS]
+    assert [sent["performance_metrics"] for sent in broadcasts] == [
+        {"investigation_id": "inv-1", "duration_ms": 12.5},
+        {"tool": "get_package_data"},
+        {"tool": "get_package_data", "duration_ms": 3.1},
+        {"tool": "get_traffic_data", "duration_ms": 1.0}
+    ]
+    assert "12 Elm St" not in str(broadcasts)
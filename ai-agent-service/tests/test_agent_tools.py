@@ -0,0 +1,89 @@
+"""
+Tests for the LangChain MCP tools as the ReAct executor calls them
+"""
+
+import json
+
+import pytest
+
+from app.agents.mcp_tools import MCPWeatherDataTool, MCPTrafficDataTool
+from tests.fakes import final_answer
+
+INPUTS = {"input": "Investigate", "package_id": "PKG-1", "investigation_type": "anomaly_analysis", "current_status": "delayed"}
+
+
+async def run(agent):
+    async with agent.agent_pool.checkout() as executor:
+        executor.return_intermediate_steps = True
+        try:
+            return await executor.ainvoke(INPUTS)
+        finally:
+            executor.return_intermediate_steps = False
+
+
+@pytest.mark.anyio
+async def test_executor_calls_tools_with_react_string_input(make_agent):
+    agent = make_agent([
+        "Thought: check the weather\nAction: get_weather_data\nAction Input: New York",
+        'Thought: check traffic\nAction: get_traffic_data\nAction Input: {"origin": "Chicago", "destination": "New York"}',
+        final_answer(["Snow in New York"], ["Update the customer"])
+    ])
+    
+    result = await run(agent)
+    
+    (weather_action, weather), (traffic_action, traffic) = result["intermediate_steps"]
+    assert weather_action.tool == "get_weather_data"
+    assert json.loads(weather)["location"] == "New York"
+    assert traffic_action.tool == "get_traffic_data"
+    assert json.loads(traffic)["route"] == "Chicago → New York"
+    assert json.loads(result["output"])["findings"] == ["Snow in New York"]
+
+
+@pytest.mark.anyio
+async def test_iteration_limit_forces_a_final_answer(make_agent):
+    agent = make_agent(["Thought: check again\nAction: get_weather_data\nAction Input: Boston"])
+    
+    result = await run(agent)
+    
+    assert len(result["intermediate_steps"]) == 3
+    assert "iteration limit" in result["output"]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("tool_input, location", [
+    ("Denver", "Denver"),
+    ('"Denver"', "Denver"),
+    ('{"location": "Denver", "units": "imperial"}', "Denver")
+])
+async def test_single_string_input_maps_to_tool_arguments(tool_input, location):
+    observation = await MCPWeatherDataTool().arun(tool_input)
+    
+    assert json.loads(observation)["location"] == location
+
+
+@pytest.mark.anyio
+async def test_keyword_input_is_passed_through():
+    observation = await MCPTrafficDataTool().arun({"origin": "Denver", "destination": "Austin"})
+    
+    assert json.loads(observation)["route"] == "Denver → Austin"
+
+
+def test_sync_run_uses_the_dispatcher():
+    assert json.loads(MCPWeatherDataTool().run("Denver"))["location"] == "Denver"
+
+
+@pytest.mark.anyio
+async def test_tools_go_through_the_dispatcher(monkeypatch):
+    tool = MCPWeatherDataTool()
+    calls = []
+    original = tool.mcp_server.dispatcher.call
+    
+    async def recording_call(tool_name, arguments=None):
+        calls.append((tool_name, arguments))
+        return await original(tool_name, arguments)
+    
+    monkeypatch.setattr(tool.mcp_server.dispatcher, "call", recording_call)
+    
+    await tool.arun("Denver")
+    
+    assert calls == [("get_weather_data", {"location": "Denver"})]
@@ -0,0 +1,139 @@
+"""
+Tests for the investigation output parser (JSON, sections, sentences, failed)
+"""
+
+import json
+
+import pytest
+
+from app.agents.output_parser import InvestigationOutputParser, MAX_ITEMS
+
+
+@pytest.fixture
+def parser():
+    return InvestigationOutputParser()
+
+
+def test_json_answer(parser):
+    answer = json.dumps({
+        "findings": ["Snowstorm at the Denver hub", "  "],
+        "recommendations": ["Update the customer"],
+        "next_actions": ["Notify customer", "Reroute", "Monitor", "Escalate"],
+        "confidence": 0.85,
+        "priority": "High",
+        "estimated_resolution_time": "4-8 hours"
+    })
+    
+    parsed = parser.parse(answer)
+    
+    assert parsed.method == "json"
+    assert parsed.findings == ["Snowstorm at the Denver hub"]
+    assert parsed.recommendations == ["Update the customer"]
+    assert parsed.next_actions == ["Notify customer", "Reroute", "Monitor"]
+    assert parsed.confidence == 0.85
+    assert parsed.priority == "high"
+    assert parsed.estimated_resolution_time == "4-8 hours"
+
+
+def test_json_wrapped_in_prose_with_percentage_confidence(parser):
+    answer = (
+        'Final Answer: {"findings": ["Carrier missed the pickup"], "recommendations": [], '
+        '"confidence": 85, "priority": "urgent"} Hope this helps.'
+    )
+    
+    parsed = parser.parse(answer)
+    
+    assert parsed.method == "json"
+    assert parsed.confidence == 0.85
+    # Not one of PRIORITIES
+    assert parsed.priority is None
+
+
+def test_json_items_are_capped(parser):
+    answer = json.dumps({"findings": [f"finding {i}" for i in range(10)], "recommendations": [], "confidence": 0.9, "priority": "low"})
+    
+    assert len(parser.parse(answer).findings) == MAX_ITEMS
+
+
+def test_json_without_findings_falls_back_to_sections(parser):
+    answer = '{"status": "ok"}\nFindings:\n- Package held at customs'
+    
+    parsed = parser.parse(answer)
+    
+    assert parsed.method == "sections"
+    assert parsed.findings == ["Package held at customs"]
+
+
+def test_sections_answer(parser):
+    answer = """
+**Findings:**
+- Heavy snow at the Denver hub
+- Outbound trucks grounded since Monday
+## Recommendations
+1. Update the customer with a revised estimate
+2) Reroute through Salt Lake City
+Next actions:
+- Notify customer
+Confidence: 80%
+Priority: High
+Resolution time: 2-4 hours
+"""
+    
+    parsed = parser.parse(answer)
+    
+    assert parsed.method == "sections"
+    assert parsed.findings == ["Heavy snow at the Denver hub", "Outbound trucks grounded since Monday"]
+    assert parsed.recommendations == ["Update the customer with a revised estimate", "Reroute through Salt Lake City"]
+    assert parsed.next_actions == ["Notify customer"]
+    assert parsed.confidence == 0.8
+    assert parsed.priority == "high"
+    assert parsed.estimated_resolution_time == "2-4 hours"
+
+
+def test_section_item_on_header_line(parser):
+    parsed = parser.parse("Findings: weather delay at the hub\nRecommendations: notify the customer")
+    
+    assert parsed.method == "sections"
+    assert parsed.findings == ["weather delay at the hub"]
+    assert parsed.recommendations == ["notify the customer"]
+
+
+def test_sentences_answer(parser):
+    answer = (
+        "The package is late because of a storm near Denver. "
+        "We should notify the customer about the new estimate. "
+        "Thanks."
+    )
+    
+    parsed = parser.parse(answer)
+    
+    assert parsed.method == "sentences"
+    assert parsed.findings == ["The package is late because of a storm near Denver."]
+    assert parsed.recommendations == ["We should notify the customer about the new estimate."]
+    assert parsed.confidence is None
+
+
+def test_unparseable_answer(parser):
+    parsed = parser.parse("I could not determine anything.")
+    
+    assert parsed.method == "failed"
+    assert parsed.findings == []
+    assert parsed.recommendations == []
+    assert parsed.confidence is None
+    assert parsed.priority is None
+
+
+def test_stats_count_each_outcome(parser):
+    parser.parse('{"findings": ["a"], "recommendations": ["b"], "confidence": 0.9, "priority": "low"}')
+    parser.parse("Findings:\n- a")
+    parser.parse("The delay is due to weather at the hub.")
+    parser.parse("Nothing to report.")
+    
+    stats = parser.get_stats()
+    
+    assert {name: stats[name] for name in ("json", "sections", "sentences", "failed")} == {
+        "json": 1, "sections": 1, "sentences": 1, "failed": 1
+    }
+    assert stats["total"] == 4
+    assert stats["structured_rate"] == 0.25
+    assert stats["failure_rate"] == 0.25
@@ -0,0 +1,199 @@
+"""
+Fault-injection tests for tool retries, circuit breakers and fallbacks
+
+Upstream HTTP calls are answered by an in-process stub (httpx.MockTransport)
+that replays scripted status codes.
+"""
+
+import httpx
+import pytest
+
+from app.mcp import resilience
+from app.mcp.config import MCPConfig
+from app.mcp.resilience import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from app.mcp.tools import ToolRegistry
+from app.services.http_pool import http_pool
+
+PACKAGE = {"package_id": "PKG-1", "status": "in_transit"}
+WEATHER = {
+    "name": "Denver", "main": {"temp": -3, "humidity": 80}, "weather": [{"description": "heavy snow", "main": "Snow"}],
+    "wind": {"speed": 12}, "visibility": 800
+}
+
+
+class StubUpstream:
+    """Answers requests with scripted status codes (the last one repeats)"""
+    
+    def __init__(self, statuses, body):
+        self.statuses = list(statuses)
+        self.body = body
+        self.requests = 0
+    
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+        return httpx.Response(status, json=self.body if status == 200 else {"detail": "stub error"})
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Route every pooled HTTP client to a stub; call with (statuses, body)"""
+    stub = StubUpstream([200], {})
+    clients = []
+    
+    def get(name):
+        clients.append(httpx.AsyncClient(transport=httpx.MockTransport(stub.handle)))
+        return clients[-1]
+    
+    monkeypatch.setattr(http_pool, "get", get)
+    
+    def script(statuses, body=None):
+        stub.statuses = list(statuses)
+        stub.body = body or {}
+        return stub
+    
+    return script
+
+
+@pytest.fixture
+def registry():
+    return ToolRegistry(MCPConfig(
+        retry_backoff_base=0.0, retry_backoff_max=0.0, circuit_failure_threshold=2, circuit_recovery_timeout=60.0
+    ))
+
+
+def test_breaker_opens_after_threshold_and_recovers(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=30.0)
+    
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+    assert breaker.get_state()["short_circuited"] == 1
+    
+    now[0] += 30
+    assert breaker.allow_request()
+    assert breaker.state == HALF_OPEN
+    # Only one probe at a time
+    assert not breaker.allow_request()
+    
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.consecutive_failures == 0
+    assert breaker.allow_request()
+
+
+def test_failed_probe_reopens_breaker(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=10.0)
+    breaker.record_failure()
+    
+    now[0] += 10
+    assert breaker.allow_request()
+    breaker.record_failure()
+    
+    assert breaker.state == OPEN
+    assert breaker.get_state()["times_opened"] == 2
+    assert not breaker.allow_request()
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("failures", [[503], [429], [500, 502]])
+async def test_429_and_5xx_are_retried(registry, upstream, failures):
+    stub = upstream(failures + [200], PACKAGE)
+    
+    result = await registry.execute_tool_async("get_package_data", package_id="PKG-1")
+    
+    assert result.success
+    assert result.data == PACKAGE
+    assert result.metadata["attempts"] == len(failures) + 1
+    assert stub.requests == len(failures) + 1
+    assert registry.breakers["get_package_data"].state == CLOSED
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("status", [400, 401, 404])
+async def test_other_4xx_are_not_retried(registry, upstream, status):
+    stub = upstream([status])
+    
+    result = await registry.execute_tool_async("get_package_data", package_id="PKG-1")
+    
+    assert not result.success
+    assert result.metadata["attempts"] == 1
+    assert result.metadata["retryable"] is False
+    assert stub.requests == 1
+    # A client error says nothing about upstream health
+    assert registry.breakers["get_package_data"].consecutive_failures == 0
+
+
+@pytest.mark.anyio
+async def test_retries_stop_at_retry_attempts(registry, upstream):
+    stub = upstream([503])
+    tool = registry.get_tool("get_package_data")
+    
+    result = await registry.execute_tool_async("get_package_data", package_id="PKG-1")
+    
+    assert not result.success
+    assert result.metadata["attempts"] == tool.config.retry_attempts + 1
+    assert stub.requests == tool.config.retry_attempts + 1
+
+
+@pytest.mark.anyio
+async def test_open_breaker_serves_stale_cache(registry, upstream):
+    stub = upstream([200], PACKAGE)
+    assert (await registry.execute_tool_async("get_package_data", package_id="PKG-1")).success
+    for entry in registry.cache._entries.values():
+        entry.expires_at = 0
+    
+    stub = upstream([503])
+    for _ in range(2):
+        assert not (await registry.execute_tool_async("get_package_data", package_id="PKG-1")).success
+    assert registry.breakers["get_package_data"].state == OPEN
+    requests = stub.requests
+    
+    result = await registry.execute_tool_async("get_package_data", package_id="PKG-1")
+    
+    assert result.success
+    assert result.data == PACKAGE
+    assert result.metadata["fallback"] == "stale_cache"
+    assert result.metadata["stale"] is True
+    assert stub.requests == requests
+
+
+@pytest.mark.anyio
+async def test_open_breaker_uses_fallback_data_when_nothing_is_cached(registry, upstream):
+    registry.get_tool("get_weather_data").config.api_key = "test-key"
+    stub = upstream([503])
+    for location in ("Denver", "Boulder"):
+        assert not (await registry.execute_tool_async("get_weather_data", location=location)).success
+    assert registry.breakers["get_weather_data"].state == OPEN
+    requests = stub.requests
+    
+    result = await registry.execute_tool_async("get_weather_data", location="Aspen")
+    
+    assert result.success
+    assert result.metadata["fallback"] == "mock"
+    assert result.data["location"] == "Aspen"
+    assert stub.requests == requests
+    
+    # Fallback data is not cached, so the upstream is used again once the breaker closes
+    assert registry.cache.get_stats()["entries"] == 0
+
+
+@pytest.mark.anyio
+async def test_open_breaker_without_fallback_fails_fast(registry, upstream):
+    stub = upstream([503])
+    for _ in range(2):
+        await registry.execute_tool_async("get_package_data", package_id="PKG-2")
+    requests = stub.requests
+    
+    result = await registry.execute_tool_async("get_package_data", package_id="PKG-3")
+    
+    assert not result.success
+    assert "Circuit breaker open" in result.error
+    assert stub.requests == requests
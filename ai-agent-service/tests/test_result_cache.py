@@ -0,0 +1,115 @@
+"""
+Tests for the investigation result cache and the agent's cache path
+"""
+
+import pytest
+
+from app.agents import result_cache
+from app.agents.result_cache import InvestigationCache, build_fingerprint
+from tests.fakes import final_answer
+
+ANOMALY = {
+    "anomaly_type": "Package Damage Detected",
+    "severity": "medium",
+    "last_scan_location": "Chicago, IL",
+    "destination": "New York, NY",
+    "current_status": "in_transit",
+    "description": "Package crushed at the sorting hub, 2 boxes affected"
+}
+CONTEXT = {"weather": {"conditions": "Clear", "weather_impact": "Low"}, "traffic": {"traffic_level": "light"}}
+
+
+def fingerprint(**overrides):
+    return build_fingerprint({**ANOMALY, **overrides}, CONTEXT)
+
+
+def store(cache, fp, confidence=0.9, package_id="PKG-1"):
+    cache.store(
+        fp, package_id, [f"{package_id} crushed at the hub"], ["File a damage claim"], confidence,
+        "high", "1-2 days", [f"Inspect {package_id}"], 1200
+    )
+
+
+@pytest.fixture
+def cache():
+    return InvestigationCache(ttl=60, max_entries=10, min_confidence=0.6, similarity_enabled=True, similarity_threshold=0.9, enabled=True)
+
+
+def test_exact_hit(cache):
+    store(cache, fingerprint())
+    
+    entry, tier, similarity = cache.lookup(fingerprint())
+    
+    assert tier == "exact"
+    assert similarity == 1.0
+    assert entry.priority == "high"
+    assert cache.get_stats()["tokens_saved"] == 1200
+
+
+def test_similar_hit_within_bucket(cache):
+    store(cache, fingerprint())
+    
+    entry, tier, similarity = cache.lookup(fingerprint(description="Package crushed at sorting hub, 3 boxes affected"))
+    
+    assert tier == "similar"
+    assert 0.9 <= similarity < 1.0
+    assert entry.findings == ["PKG-1 crushed at the hub"]
+
+
+@pytest.mark.parametrize("overrides", [
+    {"last_scan_location": "Denver, CO"},
+    {"destination": "Boston, MA"},
+    {"severity": "high"}
+])
+def test_miss_across_buckets(cache, overrides):
+    store(cache, fingerprint())
+    
+    entry, tier, _ = cache.lookup(fingerprint(**overrides))
+    
+    assert entry is None
+    assert tier is None
+    assert cache.get_stats()["misses"] == 1
+
+
+def test_entries_expire(cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, "monotonic", lambda: now[0])
+    store(cache, fingerprint())
+    
+    now[0] += 59
+    assert cache.lookup(fingerprint())[1] == "exact"
+    
+    now[0] += 2
+    assert cache.lookup(fingerprint()) == (None, None, 0.0)
+
+
+def test_low_confidence_analyses_are_not_stored(cache):
+    store(cache, fingerprint(), confidence=0.59)
+    
+    assert cache.lookup(fingerprint())[0] is None
+    assert cache.get_stats()["skipped_low_confidence"] == 1
+    
+    store(cache, fingerprint(), confidence=0.6)
+    
+    assert cache.lookup(fingerprint())[1] == "exact"
+
+
+@pytest.mark.anyio
+async def test_cache_hit_skips_the_llm(make_agent, monkeypatch):
+    agent = make_agent([final_answer(["PKG-1 crushed at the hub"], ["File a damage claim"], confidence=0.9)])
+    
+    async def prefetch(package_id, anomaly_data):
+        return dict(CONTEXT), {}
+    
+    monkeypatch.setattr(agent, "_prefetch_context", prefetch)
+    
+    first = await agent.investigate_anomaly("PKG-1", dict(ANOMALY))
+    second = await agent.investigate_anomaly("PKG-2", dict(ANOMALY))
+    
+    assert agent.llm.calls == 1
+    assert "cache_hit" not in first.latency_breakdown
+    assert second.latency_breakdown["cache_hit"] == 1.0
+    assert second.findings == ["PKG-2 crushed at the hub"]
+    assert second.priority == first.priority
+    assert second.usage["source"] == "cache"
+    assert second.usage["tokens_saved"] == first.usage["total_tokens"]
@@ -0,0 +1,176 @@
+"""
+Tests for the investigation rules engine fast path
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.agents.rules_engine import RulesEngine, extract_signals
+
+HIGH_WEATHER = {"conditions": "Heavy snow", "weather_impact": "High - Severe weather conditions may cause delays"}
+MODERATE_WEATHER = {"conditions": "Rain", "weather_impact": "Moderate - Weather may cause minor delays"}
+CLEAR_WEATHER = {"conditions": "Clear", "weather_impact": "Low - Normal delivery conditions"}
+HEAVY_TRAFFIC = {"traffic_level": "heavy", "current_delay": "45 minutes"}
+LIGHT_TRAFFIC = {"traffic_level": "light", "current_delay": "0 minutes"}
+
+
+def delay(**overrides):
+    anomaly = {
+        "anomaly_type": "delayed_delivery",
+        "severity": "medium",
+        "current_status": "in_transit",
+        "last_scan_location": "Denver, CO"
+    }
+    anomaly.update(overrides)
+    return anomaly
+
+
+def hours_ago(hours):
+    return (datetime.utcnow() - timedelta(hours=hours)).isoformat()
+
+
+@pytest.fixture
+def engine():
+    return RulesEngine(min_confidence=0.8, stale_scan_hours=48, enabled=True)
+
+
+def test_weather_delay_short_circuits(engine):
+    outcome = engine.evaluate(delay(), {"weather": HIGH_WEATHER, "traffic": LIGHT_TRAFFIC})
+    
+    assert outcome.reason == "short_circuit"
+    assert outcome.matched == ["weather_delay"]
+    assert outcome.decision.rule == "weather_delay"
+    assert outcome.decision.confidence == 0.9
+    assert outcome.decision.priority == "medium"
+    assert "Denver, CO" in outcome.decision.findings[0]
+
+
+def test_decision_priority_follows_severity(engine):
+    outcome = engine.evaluate(delay(severity="high"), {"weather": HIGH_WEATHER, "traffic": LIGHT_TRAFFIC})
+    
+    assert outcome.decision.priority == "high"
+
+
+def test_delivered_package_short_circuits(engine):
+    outcome = engine.evaluate(delay(current_status="delivered"), {"weather": HIGH_WEATHER})
+    
+    assert outcome.reason == "short_circuit"
+    assert outcome.decision.rule == "already_delivered"
+    assert outcome.decision.estimated_resolution_time == "Resolved"
+    assert outcome.decision.priority == "medium"
+
+
+@pytest.mark.parametrize("anomaly_type", ["Package Damage Detected", "Package Lost in Transit", "Security Breach Detected"])
+def test_delivered_package_with_other_anomaly_goes_to_agent(engine, anomaly_type):
+    outcome = engine.evaluate(
+        {"anomaly_type": anomaly_type, "severity": "high", "current_status": "delivered"},
+        {"weather": CLEAR_WEATHER, "traffic": LIGHT_TRAFFIC}
+    )
+    
+    assert outcome.decision is None
+    assert "already_delivered" not in outcome.matched
+
+
+def test_stale_scan_on_lost_package(engine):
+    outcome = engine.evaluate(
+        {"anomaly_type": "Package Lost in Transit", "severity": "high", "current_status": "in_transit",
+         "last_scan_time": hours_ago(72)},
+        {"weather": CLEAR_WEATHER, "traffic": LIGHT_TRAFFIC}
+    )
+    
+    assert outcome.reason == "short_circuit"
+    assert outcome.decision.rule == "stale_scan"
+
+
+@pytest.mark.parametrize("anomaly_type", ["route_optimization", "predictive_analysis"])
+def test_stale_scan_ignores_analysis_requests(engine, anomaly_type):
+    outcome = engine.evaluate(
+        {"anomaly_type": anomaly_type, "severity": "low", "current_status": "in_transit", "last_scan_time": hours_ago(72)},
+        {"weather": CLEAR_WEATHER, "traffic": LIGHT_TRAFFIC}
+    )
+    
+    assert outcome.reason == "no_match"
+
+
+def test_competing_rules_are_ambiguous(engine):
+    # Bad weather and a stale scan both explain the delay
+    outcome = engine.evaluate(delay(last_scan_time=hours_ago(72)), {"weather": HIGH_WEATHER, "traffic": LIGHT_TRAFFIC})
+    
+    assert outcome.reason == "ambiguous"
+    assert outcome.decision is None
+    assert sorted(outcome.matched) == ["stale_scan", "weather_delay"]
+
+
+def test_weak_match_is_low_confidence(engine):
+    outcome = engine.evaluate(delay(), {"weather": MODERATE_WEATHER, "traffic": LIGHT_TRAFFIC})
+    
+    assert outcome.reason == "low_confidence"
+    assert outcome.decision is None
+    assert outcome.matched == ["weather_delay"]
+
+
+def test_no_rule_matches(engine):
+    outcome = engine.evaluate(
+        {"anomaly_type": "damaged_package", "severity": "medium", "current_status": "in_transit"},
+        {"weather": CLEAR_WEATHER, "traffic": LIGHT_TRAFFIC}
+    )
+    
+    assert outcome.reason == "no_match"
+    assert outcome.decision is None
+    assert outcome.matched == []
+
+
+@pytest.mark.parametrize("overrides", [{"priority": "critical"}, {"severity": "critical"}])
+def test_critical_packages_escalate(engine, overrides):
+    outcome = engine.evaluate(delay(**overrides), {"weather": HIGH_WEATHER, "traffic": LIGHT_TRAFFIC})
+    
+    assert outcome.reason == "escalated_priority"
+    assert outcome.decision is None
+    assert outcome.matched == ["weather_delay"]
+
+
+def test_disabled_engine_never_answers():
+    outcome = RulesEngine(enabled=False).evaluate(delay(), {"weather": HIGH_WEATHER})
+    
+    assert outcome.reason == "disabled"
+    assert outcome.decision is None
+
+
+def test_stats_count_outcomes(engine):
+    engine.evaluate(delay(), {"weather": HIGH_WEATHER, "traffic": LIGHT_TRAFFIC})
+    engine.evaluate(delay(), {"weather": HIGH_WEATHER, "traffic": HEAVY_TRAFFIC})
+    engine.evaluate(delay(), {"weather": MODERATE_WEATHER})
+    engine.evaluate(delay(anomaly_type="damaged_package"), {})
+    
+    stats = engine.get_stats()
+    
+    assert stats["evaluated"] == 4
+    assert stats["short_circuit"] == 2
+    assert stats["low_confidence"] == 1
+    assert stats["no_match"] == 1
+    assert stats["rule_hits"] == {"weather_delay": 1, "weather_and_traffic_delay": 1}
+    assert stats["short_circuit_rate"] == 0.5
+
+
+def test_extract_signals_reads_context():
+    now = datetime(2024, 1, 15, 12, 0, 0)
+    signals = extract_signals(
+        {"anomaly_type": "Delayed_Delivery", "severity": "HIGH", "last_scan_time": "2024-01-13T12:00:00Z"},
+        {
+            "package": {"status": "In_Transit", "priority": "medium", "last_scan_location": "Chicago, IL"},
+            "weather": MODERATE_WEATHER,
+            "traffic": HEAVY_TRAFFIC
+        },
+        now=now
+    )
+    
+    assert signals.anomaly_type == "delayed_delivery"
+    assert signals.severity == "high"
+    assert signals.status == "in_transit"
+    assert signals.priority == "medium"
+    assert signals.last_scan_location == "Chicago, IL"
+    assert signals.last_scan_age_hours == 48.0
+    assert signals.weather_impact == "moderate"
+    assert signals.traffic_level == "heavy"
+    assert signals.is_delay
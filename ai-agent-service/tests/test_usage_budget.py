@@ -0,0 +1,122 @@
+"""
+Tests for tenant token reservations and investigations stopped at their budget
+"""
+
+import asyncio
+
+import pytest
+
+from app.agents import investigator_agent
+from app.agents.usage_accounting import TenantUsageLedger
+from tests.fakes import final_answer
+
+ANOMALY = {"anomaly_type": "Package Damage Detected", "severity": "medium", "current_status": "in_transit"}
+CONTEXT = {
+    "package": {"status": "in_transit", "last_scan_location": "Denver, CO"},
+    "weather": {"conditions": "Heavy snow", "weather_impact": "High - Severe weather conditions may cause delays"},
+    "traffic": {"traffic_level": "heavy", "current_delay": "45 minutes"}
+}
+ANSWER = final_answer(["Crushed at the hub"], ["File a damage claim"])
+WEATHER_ACTION = "Thought: Check the weather at the hub\nAction: get_weather_data\nAction Input: Denver, CO"
+
+
+@pytest.fixture
+def ledger(monkeypatch):
+    ledger = TenantUsageLedger(daily_budget=10 ** 9, budgets={})
+    monkeypatch.setattr(investigator_agent, "usage_ledger", ledger)
+    return ledger
+
+
+@pytest.fixture
+def make_investigator(make_agent, monkeypatch):
+    """An investigator over a fixed prefetched context"""
+    def build(responses):
+        agent = make_agent(responses)
+        
+        async def prefetch(package_id, anomaly_data):
+            return dict(CONTEXT), {}
+        
+        monkeypatch.setattr(agent, "_prefetch_context", prefetch)
+        return agent
+    
+    return build
+
+
+def test_reserve_is_capped_by_what_is_left():
+    ledger = TenantUsageLedger(daily_budget=1000, budgets={})
+    
+    assert ledger.reserve("acme", 600) == 600
+    assert ledger.reserve("acme", 600) == 400
+    assert ledger.reserve("acme", 600) == 0
+    assert ledger.remaining("acme") == 0
+
+
+def test_settle_replaces_the_reservation_with_the_spend():
+    ledger = TenantUsageLedger(daily_budget=1000, budgets={})
+    reserved = ledger.reserve("acme", 600)
+    
+    ledger.settle("acme", reserved, 150)
+    
+    assert ledger.remaining("acme") == 850
+    assert ledger.get_stats()["tenants"]["acme"]["used"] == 150
+
+
+@pytest.mark.anyio
+async def test_run_settles_its_reservation(make_investigator, ledger):
+    agent = make_investigator([ANSWER])
+    
+    result = await agent.investigate_anomaly("PKG-1", dict(ANOMALY), tenant_id="acme")
+    
+    assert result.usage["source"] == "llm"
+    assert ledger.get_stats()["tenants"]["acme"]["used"] == result.usage["total_tokens"]
+
+
+@pytest.mark.anyio
+async def test_concurrent_runs_cannot_share_the_remaining_budget(make_investigator, ledger, monkeypatch):
+    monkeypatch.setattr(investigator_agent, "investigation_budget", lambda anomaly_type: 100000)
+    ledger.budgets["acme"] = 100000
+    agent = make_investigator([ANSWER, ANSWER])
+    
+    results = await asyncio.gather(
+        agent.investigate_anomaly("PKG-1", dict(ANOMALY), tenant_id="acme"),
+        agent.investigate_anomaly("PKG-2", dict(ANOMALY, severity="high"), tenant_id="acme")
+    )
+    
+    assert sorted(result.usage["source"] for result in results) == ["budget", "llm"]
+    assert agent.llm.calls == 1
+    spent = next(result.usage["total_tokens"] for result in results if result.usage["source"] == "llm")
+    assert ledger.remaining("acme") == 100000 - spent
+
+
+@pytest.mark.anyio
+async def test_budget_stop_returns_partial_result(make_investigator, ledger, monkeypatch):
+    # Size the budget so the first LLM call fits and the second (with a longer scratchpad) does not
+    probe = await make_investigator([ANSWER]).investigate_anomaly("PKG-0", dict(ANOMALY), tenant_id="probe")
+    first_prompt = probe.usage["prompt_tokens"]
+    monkeypatch.setattr(investigator_agent, "investigation_budget", lambda anomaly_type: 2 * first_prompt)
+    agent = make_investigator([WEATHER_ACTION, ANSWER])
+    
+    result = await agent.investigate_anomaly("PKG-1", dict(ANOMALY), tenant_id="acme")
+    
+    assert result.budget_exhausted
+    assert result.error is None
+    assert agent.llm.calls == 1
+    assert result.findings[0] == "Check the weather at the hub"
+    assert any("Heavy snow" in finding for finding in result.findings)
+    assert result.usage["budget_exceeded"]
+    assert result.latency_breakdown["agent_tool_calls"] == 1
+    # Partial results are not reused
+    assert agent.result_cache.lookup(investigator_agent.build_fingerprint(ANOMALY, CONTEXT))[0] is None
+
+
+@pytest.mark.anyio
+async def test_exhausted_tenant_never_reaches_the_llm(make_investigator, ledger):
+    ledger.budgets["acme"] = 100
+    ledger.add("acme", 100)
+    agent = make_investigator([ANSWER])
+    
+    result = await agent.investigate_anomaly("PKG-1", dict(ANOMALY), tenant_id="acme")
+    
+    assert agent.llm.calls == 0
+    assert result.error
+    assert result.usage["source"] == "budget"
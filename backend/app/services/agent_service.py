@@ -9,8 +9,13 @@ from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 import logging
 
+from app.services.http_pool import http_pool, UpstreamConfig
+
 logger = logging.getLogger(__name__)
 
+# AgentService is created per request, so its upstream is registered once here
+http_pool.configure("ai_agent_service", UpstreamConfig(base_url="http://ai-agent-service:8002", timeout=30.0))
+
 class AgentService:
     """Service for managing AI agents via microservice"""
     
@@ -23,14 +28,14 @@ class AgentService:
     async def _call_ai_service(self, endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """Make HTTP call to AI Agent Service"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.ai_service_url}{endpoint}",
-                    json=data,
-                    timeout=self.timeout
-                )
-                response.raise_for_status()
-                return response.json()
+            client = http_pool.get("ai_agent_service")
+            response = await client.post(
+                f"{self.ai_service_url}{endpoint}",
+                json=data,
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            return response.json()
         except httpx.HTTPError as e:
             logger.error(f"HTTP error calling AI service: {e}")
             raise Exception(f"AI service unavailable: {str(e)}")
@@ -14,6 +14,7 @@ from app.models.user import User
 from app.api.packages import router as packages_router
 from app.api.agents import router as agents_router
 from app.websocket import router as websocket_router
+from app.services.http_pool import http_pool
 
 # Create tables
 try:
@@ -28,9 +29,11 @@ except Exception as e:
 async def lifespan(app: FastAPI):
     # Startup
     print("🚀 ClearPath AI Backend starting up...")
+    await http_pool.start()
     yield
     # Shutdown
     print("🛑 ClearPath AI Backend shutting down...")
+    await http_pool.close()
 
 app = FastAPI(
     title="ClearPath AI - Package Management API",
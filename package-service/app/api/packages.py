@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
@@ -13,6 +13,7 @@ from app.schemas.package import (
 )
 from app.schemas.tracking_event import TrackingEventCreate, TrackingEventResponse
 from app.services.package_service import PackageService
+from app.services.ai_client import ai_service_client
 from app.auth.dependencies import get_current_user, get_current_user_optional, get_active_user
 from app.models.user import User
 
@@ -118,6 +119,7 @@ async def get_package_by_tracking(
 async def update_package(
     package_id: UUID,
     update_data: PackageUpdate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_active_user),
     db: Session = Depends(get_db)
 ):
@@ -129,11 +131,13 @@ async def update_package(
     if not package:
         raise HTTPException(status_code=404, detail="Package not found")
     
+    background_tasks.add_task(ai_service_client.invalidate_package_cache, str(package_id))
     return package
 
 @router.delete("/{package_id}")
 async def delete_package(
     package_id: UUID,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_active_user),
     db: Session = Depends(get_db)
 ):
@@ -144,11 +148,13 @@ async def delete_package(
     if not success:
         raise HTTPException(status_code=404, detail="Package not found")
     
+    background_tasks.add_task(ai_service_client.invalidate_package_cache, str(package_id))
     return {"message": "Package deleted successfully"}
 
 @router.put("/bulk-update")
 async def bulk_update_packages(
     bulk_request: BulkUpdateRequest,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_active_user),
     db: Session = Depends(get_db)
 ):
@@ -160,6 +166,10 @@ async def bulk_update_packages(
         bulk_request.update_data
     )
     
+    failed_ids = set(result["failed_package_ids"])
+    updated_ids = [str(package_id) for package_id in bulk_request.package_ids if str(package_id) not in failed_ids]
+    background_tasks.add_task(ai_service_client.invalidate_packages_cache, updated_ids)
+    
     return {
         "message": f"Bulk update completed. {result['updated_count']} packages updated successfully.",
         "updated_count": result["updated_count"],
@@ -172,6 +182,7 @@ async def bulk_update_packages(
 async def add_tracking_event(
     package_id: str,
     event_data: TrackingEventCreate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_active_user),
     db: Session = Depends(get_db)
 ):
@@ -184,6 +195,7 @@ async def add_tracking_event(
         raise HTTPException(status_code=404, detail="Package not found")
     
     event = service.add_tracking_event(package_id, event_data)
+    background_tasks.add_task(ai_service_client.invalidate_package_cache, str(package_id))
     return event
 
 @router.get("/{package_id}/tracking-events", response_model=List[TrackingEventResponse])
@@ -13,6 +13,8 @@ from app.models.package import Base
 from app.models.user import User
 from app.api.packages import router as packages_router
 from app.auth.dependencies import get_current_user, get_current_user_optional, get_active_user
+from app.services.websocket_client import websocket_service_client
+from app.services.http_pool import http_pool
 
 # Create tables
 try:
@@ -27,9 +29,12 @@ except Exception as e:
 async def lifespan(app: FastAPI):
     # Startup
     print("🚀 Package Service starting up...")
+    await http_pool.start()
     yield
     # Shutdown
     print("🛑 Package Service shutting down...")
+    await websocket_service_client.close()
+    await http_pool.close()
 
 app = FastAPI(
     title="Package Management Service",
@@ -3,9 +3,11 @@ AI Service Client for inter-service communication
 """
 
 import httpx
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import logging
 
+from app.services.http_pool import http_pool, UpstreamConfig
+
 logger = logging.getLogger(__name__)
 
 class AIServiceClient:
@@ -14,18 +16,19 @@ class AIServiceClient:
     def __init__(self):
         self.base_url = "http://ai-agent-service:8002"
         self.timeout = 30.0
+        http_pool.configure("ai_agent_service", UpstreamConfig(base_url=self.base_url, timeout=self.timeout))
     
     async def investigate_anomaly(self, package_id: str, anomaly_data: Dict[str, Any]) -> Dict[str, Any]:
         """Investigate a package anomaly using AI agent"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/api/v1/agents/investigate/anomaly/{package_id}",
-                    json=anomaly_data,
-                    timeout=self.timeout
-                )
-                response.raise_for_status()
-                return response.json()
+            client = http_pool.get("ai_agent_service")
+            response = await client.post(
+                f"{self.base_url}/api/v1/agents/investigate/anomaly/{package_id}",
+                json=anomaly_data,
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            return response.json()
         except httpx.HTTPError as e:
             logger.error(f"HTTP error calling AI service: {e}")
             raise Exception(f"AI service unavailable: {str(e)}")
@@ -36,14 +39,14 @@ class AIServiceClient:
     async def investigate_delay(self, package_id: str, delay_data: Dict[str, Any]) -> Dict[str, Any]:
         """Investigate a package delay using AI agent"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/api/v1/agents/investigate/delay/{package_id}",
-                    json=delay_data,
-                    timeout=self.timeout
-                )
-                response.raise_for_status()
-                return response.json()
+            client = http_pool.get("ai_agent_service")
+            response = await client.post(
+                f"{self.base_url}/api/v1/agents/investigate/delay/{package_id}",
+                json=delay_data,
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            return response.json()
         except httpx.HTTPError as e:
             logger.error(f"HTTP error calling AI service: {e}")
             raise Exception(f"AI service unavailable: {str(e)}")
@@ -54,14 +57,14 @@ class AIServiceClient:
     async def optimize_route(self, package_id: str, route_data: Dict[str, Any]) -> Dict[str, Any]:
         """Optimize package route using AI agent"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/api/v1/agents/optimize/route/{package_id}",
-                    json=route_data,
-                    timeout=self.timeout
-                )
-                response.raise_for_status()
-                return response.json()
+            client = http_pool.get("ai_agent_service")
+            response = await client.post(
+                f"{self.base_url}/api/v1/agents/optimize/route/{package_id}",
+                json=route_data,
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            return response.json()
         except httpx.HTTPError as e:
             logger.error(f"HTTP error calling AI service: {e}")
             raise Exception(f"AI service unavailable: {str(e)}")
@@ -72,21 +75,42 @@ class AIServiceClient:
     async def get_investigation_status(self, package_id: str) -> Optional[Dict[str, Any]]:
         """Get investigation status for a package"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/api/v1/agents/investigations/{package_id}",
-                    timeout=self.timeout
-                )
-                if response.status_code == 404:
-                    return None
-                response.raise_for_status()
-                return response.json()
+            client = http_pool.get("ai_agent_service")
+            response = await client.get(
+                f"{self.base_url}/api/v1/agents/investigations/{package_id}",
+                timeout=self.timeout
+            )
+            if response.status_code == 404:
+                return None
+            response.raise_for_status()
+            return response.json()
         except httpx.HTTPError as e:
             logger.error(f"HTTP error calling AI service: {e}")
             return None
         except Exception as e:
             logger.error(f"Error calling AI service: {e}")
             return None
+    
+    async def invalidate_package_cache(self, package_id: str):
+        """Drop the AI service's cached tool results for a package after it changes"""
+        await self.invalidate_packages_cache([package_id])
+    
+    async def invalidate_packages_cache(self, package_ids: List[str]):
+        """Drop the AI service's cached tool results for several packages in one request"""
+        if not package_ids:
+            return
+        try:
+            client = http_pool.get("ai_agent_service")
+            response = await client.post(
+                f"{self.base_url}/api/v1/mcp/cache/invalidate",
+                json={"tool_name": "get_package_data", "match_any": {"package_id": package_ids}},
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            logger.error(f"HTTP error invalidating AI service cache for {package_ids}: {e}")
+        except Exception as e:
+            logger.error(f"Error invalidating AI service cache for {package_ids}: {e}")
 
 # Global AI service client instance
 ai_service_client = AIServiceClient()
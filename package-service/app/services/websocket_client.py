@@ -1,11 +1,17 @@
 """
 WebSocket Service Client for inter-service communication
+
+Events are buffered and flushed to the WebSocket Service batch endpoint over the
+shared keep-alive client pool, instead of opening a new connection per event.
 """
 
+import asyncio
 import httpx
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import logging
 
+from app.services.http_pool import http_pool, UpstreamConfig
+
 logger = logging.getLogger(__name__)
 
 class WebSocketServiceClient:
@@ -14,36 +20,71 @@ class WebSocketServiceClient:
     def __init__(self):
         self.base_url = "http://websocket-service:8003"
         self.timeout = 10.0
+        # Flush as soon as this many events are buffered...
+        self.max_batch_size = 100
+        # ...or after this many seconds, whichever comes first
+        self.flush_interval = 0.05
+        http_pool.configure("websocket_service", UpstreamConfig(base_url=self.base_url, timeout=self.timeout))
+        
+        self._buffer: List[Dict[str, Any]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+    
+    async def _enqueue(self, event_type: str, data: Dict[str, Any]):
+        """Buffer an event and schedule a flush"""
+        self._buffer.append({"type": event_type, "data": data})
+        
+        if len(self._buffer) >= self.max_batch_size:
+            await self.flush()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+    
+    async def _delayed_flush(self):
+        """Flush the buffer after the flush interval"""
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+    
+    async def flush(self):
+        """Send all buffered events to the WebSocket service in one request"""
+        if not self._buffer:
+            return
+        
+        events, self._buffer = self._buffer, []
+        
+        try:
+            response = await http_pool.get("websocket_service").post(
+                "/ws/broadcast/batch",
+                json={"events": events}
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            logger.error(f"HTTP error calling WebSocket service ({len(events)} events dropped): {e}")
+        except Exception as e:
+            logger.error(f"Error calling WebSocket service ({len(events)} events dropped): {e}")
+    
+    async def close(self):
+        """Flush pending events (the HTTP client is closed with the shared pool)"""
+        if self._flush_task is not None and not self._flush_task.done():
+            await self._flush_task
+        await self.flush()
     
     async def broadcast_package_update(
-        self, 
-        package_id: str, 
-        tracking_number: str, 
+        self,
+        package_id: str,
+        tracking_number: str,
         status: str,
         location: Optional[str] = None,
         estimated_delivery: Optional[str] = None,
         carrier: Optional[str] = None
     ):
         """Broadcast package update via WebSocket"""
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/ws/broadcast/package-update",
-                    json={
-                        "package_id": package_id,
-                        "tracking_number": tracking_number,
-                        "status": status,
-                        "location": location,
-                        "estimated_delivery": estimated_delivery,
-                        "carrier": carrier
-                    },
-                    timeout=self.timeout
-                )
-                response.raise_for_status()
-        except httpx.HTTPError as e:
-            logger.error(f"HTTP error calling WebSocket service: {e}")
-        except Exception as e:
-            logger.error(f"Error calling WebSocket service: {e}")
+        await self._enqueue("package_update", {
+            "package_id": package_id,
+            "tracking_number": tracking_number,
+            "status": status,
+            "location": location,
+            "estimated_delivery": estimated_delivery,
+            "carrier": carrier
+        })
     
     async def broadcast_notification(
         self,
@@ -55,25 +96,14 @@ class WebSocketServiceClient:
         user_id: Optional[str] = None
     ):
         """Broadcast notification via WebSocket"""
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/ws/broadcast/notification",
-                    json={
-                        "notification_id": notification_id,
-                        "title": title,
-                        "message": message,
-                        "priority": priority,
-                        "category": category,
-                        "user_id": user_id
-                    },
-                    timeout=self.timeout
-                )
-                response.raise_for_status()
-        except httpx.HTTPError as e:
-            logger.error(f"HTTP error calling WebSocket service: {e}")
-        except Exception as e:
-            logger.error(f"Error calling WebSocket service: {e}")
+        await self._enqueue("notification", {
+            "notification_id": notification_id,
+            "title": title,
+            "message": message,
+            "priority": priority,
+            "category": category,
+            "user_id": user_id
+        })
 
 # Global WebSocket service client instance
 websocket_service_client = WebSocketServiceClient()
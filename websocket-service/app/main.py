@@ -6,16 +6,23 @@ import uvicorn
 from contextlib import asynccontextmanager
 import time
 import logging
+import os
 
 from app.websocket.router import router as websocket_router
+from app.websocket.connection_manager import connection_manager
+
+# Negotiate permessage-deflate with clients that offer it
+WS_PER_MESSAGE_DEFLATE = os.getenv("WS_PER_MESSAGE_DEFLATE", "true").lower() == "true"
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     print("🚀 WebSocket Service starting up...")
+    connection_manager.start_heartbeat()
     yield
     # Shutdown
     print("🛑 WebSocket Service shutting down...")
+    await connection_manager.stop_heartbeat()
 
 app = FastAPI(
     title="WebSocket Service",
@@ -27,7 +34,8 @@ app = FastAPI(
 # Security middleware
 app.add_middleware(
     TrustedHostMiddleware, 
-    allowed_hosts=["localhost", "127.0.0.1", "*.vercel.app", "*.clearpath-ai.com"]
+    # "websocket-service" is the Docker service name other services call us by
+    allowed_hosts=["localhost", "127.0.0.1", "*.vercel.app", "*.clearpath-ai.com", "websocket-service"]
 )
 
 # CORS middleware
@@ -61,8 +69,8 @@ async def rate_limit_middleware(request: Request, call_next):
     
     return response
 
-# Include WebSocket router
-app.include_router(websocket_router, prefix="/ws")
+# Include WebSocket router (the router already carries the /ws prefix)
+app.include_router(websocket_router)
 
 @app.get("/")
 async def root():
@@ -81,6 +89,7 @@ async def health_check():
             "status": "healthy",
             "service": "websocket-service",
             "active_connections": connection_manager.get_connection_count(),
+            "connections_reaped": connection_manager.heartbeat_stats["connections_reaped"],
             "timestamp": "2024-01-15T10:30:00Z"
         }
     except Exception as e:
@@ -97,5 +106,6 @@ if __name__ == "__main__":
         "main:app",
         host="0.0.0.0",
         port=8003,
-        reload=True
+        reload=True,
+        ws_per_message_deflate=WS_PER_MESSAGE_DEFLATE
     )
@@ -16,6 +16,7 @@ class WebSocketMessageType(str, Enum):
     SYSTEM_HEALTH = "system_health"
     PING = "ping"
     PONG = "pong"
+    SNAPSHOT = "snapshot"
     ERROR = "error"
     SUCCESS = "success"
 
@@ -25,6 +26,7 @@ class WebSocketMessage(BaseModel):
     data: Dict[str, Any]
     timestamp: datetime
     message_id: Optional[str] = None
+    seq: Optional[int] = None  # Sequence number for snapshot/delta sync
 
 class PackageUpdateData(BaseModel):
     """Package update message data"""
@@ -106,6 +108,25 @@ class WebSocketConnectionInfo(BaseModel):
     connected_at: datetime
     last_activity: datetime
     subscriptions: List[str] = []  # What the client is subscribed to
+    encoding: str = "json"  # Wire encoding negotiated by the client (json or msgpack)
+
+class BroadcastEvent(BaseModel):
+    """Single event submitted by another service for broadcasting"""
+    type: WebSocketMessageType
+    data: Dict[str, Any]
+
+class BroadcastBatchRequest(BaseModel):
+    """Batch of events submitted in one inter-service request"""
+    events: List[BroadcastEvent]
+
+class NotificationBroadcastRequest(BaseModel):
+    """Notification broadcast request from another service"""
+    notification_id: str
+    title: str
+    message: str
+    priority: str = "normal"
+    category: str = "general"
+    user_id: Optional[str] = None
 
 class WebSocketError(BaseModel):
     """WebSocket error message"""
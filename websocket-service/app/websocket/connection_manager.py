@@ -1,6 +1,9 @@
 import json
 import asyncio
-from typing import Dict, List, Set, Optional
+import os
+import time
+from itertools import islice
+from typing import Dict, List, Set, Optional, Union, Any
 from fastapi import WebSocket
 from datetime import datetime
 import uuid
@@ -12,36 +15,80 @@ from app.schemas.websocket import (
     WebSocketConnectionInfo,
     WebSocketError
 )
+from app.websocket.encoding import encode_message, normalize_encoding, payload_size
+from app.websocket.sync_state import SyncState, SYNCED_SUBSCRIPTIONS
 
 logger = logging.getLogger(__name__)
 
+# Seconds between heartbeat sweeps; idle connections are pinged on each sweep
+HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", "30"))
+# Seconds without any client message after which a connection is reaped
+IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "90"))
+
+class ConnectionRecord:
+    """Compact per-connection state
+    
+    One of these is kept per open socket, so it uses __slots__, epoch-second
+    floats instead of datetimes and a subscription bitmask instead of a list.
+    WebSocketConnectionInfo is only built when a caller asks for it.
+    """
+    
+    __slots__ = ("websocket", "user_id", "connected_at", "last_activity", "subscription_mask", "encoding")
+    
+    def __init__(self, websocket: WebSocket, user_id: Optional[str], encoding: str):
+        now = time.time()
+        self.websocket = websocket
+        self.user_id = user_id
+        self.connected_at = now
+        self.last_activity = now
+        self.subscription_mask = 0
+        self.encoding = encoding
+
 class WebSocketConnectionManager:
     """Manages WebSocket connections and message broadcasting"""
     
-    def __init__(self):
-        # Active connections: {connection_id: WebSocket}
-        self.active_connections: Dict[str, WebSocket] = {}
-        # Connection info: {connection_id: WebSocketConnectionInfo}
-        self.connection_info: Dict[str, WebSocketConnectionInfo] = {}
+    def __init__(self, heartbeat_interval: float = HEARTBEAT_INTERVAL, idle_timeout: float = IDLE_TIMEOUT):
+        # Connections: {connection_id: ConnectionRecord}
+        self.connections: Dict[str, ConnectionRecord] = {}
         # Subscriptions: {subscription_type: Set[connection_ids]}
         self.subscriptions: Dict[str, Set[str]] = {}
+        # Subscription bit assignments: {subscription_type: bit}, and the reverse
+        self._subscription_bits: Dict[str, int] = {}
+        self._subscription_names: List[str] = []
         # User connections: {user_id: Set[connection_ids]}
         self.user_connections: Dict[str, Set[str]] = {}
+        # Message size stats: {subscription_type: {encoding: {"messages": n, "bytes": n}}}
+        self.message_stats: Dict[str, Dict[str, Dict[str, int]]] = {}
+        # Snapshot and recent deltas for dashboard and map clients
+        self.sync_state = SyncState()
+        # Heartbeat and idle reaping
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.heartbeat_stats: Dict[str, int] = {
+            "sweeps": 0,
+            "pings_sent": 0,
+            "connections_reaped": 0
+        }
+        self._heartbeat_task: Optional[asyncio.Task] = None
     
-    async def connect(self, websocket: WebSocket, user_id: Optional[str] = None) -> str:
+    async def connect(
+        self,
+        websocket: WebSocket,
+        user_id: Optional[str] = None,
+        encoding: Optional[str] = None
+    ) -> str:
         """Accept a new WebSocket connection"""
         await websocket.accept()
         
         connection_id = str(uuid.uuid4())
-        self.active_connections[connection_id] = websocket
         
-        connection_info = WebSocketConnectionInfo(
-            connection_id=connection_id,
-            user_id=user_id,
-            connected_at=datetime.utcnow(),
-            last_activity=datetime.utcnow()
-        )
-        self.connection_info[connection_id] = connection_info
+        try:
+            encoding = normalize_encoding(encoding)
+        except ValueError as e:
+            logger.warning(f"{e}; falling back to JSON for {connection_id}")
+            encoding = normalize_encoding(None)
+        
+        self.connections[connection_id] = ConnectionRecord(websocket, user_id, encoding)
         
         # Track user connections
         if user_id:
@@ -56,7 +103,11 @@ class WebSocketConnectionManager:
             connection_id,
             WebSocketMessage(
                 type=WebSocketMessageType.SUCCESS,
-                data={"message": "Connected to ClearPath AI WebSocket", "connection_id": connection_id},
+                data={
+                    "message": "Connected to ClearPath AI WebSocket",
+                    "connection_id": connection_id,
+                    "encoding": encoding
+                },
                 timestamp=datetime.utcnow()
             )
         )
@@ -65,80 +116,146 @@ class WebSocketConnectionManager:
     
     async def disconnect(self, connection_id: str):
         """Disconnect a WebSocket connection"""
-        if connection_id in self.active_connections:
-            websocket = self.active_connections[connection_id]
-            await websocket.close()
+        # Remove from all tracking before closing, so a failed close
+        # on a dead socket cannot leave stale entries behind
+        record = self.connections.pop(connection_id, None)
+        if record is not None:
+            user_id = record.user_id
             
-            # Remove from all tracking
-            del self.active_connections[connection_id]
+            # Remove from user connections
+            if user_id and user_id in self.user_connections:
+                self.user_connections[user_id].discard(connection_id)
+                if not self.user_connections[user_id]:
+                    del self.user_connections[user_id]
             
-            if connection_id in self.connection_info:
-                connection_info = self.connection_info[connection_id]
-                user_id = connection_info.user_id
-                
-                # Remove from user connections
-                if user_id and user_id in self.user_connections:
-                    self.user_connections[user_id].discard(connection_id)
-                    if not self.user_connections[user_id]:
-                        del self.user_connections[user_id]
-                
-                # Remove from subscriptions
-                for subscription_type in connection_info.subscriptions:
-                    if subscription_type in self.subscriptions:
-                        self.subscriptions[subscription_type].discard(connection_id)
-                
-                del self.connection_info[connection_id]
+            # Remove from subscriptions
+            for subscription_type in self._subscription_types(record.subscription_mask):
+                self._discard_subscriber(subscription_type, connection_id)
+            
+            try:
+                await record.websocket.close()
+            except Exception as e:
+                logger.debug(f"Error closing WebSocket {connection_id}: {e}")
             
             logger.info(f"WebSocket disconnected: {connection_id}")
     
+    def _discard_subscriber(self, subscription_type: str, connection_id: str):
+        """Remove a connection from a subscription set, dropping the set once empty"""
+        subscribers = self.subscriptions.get(subscription_type)
+        if subscribers is not None:
+            subscribers.discard(connection_id)
+            if not subscribers:
+                del self.subscriptions[subscription_type]
+    
+    def _subscription_bit(self, subscription_type: str) -> int:
+        """Get the bitmask for a subscription type, assigning a new bit on first use"""
+        bit = self._subscription_bits.get(subscription_type)
+        if bit is None:
+            bit = 1 << len(self._subscription_names)
+            self._subscription_bits[subscription_type] = bit
+            self._subscription_names.append(subscription_type)
+        return bit
+    
+    def _subscription_types(self, mask: int) -> List[str]:
+        """Decode a subscription bitmask into subscription type names"""
+        types = []
+        index = 0
+        while mask:
+            if mask & 1:
+                types.append(self._subscription_names[index])
+            mask >>= 1
+            index += 1
+        return types
+    
+    async def _send_payload(self, connection_id: str, payload: Union[str, bytes]) -> bool:
+        """Send an already encoded payload to a specific connection"""
+        record = self.connections.get(connection_id)
+        if record is None:
+            return False
+        
+        try:
+            websocket = record.websocket
+            if isinstance(payload, bytes):
+                await websocket.send_bytes(payload)
+            else:
+                await websocket.send_text(payload)
+            return True
+                
+        except Exception as e:
+            logger.error(f"Error sending message to {connection_id}: {e}")
+            await self.disconnect(connection_id)
+            return False
+    
     async def send_personal_message(self, connection_id: str, message: WebSocketMessage):
         """Send a message to a specific connection"""
-        if connection_id in self.active_connections:
-            try:
-                websocket = self.active_connections[connection_id]
-                await websocket.send_text(message.model_dump_json())
-                
-                # Update last activity
-                if connection_id in self.connection_info:
-                    self.connection_info[connection_id].last_activity = datetime.utcnow()
-                    
-            except Exception as e:
-                logger.error(f"Error sending message to {connection_id}: {e}")
-                await self.disconnect(connection_id)
+        record = self.connections.get(connection_id)
+        if record is not None:
+            payload = encode_message(message, record.encoding)
+            await self._send_payload(connection_id, payload)
+    
+    async def _send_to_connections(
+        self,
+        connection_ids: Set[str],
+        message: WebSocketMessage,
+        stats_key: str
+    ):
+        """Send a message to many connections, encoding it once per encoding"""
+        payloads: Dict[str, Union[str, bytes]] = {}
+        tasks = []
+        encodings = []
+        
+        for connection_id in connection_ids:
+            record = self.connections.get(connection_id)
+            if record is not None:
+                encoding = record.encoding
+                if encoding not in payloads:
+                    payloads[encoding] = encode_message(message, encoding)
+                tasks.append(self._send_payload(connection_id, payloads[encoding]))
+                encodings.append(encoding)
+        
+        if not tasks:
+            return
+        
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        
+        for encoding, delivered in zip(encodings, results):
+            if delivered is True:
+                self._record_message_size(stats_key, encoding, payload_size(payloads[encoding]))
+    
+    def _record_message_size(self, stats_key: str, encoding: str, size: int):
+        """Record the size of a delivered message"""
+        stats = self.message_stats.setdefault(stats_key, {}).setdefault(
+            encoding, {"messages": 0, "bytes": 0}
+        )
+        stats["messages"] += 1
+        stats["bytes"] += size
     
     async def broadcast_message(self, message: WebSocketMessage, subscription_type: Optional[str] = None):
         """Broadcast a message to all connections or specific subscription"""
-        target_connections = set()
+        if subscription_type in SYNCED_SUBSCRIPTIONS:
+            message = self.sync_state.record(message, subscription_type)
         
-        if subscription_type and subscription_type in self.subscriptions:
-            target_connections = self.subscriptions[subscription_type].copy()
+        if subscription_type:
+            target_connections = self.subscriptions.get(subscription_type, set()).copy()
         else:
-            target_connections = set(self.active_connections.keys())
-        
-        # Send to all target connections
-        tasks = []
-        for connection_id in target_connections:
-            if connection_id in self.active_connections:
-                tasks.append(self.send_personal_message(connection_id, message))
+            target_connections = set(self.connections.keys())
         
-        if tasks:
-            await asyncio.gather(*tasks, return_exceptions=True)
+        await self._send_to_connections(target_connections, message, subscription_type or "all")
     
     async def broadcast_to_user(self, user_id: str, message: WebSocketMessage):
         """Broadcast a message to all connections of a specific user"""
         if user_id in self.user_connections:
-            tasks = []
-            for connection_id in self.user_connections[user_id]:
-                if connection_id in self.active_connections:
-                    tasks.append(self.send_personal_message(connection_id, message))
-            
-            if tasks:
-                await asyncio.gather(*tasks, return_exceptions=True)
+            await self._send_to_connections(
+                self.user_connections[user_id].copy(),
+                message,
+                "user"
+            )
     
     async def subscribe(self, connection_id: str, subscription_type: str):
         """Subscribe a connection to a specific message type"""
-        if connection_id in self.connection_info:
-            self.connection_info[connection_id].subscriptions.append(subscription_type)
+        record = self.connections.get(connection_id)
+        if record is not None:
+            record.subscription_mask |= self._subscription_bit(subscription_type)
             
             if subscription_type not in self.subscriptions:
                 self.subscriptions[subscription_type] = set()
@@ -148,11 +265,11 @@ class WebSocketConnectionManager:
     
     async def unsubscribe(self, connection_id: str, subscription_type: str):
         """Unsubscribe a connection from a specific message type"""
-        if connection_id in self.connection_info:
-            self.connection_info[connection_id].subscriptions.remove(subscription_type)
+        record = self.connections.get(connection_id)
+        if record is not None and subscription_type in self._subscription_bits:
+            record.subscription_mask &= ~self._subscription_bits[subscription_type]
             
-            if subscription_type in self.subscriptions:
-                self.subscriptions[subscription_type].discard(connection_id)
+            self._discard_subscriber(subscription_type, connection_id)
             
             logger.info(f"Connection {connection_id} unsubscribed from {subscription_type}")
     
@@ -172,6 +289,29 @@ class WebSocketConnectionManager:
                 if subscription_type:
                     await self.unsubscribe(connection_id, subscription_type)
                     
+            elif message_type == "sync":
+                # Send missed deltas, or a full snapshot if they are gone
+                await self.sync_client(connection_id, data.get("last_seq"))
+                    
+            elif message_type == "set_encoding":
+                # Switch the encoding used for messages sent to this client
+                encoding = normalize_encoding(data.get("encoding"))
+                record = self.connections.get(connection_id)
+                if record is not None:
+                    record.encoding = encoding
+                    await self.send_personal_message(
+                        connection_id,
+                        WebSocketMessage(
+                            type=WebSocketMessageType.SUCCESS,
+                            data={"message": "Encoding updated", "encoding": encoding},
+                            timestamp=datetime.utcnow()
+                        )
+                    )
+                    
+            elif message_type == "pong":
+                # Reply to a server heartbeat; activity is recorded below
+                pass
+                    
             elif message_type == "ping":
                 # Respond to ping with pong
                 await self.send_personal_message(
@@ -185,8 +325,8 @@ class WebSocketConnectionManager:
                 
             elif message_type == "get_connection_info":
                 # Send connection info back to client
-                if connection_id in self.connection_info:
-                    connection_info = self.connection_info[connection_id]
+                connection_info = self.get_connection_info(connection_id)
+                if connection_info:
                     await self.send_personal_message(
                         connection_id,
                         WebSocketMessage(
@@ -197,8 +337,9 @@ class WebSocketConnectionManager:
                     )
             
             # Update last activity
-            if connection_id in self.connection_info:
-                self.connection_info[connection_id].last_activity = datetime.utcnow()
+            record = self.connections.get(connection_id)
+            if record is not None:
+                record.last_activity = time.time()
                 
         except Exception as e:
             logger.error(f"Error handling client message: {e}")
@@ -214,17 +355,154 @@ class WebSocketConnectionManager:
                 )
             )
     
+    async def sync_client(self, connection_id: str, last_seq: Optional[int] = None):
+        """Bring a client up to date for its synced subscriptions
+        
+        Sends only the deltas after last_seq when they are still buffered,
+        otherwise a snapshot. Clients should ignore any delta whose seq is
+        not greater than the snapshot's seq.
+        """
+        record = self.connections.get(connection_id)
+        if record is None:
+            return
+        
+        subscriptions = set(self._subscription_types(record.subscription_mask)) & SYNCED_SUBSCRIPTIONS
+        if not subscriptions:
+            return
+        
+        if last_seq is not None:
+            missed = self.sync_state.deltas_since(int(last_seq), subscriptions)
+            if missed is not None:
+                for message in missed:
+                    await self.send_personal_message(connection_id, message)
+                return
+        
+        await self.send_personal_message(
+            connection_id,
+            WebSocketMessage(
+                type=WebSocketMessageType.SNAPSHOT,
+                data=self.sync_state.snapshot(subscriptions),
+                timestamp=datetime.utcnow(),
+                seq=self.sync_state.seq
+            )
+        )
+    
+    def start_heartbeat(self):
+        """Start the background heartbeat task"""
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+            logger.info(
+                f"WebSocket heartbeat started (interval: {self.heartbeat_interval}s, "
+                f"idle timeout: {self.idle_timeout}s)"
+            )
+    
+    async def stop_heartbeat(self):
+        """Stop the background heartbeat task"""
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+    
+    async def _heartbeat_loop(self):
+        """Run heartbeat sweeps until cancelled"""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.run_heartbeat()
+            except Exception as e:
+                logger.error(f"WebSocket heartbeat sweep failed: {e}")
+    
+    async def run_heartbeat(self):
+        """Reap connections idle past the timeout and ping the rest of the idle ones
+        
+        Activity means a message received from the client, so a half-open
+        connection that silently accepts our sends still ages out.
+        """
+        now = time.time()
+        reap_before = now - self.idle_timeout
+        ping_before = now - self.heartbeat_interval
+        
+        to_reap = []
+        to_ping = set()
+        for connection_id, record in self.connections.items():
+            if record.last_activity < reap_before:
+                to_reap.append(connection_id)
+            elif record.last_activity < ping_before:
+                to_ping.add(connection_id)
+        
+        for connection_id in to_reap:
+            await self.disconnect(connection_id)
+        
+        if to_ping:
+            await self._send_to_connections(
+                to_ping,
+                WebSocketMessage(
+                    type=WebSocketMessageType.PING,
+                    data={"timestamp": datetime.utcnow().isoformat()},
+                    timestamp=datetime.utcnow()
+                ),
+                "heartbeat"
+            )
+        
+        self.heartbeat_stats["sweeps"] += 1
+        self.heartbeat_stats["pings_sent"] += len(to_ping)
+        self.heartbeat_stats["connections_reaped"] += len(to_reap)
+        
+        if to_reap:
+            logger.info(f"Reaped {len(to_reap)} idle WebSocket connections")
+    
+    def get_heartbeat_stats(self) -> Dict[str, Any]:
+        """Get heartbeat and reaping statistics"""
+        return {
+            **self.heartbeat_stats,
+            "interval_seconds": self.heartbeat_interval,
+            "idle_timeout_seconds": self.idle_timeout
+        }
+    
     def get_connection_count(self) -> int:
         """Get the number of active connections"""
-        return len(self.active_connections)
+        return len(self.connections)
     
     def get_connection_info(self, connection_id: str) -> Optional[WebSocketConnectionInfo]:
         """Get connection information"""
-        return self.connection_info.get(connection_id)
+        record = self.connections.get(connection_id)
+        if record is None:
+            return None
+        
+        return WebSocketConnectionInfo(
+            connection_id=connection_id,
+            user_id=record.user_id,
+            connected_at=datetime.utcfromtimestamp(record.connected_at),
+            last_activity=datetime.utcfromtimestamp(record.last_activity),
+            subscriptions=self._subscription_types(record.subscription_mask),
+            encoding=record.encoding
+        )
+    
+    def list_connection_info(self, offset: int = 0, limit: int = 100) -> List[WebSocketConnectionInfo]:
+        """Get connection information for one page of connections"""
+        connection_ids = islice(self.connections, offset, offset + limit)
+        return [self.get_connection_info(connection_id) for connection_id in connection_ids]
     
     def get_subscription_count(self, subscription_type: str) -> int:
         """Get the number of subscribers for a subscription type"""
         return len(self.subscriptions.get(subscription_type, set()))
+    
+    def get_message_stats(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Get delivered message counts and average bytes per message by subscription type"""
+        return {
+            stats_key: {
+                encoding: {
+                    "messages": stats["messages"],
+                    "bytes": stats["bytes"],
+                    "bytes_per_message": round(stats["bytes"] / stats["messages"], 1) if stats["messages"] else 0.0
+                }
+                for encoding, stats in encodings.items()
+            }
+            for stats_key, encodings in self.message_stats.items()
+        }
 
 # Global connection manager instance
 connection_manager = WebSocketConnectionManager()
@@ -0,0 +1,40 @@
+"""
+Wire encodings for outgoing WebSocket messages
+
+JSON text frames remain the default. Clients can opt in to MessagePack binary
+frames, which are noticeably smaller for the repeated keys in our payloads.
+"""
+
+from typing import Optional, Union
+import msgpack
+
+from app.schemas.websocket import WebSocketMessage
+
+JSON_ENCODING = "json"
+MSGPACK_ENCODING = "msgpack"
+
+SUPPORTED_ENCODINGS = (JSON_ENCODING, MSGPACK_ENCODING)
+
+def normalize_encoding(encoding: Optional[str]) -> str:
+    """Validate a requested encoding, defaulting to JSON"""
+    if not encoding:
+        return JSON_ENCODING
+    
+    encoding = encoding.lower()
+    if encoding not in SUPPORTED_ENCODINGS:
+        raise ValueError(
+            f"Unsupported encoding '{encoding}'. Supported: {', '.join(SUPPORTED_ENCODINGS)}"
+        )
+    return encoding
+
+def encode_message(message: WebSocketMessage, encoding: str) -> Union[str, bytes]:
+    """Encode a message as a text (JSON) or binary (MessagePack) frame payload"""
+    if encoding == MSGPACK_ENCODING:
+        return msgpack.packb(message.model_dump(mode="json"), use_bin_type=True)
+    return message.model_dump_json()
+
+def payload_size(payload: Union[str, bytes]) -> int:
+    """Size of an encoded payload in bytes"""
+    if isinstance(payload, bytes):
+        return len(payload)
+    return len(payload.encode("utf-8"))
@@ -1,5 +1,5 @@
 import asyncio
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 import logging
 
@@ -14,7 +14,8 @@ from app.schemas.websocket import (
     AgentActivityData,
     NotificationData,
     MapUpdateData,
-    SystemHealthData
+    SystemHealthData,
+    BroadcastEvent
 )
 
 logger = logging.getLogger(__name__)
@@ -134,6 +135,80 @@ class WebSocketEventBroadcaster:
         except Exception as e:
             logger.error(f"Error broadcasting recovery suggestion: {e}")
     
+    async def broadcast_dashboard_metrics(
+        self,
+        total_packages: int,
+        in_transit: int,
+        delivered: int,
+        delayed: int,
+        anomalies: int,
+        recovery_rate: float,
+        avg_delivery_time: Optional[float] = None
+    ):
+        """Broadcast dashboard metrics update"""
+        try:
+            metrics_data = DashboardMetricsData(
+                total_packages=total_packages,
+                in_transit=in_transit,
+                delivered=delivered,
+                delayed=delayed,
+                anomalies=anomalies,
+                recovery_rate=recovery_rate,
+                avg_delivery_time=avg_delivery_time
+            )
+            
+            message = WebSocketMessage(
+                type=WebSocketMessageType.DASHBOARD_METRICS,
+                data=metrics_data.model_dump(),
+                timestamp=datetime.utcnow()
+            )
+            
+            await self.connection_manager.broadcast_message(
+                message,
+                subscription_type="dashboard_metrics"
+            )
+            
+            logger.info("Broadcasted dashboard metrics update")
+            
+        except Exception as e:
+            logger.error(f"Error broadcasting dashboard metrics: {e}")
+    
+    async def broadcast_agent_activity(
+        self,
+        agent_id: str,
+        action: str,
+        package_id: Optional[str] = None,
+        location: Optional[str] = None,
+        status: str = "active",
+        performance_metrics: Optional[Dict[str, Any]] = None
+    ):
+        """Broadcast agent activity update"""
+        try:
+            activity_data = AgentActivityData(
+                agent_id=agent_id,
+                action=action,
+                package_id=package_id,
+                location=location,
+                status=status,
+                performance_metrics=performance_metrics
+            )
+            
+            message = WebSocketMessage(
+                type=WebSocketMessageType.AGENT_ACTIVITY,
+                data=activity_data.model_dump(),
+                timestamp=datetime.utcnow()
+            )
+            
+            await self.connection_manager.broadcast_message(
+                message,
+                subscription_type="agent_activity"
+            )
+            
+            logger.info(f"Broadcasted agent activity: {agent_id} - {action}")
+            
+        except Exception as e:
+            logger.error(f"Error broadcasting agent activity: {e}")
+    
     async def broadcast_notification(
         self,
         notification_id: str,
@@ -174,6 +249,81 @@ class WebSocketEventBroadcaster:
             
         except Exception as e:
             logger.error(f"Error broadcasting notification: {e}")
+    
+    async def broadcast_map_update(
+        self,
+        package_id: str,
+        coordinates: Dict[str, float],
+        status: str,
+        route: Optional[list] = None,
+        speed: Optional[float] = None,
+        heading: Optional[float] = None
+    ):
+        """Broadcast map location update"""
+        try:
+            map_data = MapUpdateData(
+                package_id=package_id,
+                coordinates=coordinates,
+                status=status,
+                route=route,
+                speed=speed,
+                heading=heading
+            )
+            
+            message = WebSocketMessage(
+                type=WebSocketMessageType.MAP_UPDATE,
+                data=map_data.model_dump(),
+                timestamp=datetime.utcnow()
+            )
+            
+            await self.connection_manager.broadcast_message(
+                message,
+                subscription_type="map_updates"
+            )
+            
+            logger.info(f"Broadcasted map update for {package_id}")
+            
+        except Exception as e:
+            logger.error(f"Error broadcasting map update: {e}")
+    
+    async def dispatch_event(self, event: BroadcastEvent):
+        """Broadcast a single event submitted by another service"""
+        handlers = {
+            WebSocketMessageType.PACKAGE_UPDATE: self.broadcast_package_update,
+            WebSocketMessageType.ANOMALY_DETECTED: self.broadcast_anomaly_detected,
+            WebSocketMessageType.RECOVERY_SUGGESTION: self.broadcast_recovery_suggestion,
+            WebSocketMessageType.DASHBOARD_METRICS: self.broadcast_dashboard_metrics,
+            WebSocketMessageType.AGENT_ACTIVITY: self.broadcast_agent_activity,
+            WebSocketMessageType.NOTIFICATION: self.broadcast_notification,
+            WebSocketMessageType.MAP_UPDATE: self.broadcast_map_update,
+        }
+        
+        handler = handlers.get(event.type)
+        if handler is None:
+            raise ValueError(f"Unsupported broadcast event type: {event.type.value}")
+        
+        await handler(**event.data)
+    
+    async def broadcast_batch(self, events: List[BroadcastEvent]) -> Dict[str, Any]:
+        """Broadcast a batch of events in submission order"""
+        accepted = 0
+        errors = []
+        
+        for index, event in enumerate(events):
+            try:
+                await self.dispatch_event(event)
+                accepted += 1
+            except Exception as e:
+                logger.error(f"Error dispatching batched event {index}: {e}")
+                errors.append({"index": index, "type": event.type.value, "error": str(e)})
+        
+        logger.info(f"Broadcasted batch of {accepted}/{len(events)} events")
+        
+        return {
+            "accepted": accepted,
+            "rejected": len(errors),
+            "errors": errors
+        }
 
 # Global event broadcaster instance
 event_broadcaster = WebSocketEventBroadcaster()
@@ -1,5 +1,4 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, Header
-from fastapi.security import HTTPBearer
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, Header, Query
 import json
 import logging
 from typing import Optional
@@ -7,16 +6,22 @@ from datetime import datetime
 
 from app.websocket.connection_manager import connection_manager
 from app.websocket.event_broadcaster import event_broadcaster
-from app.schemas.websocket import WebSocketMessage, WebSocketMessageType
+from app.schemas.websocket import (
+    WebSocketMessage,
+    WebSocketMessageType,
+    PackageUpdateData,
+    BroadcastBatchRequest,
+    NotificationBroadcastRequest
+)
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/ws", tags=["websocket"])
 
-# Security scheme for WebSocket authentication (optional)
-security = HTTPBearer(auto_error=False)
-
-async def get_current_user_id(token: Optional[str] = Depends(security)) -> Optional[str]:
+# WebSocket authentication (optional). Browsers cannot set headers on
+# WebSocket handshakes, so the token is read from the query string; an
+# HTTPBearer dependency cannot be resolved for WebSocket routes at all.
+async def get_current_user_id(token: Optional[str] = Query(None)) -> Optional[str]:
     """Extract user ID from token (implement your auth logic here)"""
     # This is a placeholder - implement your actual authentication logic
     # For now, we'll just return None (anonymous connections)
@@ -25,10 +30,11 @@ async def get_current_user_id(token: Optional[str] = Depends(security)) -> Optio
 @router.websocket("/connect")
 async def websocket_endpoint(
     websocket: WebSocket,
-    user_id: Optional[str] = Depends(get_current_user_id)
+    user_id: Optional[str] = Depends(get_current_user_id),
+    encoding: Optional[str] = Query(None, description="Message encoding: json (default) or msgpack")
 ):
     """Main WebSocket endpoint for real-time communication"""
-    connection_id = await connection_manager.connect(websocket, user_id)
+    connection_id = await connection_manager.connect(websocket, user_id, encoding)
     
     try:
         while True:
@@ -68,10 +74,11 @@ async def websocket_endpoint(
 @router.websocket("/packages")
 async def packages_websocket(
     websocket: WebSocket,
-    user_id: Optional[str] = Depends(get_current_user_id)
+    user_id: Optional[str] = Depends(get_current_user_id),
+    encoding: Optional[str] = Query(None, description="Message encoding: json (default) or msgpack")
 ):
     """WebSocket endpoint specifically for package updates"""
-    connection_id = await connection_manager.connect(websocket, user_id)
+    connection_id = await connection_manager.connect(websocket, user_id, encoding)
     
     # Auto-subscribe to package updates
     await connection_manager.subscribe(connection_id, "package_updates")
@@ -91,15 +98,20 @@ async def packages_websocket(
 @router.websocket("/dashboard")
 async def dashboard_websocket(
     websocket: WebSocket,
-    user_id: Optional[str] = Depends(get_current_user_id)
+    user_id: Optional[str] = Depends(get_current_user_id),
+    encoding: Optional[str] = Query(None, description="Message encoding: json (default) or msgpack"),
+    last_seq: Optional[int] = Query(None, description="Last sequence number seen before reconnecting")
 ):
     """WebSocket endpoint for dashboard metrics and analytics"""
-    connection_id = await connection_manager.connect(websocket, user_id)
+    connection_id = await connection_manager.connect(websocket, user_id, encoding)
     
     # Auto-subscribe to dashboard metrics
     await connection_manager.subscribe(connection_id, "dashboard_metrics")
     await connection_manager.subscribe(connection_id, "notifications")
     
+    # Send the current snapshot, or only the missed deltas on reconnect
+    await connection_manager.sync_client(connection_id, last_seq)
+    
     try:
         while True:
             data = await websocket.receive_text()
@@ -115,15 +127,20 @@ async def dashboard_websocket(
 @router.websocket("/map")
 async def map_websocket(
     websocket: WebSocket,
-    user_id: Optional[str] = Depends(get_current_user_id)
+    user_id: Optional[str] = Depends(get_current_user_id),
+    encoding: Optional[str] = Query(None, description="Message encoding: json (default) or msgpack"),
+    last_seq: Optional[int] = Query(None, description="Last sequence number seen before reconnecting")
 ):
     """WebSocket endpoint for map updates and location tracking"""
-    connection_id = await connection_manager.connect(websocket, user_id)
+    connection_id = await connection_manager.connect(websocket, user_id, encoding)
     
     # Auto-subscribe to map updates
     await connection_manager.subscribe(connection_id, "map_updates")
     await connection_manager.subscribe(connection_id, "package_updates")
     
+    # Send the current snapshot, or only the missed deltas on reconnect
+    await connection_manager.sync_client(connection_id, last_seq)
+    
     try:
         while True:
             data = await websocket.receive_text()
@@ -139,10 +156,11 @@ async def map_websocket(
 @router.websocket("/agents")
 async def agents_websocket(
     websocket: WebSocket,
-    user_id: Optional[str] = Depends(get_current_user_id)
+    user_id: Optional[str] = Depends(get_current_user_id),
+    encoding: Optional[str] = Query(None, description="Message encoding: json (default) or msgpack")
 ):
     """WebSocket endpoint for agent monitoring and control"""
-    connection_id = await connection_manager.connect(websocket, user_id)
+    connection_id = await connection_manager.connect(websocket, user_id, encoding)
     
     # Auto-subscribe to agent activity
     await connection_manager.subscribe(connection_id, "agent_activity")
@@ -160,6 +178,24 @@ async def agents_websocket(
         logger.error(f"Agents WebSocket error: {e}")
         await connection_manager.disconnect(connection_id)
 
+# Broadcast ingestion endpoints for other services
+@router.post("/broadcast/package-update")
+async def broadcast_package_update(update: PackageUpdateData):
+    """Broadcast a single package update"""
+    await event_broadcaster.broadcast_package_update(**update.model_dump())
+    return {"accepted": 1}
+
+@router.post("/broadcast/notification")
+async def broadcast_notification(notification: NotificationBroadcastRequest):
+    """Broadcast a single notification"""
+    await event_broadcaster.broadcast_notification(**notification.model_dump())
+    return {"accepted": 1}
+
+@router.post("/broadcast/batch")
+async def broadcast_batch(batch: BroadcastBatchRequest):
+    """Broadcast a batch of events submitted in one request"""
+    return await event_broadcaster.broadcast_batch(batch.events)
+
 # REST endpoints for WebSocket management
 @router.get("/status")
 async def get_websocket_status():
@@ -170,23 +206,31 @@ async def get_websocket_status():
             subscription_type: connection_manager.get_subscription_count(subscription_type)
             for subscription_type in connection_manager.subscriptions.keys()
         },
+        "message_stats": connection_manager.get_message_stats(),
+        "heartbeat": connection_manager.get_heartbeat_stats(),
         "status": "operational"
     }
 
 @router.get("/connections")
-async def get_connections():
-    """Get information about active connections (admin only)"""
+async def get_connections(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Get information about active connections, one page at a time (admin only)"""
     connections = []
-    for connection_id, info in connection_manager.connection_info.items():
+    for info in connection_manager.list_connection_info(offset, limit):
         connections.append({
-            "connection_id": connection_id,
+            "connection_id": info.connection_id,
             "user_id": info.user_id,
             "connected_at": info.connected_at,
             "last_activity": info.last_activity,
-            "subscriptions": info.subscriptions
+            "subscriptions": info.subscriptions,
+            "encoding": info.encoding
         })
     
     return {
         "connections": connections,
-        "total": len(connections)
+        "offset": offset,
+        "limit": limit,
+        "total": connection_manager.get_connection_count()
     }
@@ -0,0 +1,80 @@
+"""
+Snapshot and delta log for dashboard and map clients
+
+The connection manager feeds every synced broadcast through SyncState, which
+keeps the latest dashboard metrics and the latest known state of each active
+package, and a ring buffer of recent sequence-numbered messages. New clients
+get the snapshot; reconnecting clients that send their last seen sequence
+number get only the messages they missed.
+"""
+
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from app.schemas.websocket import WebSocketMessage, WebSocketMessageType
+
+# Subscription types whose messages are sequenced and folded into the snapshot
+SYNCED_SUBSCRIPTIONS = {"dashboard_metrics", "package_updates", "map_updates"}
+
+# Package statuses after which a package is dropped from the snapshot
+TERMINAL_PACKAGE_STATUSES = {"delivered"}
+
+class SyncState:
+    """In-memory snapshot plus a ring buffer of recent deltas"""
+    
+    def __init__(self, max_deltas: int = 1000):
+        self.seq = 0
+        self.metrics: Optional[Dict[str, Any]] = None
+        # Latest known state per active package: {package_id: state}
+        self.packages: Dict[str, Dict[str, Any]] = {}
+        # Recent deltas: (seq, subscription_type, message)
+        self.deltas: Deque[Tuple[int, str, WebSocketMessage]] = deque(maxlen=max_deltas)
+    
+    def record(self, message: WebSocketMessage, subscription_type: str) -> WebSocketMessage:
+        """Fold a broadcast into the snapshot and return it stamped with its sequence number"""
+        self.seq += 1
+        message = message.model_copy(update={"seq": self.seq})
+        
+        if message.type == WebSocketMessageType.DASHBOARD_METRICS:
+            self.metrics = message.data
+        elif message.type in (WebSocketMessageType.PACKAGE_UPDATE, WebSocketMessageType.MAP_UPDATE):
+            self._apply_package_state(message.data)
+        
+        self.deltas.append((self.seq, subscription_type, message))
+        return message
+    
+    def _apply_package_state(self, data: Dict[str, Any]):
+        """Merge a package or map update into the per-package state"""
+        package_id = data.get("package_id")
+        if not package_id:
+            return
+        
+        if data.get("status") in TERMINAL_PACKAGE_STATUSES:
+            self.packages.pop(package_id, None)
+            return
+        
+        state = self.packages.setdefault(package_id, {})
+        state.update({key: value for key, value in data.items() if value is not None})
+    
+    def snapshot(self, subscriptions: Set[str]) -> Dict[str, Any]:
+        """Build the snapshot relevant to a client's subscriptions"""
+        snapshot: Dict[str, Any] = {"seq": self.seq}
+        
+        if "dashboard_metrics" in subscriptions:
+            snapshot["metrics"] = self.metrics
+        if subscriptions & {"package_updates", "map_updates"}:
+            snapshot["packages"] = list(self.packages.values())
+        
+        return snapshot
+    
+    def deltas_since(self, last_seq: int, subscriptions: Set[str]) -> Optional[List[WebSocketMessage]]:
+        """Get the messages a client missed, or None if they are no longer buffered"""
+        if last_seq > self.seq:
+            return None
+        if last_seq < self.seq and (not self.deltas or self.deltas[0][0] > last_seq + 1):
+            return None
+        
+        return [
+            message for seq, subscription_type, message in self.deltas
+            if seq > last_seq and subscription_type in subscriptions
+        ]
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for the WebSocket connection registry
+
+Simulates idle dashboard clients (two subscriptions each) and reports the
+bytes held per connection by the connection manager, next to the previous
+layout of one Pydantic WebSocketConnectionInfo per connection.
+
+Usage: python benchmark_connections.py [connections]
+"""
+
+import asyncio
+import logging
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from app.schemas.websocket import WebSocketConnectionInfo
+from app.websocket.connection_manager import WebSocketConnectionManager
+
+SUBSCRIPTIONS = ["dashboard_metrics", "notifications"]
+
+class StubWebSocket:
+    """Stand-in socket shared by all simulated clients, so only registry overhead is measured"""
+    
+    async def accept(self):
+        pass
+    
+    async def send_text(self, data: str):
+        pass
+    
+    async def send_bytes(self, data: bytes):
+        pass
+    
+    async def close(self):
+        pass
+
+def measure(build) -> int:
+    """Return the bytes still allocated after running build()"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    keep = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del keep
+    return size
+
+def build_legacy(count: int, websocket: StubWebSocket):
+    """Previous layout: socket dict, Pydantic info per connection, subscription sets"""
+    import uuid
+    active_connections = {}
+    connection_info = {}
+    subscriptions = {name: set() for name in SUBSCRIPTIONS}
+    for _ in range(count):
+        connection_id = str(uuid.uuid4())
+        active_connections[connection_id] = websocket
+        connection_info[connection_id] = WebSocketConnectionInfo(
+            connection_id=connection_id,
+            connected_at=datetime.utcnow(),
+            last_activity=datetime.utcnow(),
+            subscriptions=list(SUBSCRIPTIONS)
+        )
+        for name in SUBSCRIPTIONS:
+            subscriptions[name].add(connection_id)
+    return active_connections, connection_info, subscriptions
+
+def build_registry(count: int, websocket: StubWebSocket):
+    """Current layout: ConnectionRecord per connection with a subscription bitmask"""
+    manager = WebSocketConnectionManager()
+    
+    async def connect_all():
+        for _ in range(count):
+            connection_id = await manager.connect(websocket)
+            for name in SUBSCRIPTIONS:
+                await manager.subscribe(connection_id, name)
+    
+    asyncio.run(connect_all())
+    return manager
+
+def time_operations(manager: WebSocketConnectionManager) -> float:
+    """Time an unsubscribe/subscribe/disconnect cycle across all connections"""
+    async def cycle():
+        for connection_id in list(manager.connections):
+            await manager.unsubscribe(connection_id, "notifications")
+            await manager.subscribe(connection_id, "notifications")
+            await manager.disconnect(connection_id)
+    
+    start = time.perf_counter()
+    asyncio.run(cycle())
+    return time.perf_counter() - start
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    websocket = StubWebSocket()
+    
+    # Keep per-operation logging out of the measurement
+    logging.disable(logging.INFO)
+    
+    legacy_bytes = measure(lambda: build_legacy(count, websocket))
+    registry_bytes = measure(lambda: build_registry(count, websocket))
+    
+    print(f"Idle connections: {count:,}")
+    print(f"Previous layout:  {legacy_bytes / count:8.1f} bytes/connection ({legacy_bytes / 1e6:.1f} MB)")
+    print(f"Registry:         {registry_bytes / count:8.1f} bytes/connection ({registry_bytes / 1e6:.1f} MB)")
+    
+    manager = build_registry(count, websocket)
+    elapsed = time_operations(manager)
+    print(f"unsubscribe+subscribe+disconnect: {elapsed / count * 1e6:.2f} µs/connection")
+
+if __name__ == "__main__":
+    main()